@@ -1,6 +1,10 @@
 import streamlit as st
 
 st.set_page_config(page_title="HOME", layout="wide")
+
+# サーバー起動後の最初のアクセスで、重いテーブルを裏スレッドで先読みしておく（プロセスごとに1回）
+from warmup import start_warmup
+start_warmup()
 st.title("🏠 HOME")
 
 st.markdown("### 🔗 ページ一覧")
@@ -0,0 +1,94 @@
+# benchmarks/bench_categories.py
+# ディメンション列の文字列 → category 変換（categories.as_categories）の効果測定
+#   - 合成データ（Final_Ad_Data_Last と同程度の種類数）で、変換前後を比べる
+#       メモリ : memory_usage(deep=True)
+#       時間   : isin（ページ側のフィルター）・groupby（集計）
+#   - 変換はローダーと同じ categories.as_categories を使う（BigQuery・Streamlit には接続しない）
+#
+# 使い方: python benchmarks/bench_categories.py [--rows 500000] [--repeat 5]
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from categories import as_categories  # noqa: E402
+
+# 列名 → 種類数（categories.CATEGORY_COLS のうち Final_Ad_Data_Last にある列）
+DIMENSIONS = {
+    "client_name": 300, "クライアント名": 300, "広告媒体": 6, "メインカテゴリ": 12,
+    "サブカテゴリ": 40, "特殊カテゴリ": 5, "広告目的": 6, "キャンペーン名": 20000,
+    "広告セット名": 50000, "配信月": 24, "都道府県": 47, "担当者": 30,
+}
+GROUP_BY = ["配信月", "メインカテゴリ", "広告目的"]
+
+
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {
+        col: pd.Series(rng.integers(0, n, rows)).map(lambda i, c=col: f"{c}_{i}")
+        for col, n in DIMENSIONS.items()
+    }
+    data["Cost"] = rng.random(rows) * 10000
+    data["Clicks"] = rng.integers(0, 1000, rows)
+    return pd.DataFrame(data)
+
+
+def best_of(repeat: int, func) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def bench(df: pd.DataFrame, repeat: int) -> dict:
+    picks = {
+        "client_name": ["client_name_1", "client_name_2", "client_name_3"],
+        "メインカテゴリ": ["メインカテゴリ_0", "メインカテゴリ_5"],
+        "配信月": ["配信月_22", "配信月_23"],
+    }
+    observed = {"observed": True} if any(isinstance(df[c].dtype, pd.CategoricalDtype) for c in GROUP_BY) else {}
+
+    def isin():
+        mask = np.ones(len(df), dtype=bool)
+        for col, values in picks.items():
+            mask &= df[col].isin(values).to_numpy()
+        return df[mask]
+
+    def groupby():
+        return df.groupby(GROUP_BY, **observed)[["Cost", "Clicks"]].sum()
+
+    return {
+        "memory_mb": round(df.memory_usage(deep=True).sum() / 1024 / 1024, 1),
+        "isin_ms": round(best_of(repeat, isin) * 1000, 2),
+        "groupby_ms": round(best_of(repeat, groupby) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="文字列列と category のメモリ・isin・groupby 比較")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    before = bench(df, args.repeat)
+    started = time.perf_counter()
+    as_categories(df)
+    convert_ms = round((time.perf_counter() - started) * 1000, 1)
+    after = bench(df, args.repeat)
+
+    text_dtype = str(synthetic_frame(1)["client_name"].dtype)  # pandas 2 は object、3 は str
+    result = pd.DataFrame([before, after], index=[text_dtype, "category"])
+    result.loc[f"倍率（{text_dtype} / category）"] = (result.loc[text_dtype] / result.loc["category"]).round(1)
+    print(f"rows={args.rows:,}  変換時間={convert_ms}ms")
+    print(result.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+# benchmarks/bench_storage_api.py
+# REST（tabledata.list）と Storage Read API（Arrow レコードバッチ）のコールドロード比較
+#   - google.cloud.bigquery の RowIterator.to_dataframe() をそのまま動かし、通信部分だけを差し替える
+#       REST    : RowIterator に偽の api_request を渡し、tabledata.list と同じ JSON ページを返す
+#                 → to_dataframe(create_bqstorage_client=False)（bq_data の REST 経路と同じ呼び出し）
+#       Storage : 偽の BigQueryReadClient が同じ行を Arrow レコードバッチ（ReadRowsResponse）で返す
+#                 → to_dataframe(bqstorage_client=...)（bq_data の Storage API 経路と同じ呼び出し）
+#     JSON の解釈・型変換、ReadRowsStream のバッチ読み出し・Arrow → pandas 変換はライブラリ本体のコード
+#   - 応答は事前に作ってメモリに持ち（＝受信済み）、DataFrame にするまでの時間とピーク RSS を測る
+#     （計測はモードごとに別プロセス。ピーク RSS が前の計測に引きずられないようにする）
+#   - 列構成は Final_Ad_Data_Last を Ad Drive が読む列（bq_data.AD_DRIVE_NUM_COLS）に合わせている
+#   - google-cloud-bigquery 3.x / google-cloud-bigquery-storage 2.x の内部 API に合わせている
+#
+# 使い方: python benchmarks/bench_storage_api.py [--rows 500000] [--page-rows 20000]
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from google.cloud import bigquery
+from google.cloud.bigquery.table import RowIterator, TableReference
+from google.cloud.bigquery_storage_v1 import reader, types
+
+# (列名, BigQuery の型)
+SCHEMA = [
+    ("配信月", "STRING"), ("client_name", "STRING"), ("クライアント名", "STRING"),
+    ("広告媒体", "STRING"), ("媒体", "STRING"), ("メインカテゴリ", "STRING"),
+    ("サブカテゴリ", "STRING"), ("特殊カテゴリ", "STRING"), ("広告目的", "STRING"),
+    ("キャンペーン名", "STRING"), ("広告セット名", "STRING"), ("building_count", "STRING"),
+    ("Cost", "FLOAT64"), ("Clicks", "INT64"), ("Impressions", "INT64"), ("コンバージョン数", "FLOAT64"),
+]
+TABLE = TableReference.from_string("bench-project.bench_dataset.Final_Ad_Data_Last")
+
+
+# ===== 同じ行（両モード共通） =====
+def synthetic_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    cardinality = {
+        "配信月": 24, "client_name": 300, "クライアント名": 300, "広告媒体": 6, "媒体": 6,
+        "メインカテゴリ": 12, "サブカテゴリ": 40, "特殊カテゴリ": 5, "広告目的": 6,
+        "キャンペーン名": 20000, "広告セット名": 50000, "building_count": 5,
+    }
+    data = {}
+    for col, ptype in SCHEMA:
+        if ptype == "STRING":
+            data[col] = pd.Series(rng.integers(0, cardinality[col], rows)).map(lambda i, c=col: f"{c}_{i}")
+        elif ptype == "INT64":
+            data[col] = rng.integers(0, 100000, rows)
+        else:
+            data[col] = rng.random(rows) * 10000
+    return pd.DataFrame(data)
+
+
+# ===== REST：偽の tabledata.list =====
+class FakeTableDataList:
+    """RowIterator の api_request の代わり。pageToken ごとに JSON ページを返す"""
+
+    def __init__(self, df: pd.DataFrame, page_rows: int):
+        # 受信済みの応答本文（JSON 文字列）。値は REST と同じくすべて文字列
+        self.pages = []
+        for start in range(0, len(df), page_rows):
+            page = df.iloc[start:start + page_rows]
+            rows = [{"f": [{"v": str(v)} for v in row]} for row in page.itertuples(index=False)]
+            body = {"totalRows": str(len(df)), "rows": rows}
+            if start + page_rows < len(df):
+                body["pageToken"] = str(len(self.pages) + 1)
+            self.pages.append(json.dumps(body, ensure_ascii=False))
+
+    def __call__(self, method, path, query_params=None, **kwargs):
+        token = int((query_params or {}).get("pageToken", 0))
+        return json.loads(self.pages[token])  # HTTP 応答の JSON 解釈に相当
+
+
+def rest_iterator(api_request: FakeTableDataList) -> RowIterator:
+    return RowIterator(
+        client=None,
+        api_request=api_request,
+        path=f"/projects/{TABLE.project}/datasets/{TABLE.dataset_id}/tables/{TABLE.table_id}/data",
+        schema=[bigquery.SchemaField(c, t) for c, t in SCHEMA],
+        table=TABLE,
+        project=TABLE.project,
+    )
+
+
+# ===== Storage Read API：偽の BigQueryReadClient =====
+class _FakeReadRowsRpc:
+    """ReadRowsStream が呼ぶ GAPIC の read_rows の代わり。ReadRowsResponse を順に返す"""
+
+    def __init__(self, responses: list):
+        self.responses = responses
+
+    def read_rows(self, read_stream=None, offset=0, **kwargs):
+        return iter(self.responses)
+
+
+class FakeBigQueryReadClient:
+    """google.cloud.bigquery_storage.BigQueryReadClient の代わり（ストリーム1本）"""
+
+    def __init__(self, df: pd.DataFrame, page_rows: int):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        self.schema = types.ArrowSchema(serialized_schema=table.schema.serialize().to_pybytes())
+        self.responses = [
+            types.ReadRowsResponse(
+                arrow_schema=self.schema,
+                arrow_record_batch=types.ArrowRecordBatch(
+                    serialized_record_batch=batch.serialize().to_pybytes(), row_count=batch.num_rows,
+                ),
+                row_count=batch.num_rows,
+            )
+            for batch in table.to_batches(max_chunksize=page_rows)
+        ]
+
+    def create_read_session(self, parent=None, read_session=None, max_stream_count=None, **kwargs):
+        return types.ReadSession(
+            name=f"{parent}/sessions/bench",
+            data_format=types.DataFormat.ARROW,
+            arrow_schema=self.schema,
+            streams=[types.ReadStream(name=f"{parent}/sessions/bench/streams/0")],
+        )
+
+    def read_rows(self, name, offset=0, **kwargs):
+        return reader.ReadRowsStream(_FakeReadRowsRpc(self.responses), name, offset, {})
+
+
+# ===== 計測 =====
+def measure(mode: str, rows: int, page_rows: int) -> dict:
+    df = synthetic_frame(rows)
+    if mode == "rest":
+        api_request = FakeTableDataList(df, page_rows)
+        load = lambda: rest_iterator(api_request).to_dataframe(create_bqstorage_client=False)  # noqa: E731
+    else:
+        bqstorage = FakeBigQueryReadClient(df, page_rows)
+        load = lambda: rest_iterator(None).to_dataframe(bqstorage_client=bqstorage)  # noqa: E731
+    del df
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    out = load()
+    elapsed = time.perf_counter() - started
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # Linux は KB
+    return {
+        "mode": mode,
+        "rows": len(out),
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak_rss / 1024, 1),
+        "delta_rss_mb": round((peak_rss - base_rss) / 1024, 1),
+        "frame_mb": round(out.memory_usage(deep=True).sum() / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="REST と Storage Read API のコールドロード比較")
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--page-rows", type=int, default=20_000)
+    parser.add_argument("--child", choices=("rest", "storage"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.rows, args.page_rows)))
+        return
+
+    results = []
+    for mode in ("rest", "storage"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, "--rows", str(args.rows), "--page-rows", str(args.page_rows)],
+            check=True, capture_output=True, text=True,
+        )
+        results.append(json.loads(out.stdout))
+    print(pd.DataFrame(results).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,950 @@
+# bq_data.py
+# BigQuery へのアクセスを1か所にまとめる共通モジュール
+import contextlib
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+import streamlit as st
+from google.api_core import exceptions as gexc
+from google.cloud import bigquery
+from google.oauth2 import service_account
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from categories import as_categories
+from filter_index import FilterIndex, index_for
+
+# 依存: google-cloud-bigquery-storage（Storage Read API 経由の高速ダウンロード用・任意）
+try:
+    from google.cloud import bigquery_storage
+except Exception:
+    bigquery_storage = None
+
+# 依存: pyarrow（ローカル Parquet スナップショット用・任意）
+try:
+    import pyarrow  # noqa: F401
+except Exception:
+    pyarrow = None
+
+# ===== テーブル定義 =====
+PROJECT_ID = "careful-chess-406412"
+DATASET = "SHOSAN_Ad_Tokyo"
+
+FINAL_AD_DATA = "Final_Ad_Data_Last"
+BANNER_DRIVE = "Banner_Drive_Ready"
+UNIT_DRIVE = "Unit_Drive_Ready_View"
+LP_SCORE = "LP_Score_Ready"
+CLIENT_SETTINGS = "ClientSettings"
+KPI_SETTINGS = "Target_Indicators_Meta"
+UNIT_MAPPING = "UnitMapping"
+
+
+def table_id(table: str) -> str:
+    """`project.dataset.table` 形式の完全修飾名を返す"""
+    return f"{PROJECT_ID}.{DATASET}.{table}"
+
+
+# ===== ページ別の取得列（ページとウォームアップで共有） =====
+# 各ページが実際に使う列だけを取得する（SELECT * をやめて転送量・キャッシュメモリを削減）。
+# ウォームアップ（warmup.py）も同じ列で読み込むので、キャッシュキーが一致して温まる。
+
+# Ad Drive：フィルター軸（媒体/クライアント名の旧列名も含む）
+AD_DRIVE_FILTER_COLS = (
+    "配信月", "client_name", "クライアント名", "広告媒体", "媒体",
+    "メインカテゴリ", "サブカテゴリ", "特殊カテゴリ", "広告目的",
+    "キャンペーン名", "広告セット名",
+)
+# Ad Drive：Final_Ad_Data_Last（フィルター軸＋棟数セグメント＋集計値）
+AD_DRIVE_NUM_COLS = AD_DRIVE_FILTER_COLS + (
+    "building_count", "Cost", "Clicks", "Impressions", "コンバージョン数",
+)
+# Ad Drive：Banner_Drive_Ready（フィルター軸＋バナーカード表示項目。building_count は ClientSettings から付与）
+AD_DRIVE_BANNER_COLS = AD_DRIVE_FILTER_COLS + (
+    "Cost", "Clicks", "Impressions", "CV", "CPA", "CTR", "CPC",
+    "CloudStorageUrl", "banner_number", "AdName", "Description", "canvaURL", "URL",
+)
+# Ad Drive：絞り込み用の索引を作る列
+AD_DRIVE_INDEX_COLS = AD_DRIVE_FILTER_COLS + ("building_count",)
+AD_DRIVE_SETTINGS_COLS = ("client_name", "building_count")
+AD_DRIVE_KPI_COLS = (
+    "メインカテゴリ", "サブカテゴリ", "広告目的",
+    "CPA_good", "CVR_good", "CTR_good", "CPC_good", "CPM_good",
+)
+# Ad Drive：フィルター UI の選択肢
+AD_DRIVE_OPTION_COLS = (
+    "配信月", "client_name", "building_count", "広告媒体", "メインカテゴリ",
+    "サブカテゴリ", "特殊カテゴリ", "広告目的", "キャンペーン名", "広告セット名",
+)
+
+# Unit Score：集計キー・並び替えキー・agg_dict の列
+UNIT_SCORE_COLS = (
+    "配信月", "CampaignId", "クライアント名", "配信終了日", "配信開始日", "日付",
+    "キャンペーン名", "campaign_uuid", "担当者", "所属", "フロント", "雇用形態",
+    "予算", "フィー", "消化金額", "コンバージョン数", "クリック数",
+    "CVR", "CTR", "CPC", "CPM", "canvaURL",
+    "メインカテゴリ", "サブカテゴリ", "広告媒体", "広告目的", "注力度",
+    "CPA_best", "CPA_good", "CPA_min", "目標CPA",
+    "CPA_KPI_評価", "CPC_KPI_評価", "CPM_KPI_評価", "CVR_KPI_評価", "CTR_KPI_評価",
+    "個別CPA_達成", "達成状況",
+)
+
+# SHO-SAN market：キャンペーン集計キー＋集計値、KPI 閾値
+MARKET_RAW_COLS = (
+    "CampaignId", "キャンペーン名", "client_name", "building_count", "配信月",
+    "広告媒体", "メインカテゴリ", "サブカテゴリ", "広告目的", "地方", "都道府県",
+    "Cost", "Clicks", "Impressions", "コンバージョン数",
+)
+MARKET_INDEX_COLS = ("メインカテゴリ", "サブカテゴリ", "広告目的", "地方", "都道府県", "building_count")
+MARKET_KPI_COLS = ("広告媒体", "メインカテゴリ", "サブカテゴリ", "広告目的") + tuple(
+    f"{m}_{lv}" for m in ("CPA", "CVR", "CTR", "CPC", "CPM") for lv in ("best", "good", "min")
+)
+
+
+# ===== 認証 & クライアント（プロセス内で1つだけ） =====
+@st.cache_resource
+def get_credentials() -> service_account.Credentials:
+    """
+    secrets の [connections.bigquery] を一度だけパースして Credentials を返す。
+    - private_key の改行コード（\\n）をここで復元する。
+    """
+    info = dict(st.secrets["connections"]["bigquery"])
+    info["private_key"] = info["private_key"].replace("\\n", "\n")
+    return service_account.Credentials.from_service_account_info(info)
+
+
+@st.cache_resource
+def get_bq_client() -> bigquery.Client:
+    """
+    全ページ共通の BigQuery クライアント。
+    - cache_resource なのでプロセス内で1インスタンスを共有し、
+      HTTP セッション（コネクションプール）も使い回される。
+    """
+    credentials = get_credentials()
+    return bigquery.Client(credentials=credentials, project=credentials.project_id)
+
+
+# ===== Storage Read API（Arrow）高速パス =====
+# secrets.toml の [bigquery_options] storage_api = true で有効化（既定は従来の REST）。
+# 権限不足・API 未有効化で失敗したら、このプロセスでは以後 REST のみを使う。
+# それ以外（一時的な通信エラー等）はその回だけ REST で取り直し、次回はまた Storage API を試す。
+_storage_api_failed = False
+_NOT_ENABLED = ("has not been used", "is disabled", "not enabled")
+
+
+def _storage_api_unavailable(e: Exception) -> bool:
+    """Storage API 自体が使えない（以後試しても無駄な）エラーか"""
+    if isinstance(e, (gexc.PermissionDenied, gexc.Forbidden)):
+        return True
+    return isinstance(e, gexc.GoogleAPICallError) and any(s in str(e) for s in _NOT_ENABLED)
+
+
+def storage_api_enabled() -> bool:
+    opts = st.secrets.get("bigquery_options", {})
+    return bool(opts.get("storage_api", False)) and bigquery_storage is not None and not _storage_api_failed
+
+
+@st.cache_resource
+def get_bqstorage_client():
+    """Storage Read API クライアント（ライブラリ未導入・生成失敗時は None）"""
+    if bigquery_storage is None:
+        return None
+    try:
+        return bigquery_storage.BigQueryReadClient(credentials=get_credentials())
+    except Exception:
+        return None
+
+
+def _to_dataframe(job: bigquery.QueryJob) -> pd.DataFrame:
+    """
+    クエリ結果を DataFrame 化する。
+    - 有効時は Storage Read API で Arrow レコードバッチをストリーミング受信し、
+      Arrow → pandas 変換で組み立てる（REST のページ送りより大幅に速い）。
+    - Storage API が使えない場合は自動で REST にフォールバック。
+    """
+    global _storage_api_failed
+    if storage_api_enabled():
+        bqstorage = get_bqstorage_client()
+        if bqstorage is not None:
+            try:
+                return job.to_dataframe(bqstorage_client=bqstorage)
+            except Exception as e:
+                if _storage_api_unavailable(e):
+                    _storage_api_failed = True
+    return job.to_dataframe(create_bqstorage_client=False)
+
+
+def run_query(query: str, params: list | None = None) -> pd.DataFrame:
+    """共通クライアントでクエリを実行して DataFrame を返す（キャッシュなし）"""
+    job_config = bigquery.QueryJobConfig(query_parameters=params) if params else None
+    return _to_dataframe(get_bq_client().query(query, job_config=job_config))
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_table_schema(table: str) -> dict[str, str]:
+    """テーブル（ビュー含む）の {列名: 型}。型は BigQuery の field_type"""
+    return {f.name: f.field_type for f in get_bq_client().get_table(table_id(table)).schema}
+
+
+def get_table_columns(table: str) -> list[str]:
+    """テーブル（ビュー含む）のスキーマ上の列名一覧"""
+    return list(get_table_schema(table))
+
+
+# ===== フィルターの SQL 化（WHERE ... IN UNNEST(@p)） =====
+# 旧名の型をクエリパラメータ用の型名に揃える
+_PARAM_TYPES = {"INTEGER": "INT64", "FLOAT": "FLOAT64", "BOOLEAN": "BOOL"}
+
+# テーブルに無い列でのフィルターを、別テーブル経由のサブクエリで解決する
+#   列名 -> (参照テーブル, 結合キー)
+#   例: Banner_Drive_Ready には building_count が無いので ClientSettings から client_name で引く
+_LOOKUP_FILTERS = {
+    "building_count": (CLIENT_SETTINGS, "client_name"),
+}
+
+
+def _to_param_value(v):
+    # numpy のスカラーは Python の値に戻す
+    return v.item() if hasattr(v, "item") else v
+
+
+def build_where(table: str, filters: dict | None) -> tuple[str, list]:
+    """
+    {列名: 選択値リスト} を `WHERE col IN UNNEST(@p0) AND ...` とクエリパラメータに変換する。
+    - 空リスト（＝すべて）は条件に含めない。
+    - テーブルに存在しない列は _LOOKUP_FILTERS で解決できるものだけサブクエリ化し、
+      それ以外は押し下げない（ページ側の pandas フィルターで絞る）。
+    """
+    if not filters:
+        return "", []
+    schema = get_table_schema(table)
+    clauses, params = [], []
+    for col, values in filters.items():
+        if values is None or len(values) == 0:
+            continue
+        name = f"p{len(params)}"
+        if col in schema:
+            ptype = _PARAM_TYPES.get(schema[col], schema[col])
+            clauses.append(f"`{col}` IN UNNEST(@{name})")
+        elif col in _LOOKUP_FILTERS:
+            ref_table, key = _LOOKUP_FILTERS[col]
+            ref_schema = get_table_schema(ref_table)
+            if key not in schema or col not in ref_schema:
+                continue
+            ptype = _PARAM_TYPES.get(ref_schema[col], ref_schema[col])
+            clauses.append(
+                f"`{key}` IN (SELECT `{key}` FROM `{table_id(ref_table)}` WHERE `{col}` IN UNNEST(@{name}))"
+            )
+        else:
+            continue
+        params.append(bigquery.ArrayQueryParameter(name, ptype, [_to_param_value(v) for v in values]))
+    if not clauses:
+        return "", []
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def lookup_tables(table: str, filters: dict | None) -> tuple[str, ...]:
+    """build_where が filters の解決のために読む別テーブル（_LOOKUP_FILTERS 経由）"""
+    if not filters:
+        return ()
+    schema = get_table_schema(table)
+    return tuple(dict.fromkeys(
+        _LOOKUP_FILTERS[col][0]
+        for col, values in filters.items()
+        if values is not None and len(values) > 0 and col not in schema and col in _LOOKUP_FILTERS
+    ))
+
+
+def select_query(
+    table: str,
+    columns: tuple[str, ...] | None = None,
+    filters: dict | None = None,
+) -> tuple[str, list]:
+    """
+    列を絞り、フィルターを WHERE 句に押し下げた SELECT 文とパラメータを返す。
+    - columns=None なら従来どおり SELECT *。
+    - スキーマに存在しない列は黙って除外する（ページ側の `in df.columns` 判定と同じ扱い）。
+    """
+    select_list = "*"
+    if columns:
+        schema = get_table_schema(table)
+        cols = [c for c in dict.fromkeys(columns) if c in schema]
+        if cols:
+            select_list = ", ".join(f"`{c}`" for c in cols)
+    where, params = build_where(table, filters)
+    return f"SELECT {select_list} FROM `{table_id(table)}`{where}", params
+
+
+# ===== ローカル Parquet スナップショット =====
+# st.cache_data（メモリ）の下にディスク層を置き、再起動・キャッシュクリア後も
+# テーブルが更新されていなければ BigQuery を叩かずにローカルファイルから読む。
+#   ファイル名: {テーブル名}-{クエリのハッシュ}-{テーブルの最終更新時刻}.parquet
+#   - 最終更新時刻（get_table().modified）が変わればファイル名が変わる＝自動で作り直し
+#   - ビューは最終更新時刻が元データの更新を反映しないため対象外（毎回クエリ）
+#   - 対象はフィルターなしのベース取得だけ（フィルター条件ごとにファイルが増え続けるのを防ぐ。
+#     フィルターを押し下げたクエリは _LOOKUP_FILTERS で別テーブルも読むので、鮮度判定も合わなくなる）
+#   - 書き込みは裏スレッドで行い、利用者の表示を待たせない
+# secrets.toml の [bigquery_options] snapshot = false で無効化、snapshot_dir で保存先を変更できる。
+def snapshot_dir() -> Path | None:
+    opts = st.secrets.get("bigquery_options", {})
+    if pyarrow is None or not opts.get("snapshot", True):
+        return None
+    return Path(opts.get("snapshot_dir", ".bq_snapshots"))
+
+
+def get_table_modified(table: str) -> int | None:
+    """テーブルの最終更新時刻（UNIX 秒）。ビュー・取得失敗時は None"""
+    try:
+        t = get_bq_client().get_table(table_id(table))
+    except Exception:
+        return None
+    if t.table_type != "TABLE" or t.modified is None:
+        return None
+    return int(t.modified.timestamp())
+
+
+def _query_key(query: str, params: list | None) -> str:
+    raw = json.dumps([query, [p.to_api_repr() for p in params or []]], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+# 差分取得の基準列。上流は 0/6/12/18 時に更新されるが、値が動くのは直近の配信月だけなので、
+# 締まった月はスナップショットのまま使い、直近2か月（＋配信月 NULL の行）だけを取り直す。
+MONTH_COL = "配信月"
+
+
+def _fetch_delta(
+    query: str, params: list | None, table: str, month_col: str, cached: pd.DataFrame
+) -> pd.DataFrame | None:
+    """
+    前回スナップショット cached に「直近2か月分の取り直し」を継ぎ足した DataFrame を返す。
+    - 差分が作れない（列が変わった・月が1つしかない等）場合は None → 呼び出し側でフル取得。
+    """
+    if month_col not in cached.columns:
+        return None
+    months = sorted(cached[month_col].dropna().unique())
+    if len(months) < 2:
+        return None
+    open_from = months[-2]
+    ptype = _PARAM_TYPES.get(get_table_schema(table).get(month_col), "STRING")
+    delta_query = (
+        f"SELECT * FROM ({query}) WHERE `{month_col}` >= @open_month OR `{month_col}` IS NULL"
+    )
+    delta_params = list(params or []) + [
+        bigquery.ScalarQueryParameter("open_month", ptype, _to_param_value(open_from))
+    ]
+    delta = run_query(delta_query, delta_params)
+    if list(delta.columns) != list(cached.columns):
+        return None  # スキーマ変更 → フル取得
+    closed = cached[cached[month_col].notna() & (cached[month_col] < open_from)]
+    return pd.concat([closed, delta], ignore_index=True)
+
+
+def run_snapshot_query(
+    table: str, query: str, params: list | None = None, month_col: str | None = None
+) -> pd.DataFrame:
+    """
+    run_query のスナップショット付き版。
+    - 最新スナップショットがあればメモリマップで読み込んで返す。
+    - テーブルが更新されていて month_col 指定がある場合は、前回スナップショットに
+      直近の配信月だけを取り直して継ぎ足す（失敗・スキーマ変更時はフル取得）。
+    - 書き込み後、同じクエリの古いスナップショットは消す。
+    """
+    base = snapshot_dir()
+    modified = get_table_modified(table) if base is not None else None
+    if modified is None:
+        return run_query(query, params)
+
+    prefix = f"{table}-{_query_key(query, params)}-"
+    path = base / f"{prefix}{modified}.parquet"
+    if path.exists():
+        try:
+            return pd.read_parquet(path, memory_map=True)
+        except Exception:
+            pass  # 壊れたファイルは取り直して上書き
+
+    df = None
+    if month_col:
+        previous = sorted(base.glob(f"{prefix}*.parquet"), key=lambda f: f.stat().st_mtime)
+        if previous:
+            try:
+                df = _fetch_delta(query, params, table, month_col, pd.read_parquet(previous[-1]))
+            except Exception:
+                df = None
+    if df is None:
+        df = run_query(query, params)
+
+    # 呼び出し側が列を差し替えても（as_categories 等）書き込み中の内容が変わらないよう浅いコピーを渡す
+    threading.Thread(
+        target=_write_snapshot, args=(df.copy(deep=False), base, prefix, path),
+        name="bq-snapshot", daemon=True,
+    ).start()
+    return df
+
+
+def _write_snapshot(df: pd.DataFrame, base: Path, prefix: str, path: Path):
+    try:
+        base.mkdir(parents=True, exist_ok=True)
+        # プロセス・スレッドごとに別の一時ファイル（並列ロード・ウォームアップ・裏更新の同時書き込み対策）
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)  # 書き込み途中のファイルを他プロセスに読ませない
+        for old in base.glob(f"{prefix}*.parquet"):
+            if old != path:
+                old.unlink(missing_ok=True)
+    except Exception:
+        pass  # 書けなくても表示は続ける（次回も BigQuery から取得）
+
+
+def _select(
+    table: str,
+    columns: tuple[str, ...] | None = None,
+    filters: dict | None = None,
+) -> pd.DataFrame:
+    query, params = select_query(table, columns, filters)
+    if params:
+        return run_query(query, params)  # フィルターつきはスナップショットしない
+    return run_snapshot_query(table, query, params, month_col=MONTH_COL)
+
+
+def load_filter_options(table: str, columns: tuple[str, ...]) -> dict[str, list]:
+    """
+    フィルター UI の選択肢用に、各列の DISTINCT 値を1クエリでまとめて取得する。
+    - 数値列を読まないので、全件ロードより大幅に軽い。
+    - テーブルに無い列は空リスト。
+    - テーブルの版数・データ世代（裏更新）が変わるか、1時間たつと取り直す。
+    """
+    return _load_filter_options(table, columns, versions=data_version(table))
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def _load_filter_options(table: str, columns: tuple[str, ...], versions: tuple = ()) -> dict[str, list]:
+    schema = get_table_schema(table)
+    cols = [c for c in columns if c in schema]
+    options = {c: [] for c in columns}
+    if not cols:
+        return options
+    select_list = ", ".join(
+        f"ARRAY_AGG(DISTINCT `{c}` IGNORE NULLS) AS c{i}" for i, c in enumerate(cols)
+    )
+    df = run_query(f"SELECT {select_list} FROM `{table_id(table)}`")
+    if df.empty:
+        return options
+    row = df.iloc[0]
+    for i, c in enumerate(cols):
+        vals = row[f"c{i}"]
+        options[c] = list(vals) if vals is not None else []
+    return options
+
+
+# ===== テーブル別キャッシュ版数 =====
+# st.cache_data.clear() は全ユーザー・全テーブルのキャッシュを捨ててしまうため、
+# 設定ページで保存したときは invalidate_table() でそのテーブルの版数だけを上げる。
+# @versioned(テーブル, ...) を付けたローダーは依存テーブルの版数をキャッシュキーに含むので、
+# 版数が上がったローダーだけが次回取り直しになる（Final_Ad_Data_Last 等はそのまま）。
+# @frame_cached のローダーは、クエリが実際に読むテーブルの版数を FrameCache 側で持つ。
+_versions_lock = threading.Lock()
+
+
+@st.cache_resource
+def _table_versions() -> dict[str, int]:
+    """プロセス内で共有する {テーブル名: 版数}"""
+    return {}
+
+
+def table_versions(*tables: str) -> tuple[int, ...]:
+    versions = _table_versions()
+    return tuple(versions.get(t, 0) for t in tables)
+
+
+def invalidate_table(*tables: str):
+    """保存・削除したテーブルの版数を上げる"""
+    with _versions_lock:
+        versions = _table_versions()
+        for t in tables:
+            versions[t] = versions.get(t, 0) + 1
+    # 保存で列が増減することがあるのでスキーマも取り直す（メタデータだけなので軽い）
+    get_table_schema.clear()
+
+
+def data_version(*tables: str) -> tuple:
+    """
+    表示中データの版（保存による版数＋裏更新・クリアの世代）。
+    - グラフなど、データから作る派生物のキャッシュキーに使う。
+    """
+    cache = get_frame_cache()
+    return tuple((v, cache.generation(t)) for t, v in zip(tables, table_versions(*tables)))
+
+
+def versioned(*tables: str):
+    """
+    st.cache_data 関数のキャッシュキーに依存テーブルの版数を足すデコレーター。
+    - @st.cache_data の外側に付け、関数側は引数 versions=() を受け取るようにする。
+    """
+    def decorator(cached_func):
+        @functools.wraps(cached_func)
+        def wrapper(*args, **kwargs):
+            return cached_func(*args, versions=table_versions(*tables), **kwargs)
+        return wrapper
+    return decorator
+
+
+# ===== 容量上限つきフレームキャッシュ（大きいテーブル用） =====
+# st.cache_data は上限なしで、フィルター条件・版数の組み合わせごとに全コピーを持ち続けるため、
+# 大きいテーブルのローダーは @frame_cached(テーブル) でこのキャッシュに載せる。
+#   - テーブルごとのバイト上限を超えたら、最後に使われたのが古いものから捨てる（LRU）
+#   - エントリは実際に読んだテーブル（本体＋depends＋フィルター解決用の参照テーブル）の版数を持ち、
+#     どれかの版数が上がったエントリだけを、同じテーブルに新しいエントリを入れた時点で捨てる
+#     （ClientSettings の保存で、ClientSettings を読んでいない Final_Ad_Data_Last のフレームは捨てない）
+#   - 件数・バイト数・ヒット/ミス・破棄数を stats() で確認できる（My Settings に表示）
+# 上限は secrets.toml の [bigquery_options] cache_budget_mb（テーブル共通、既定 512）、
+# 個別に変えたいテーブルは [bigquery_options.cache_budgets_mb] テーブル名 = MB で指定する。
+DEFAULT_CACHE_BUDGET_MB = 512
+
+
+class FrameCache:
+    def __init__(self, budget_mb: int, budgets_mb: dict | None = None):
+        self.budget = budget_mb * 1024 * 1024
+        self.budgets = {t: mb * 1024 * 1024 for t, mb in (budgets_mb or {}).items()}
+        self._lock = threading.Lock()
+        # table -> {key: entry}
+        #   entry = {"versions", "df", "nbytes", "loader", "tables", "modified", "loaded_at"}
+        self._entries: dict[str, OrderedDict] = {}
+        self._stats: dict[str, dict[str, int]] = {}
+        # データの世代（裏更新で差し替えるたびにテーブルごとに +1、clear で全体を +1）。グラフのキャッシュキー用
+        self._generations: dict[str, int] = {}
+        self._epoch = 0
+        # 読み込み中の (table, key, versions) -> Future。同じ条件の同時ミスは1回の取得を待ち合わせる
+        #   versions は entry["tables"] の版数（table_versions）
+        self._inflight: dict[tuple, Future] = {}
+
+    def _table_stats(self, table: str) -> dict[str, int]:
+        return self._stats.setdefault(table, {"hits": 0, "misses": 0, "evictions": 0, "refreshes": 0})
+
+    def get_or_load(
+        self, table: str, key: str, loader,
+        spinner: str | None = None, index_cols: tuple[str, ...] | None = None,
+        depends: tuple[str, ...] = (),
+    ):
+        """
+        キャッシュ済みフレームのコピーを返す（無ければ loader で取得して登録）。
+        - index_cols 指定時は (DataFrame, FilterIndex) を返す。索引は同じエントリに1回だけ作って使い回す。
+        - depends は loader が table 以外に読むテーブル。版数（保存時の取り直し）と裏更新の鮮度判定に使う。
+        - 同じ条件をほかのスレッド（ウォームアップ・別セッション）が読み込み中なら、その結果を待つ。
+        """
+        tables = (table, *dict.fromkeys(t for t in depends if t != table))
+        versions = table_versions(*tables)
+        flight_key = (table, key, versions)
+        with self._lock:
+            entries = self._entries.setdefault(table, OrderedDict())
+            stats = self._table_stats(table)
+            hit = entries.get(key)
+            if hit is not None and hit["versions"] == versions:
+                entries.move_to_end(key)
+                stats["hits"] += 1
+                return self._result(table, hit, index_cols)
+            flight = self._inflight.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[flight_key] = Future()
+                stats["misses"] += 1
+            else:
+                stats["hits"] += 1
+
+        if not leader:
+            with st.spinner(spinner) if spinner else contextlib.nullcontext():
+                entry = flight.result()  # 読み込み側の例外はそのまま送出される
+            return self._result(table, entry, index_cols)
+
+        # 取得中はロックを持たない（他テーブル・他条件の読み込みを止めない）
+        try:
+            with st.spinner(spinner) if spinner else contextlib.nullcontext():
+                modified = tuple(get_table_modified(t) for t in tables)
+                df = loader()
+            entry = _new_entry(versions, df, loader, tables, modified)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+            flight.set_exception(e)
+            raise
+
+        with self._lock:
+            entries = self._entries.setdefault(table, OrderedDict())
+            stats = self._table_stats(table)
+            # このエントリが読むテーブルの版数だけを見る（他のローダー・条件のエントリには影響しない）
+            for k in [k for k, e in entries.items() if k != key and table_versions(*e["tables"]) != e["versions"]]:
+                del entries[k]
+                stats["evictions"] += 1
+            entries[key] = entry
+            entries.move_to_end(key)
+            budget = self.budgets.get(table, self.budget)
+            while len(entries) > 1 and sum(e["nbytes"] for e in entries.values()) > budget:
+                entries.popitem(last=False)
+                stats["evictions"] += 1
+            self._inflight.pop(flight_key, None)
+        flight.set_result(entry)
+        return self._result(table, entry, index_cols)
+
+    def _result(self, table: str, entry: dict, index_cols: tuple[str, ...] | None):
+        df = entry["df"].copy()
+        if index_cols is None:
+            return df
+        index = entry["indexes"].get(index_cols)
+        if index is None:
+            index = FilterIndex(entry["df"], index_cols)  # 同じエントリの df から作るので行順が一致する
+            with self._lock:
+                entry["indexes"][index_cols] = index
+                entry["nbytes"] += index.nbytes
+        return df, index
+
+    def refresh_stale(self):
+        """
+        上流が更新されたエントリを裏で取り直して差し替える（stale-while-revalidate）。
+        - テーブル: 読んだテーブル（depends 含む）の get_table().modified が読み込み時から変わっていたら対象
+        - ビュー: 最終更新時刻が取れないので、直近の取り込み枠より前に読んだものを対象
+        - 取り直している間も利用者には古いフレームを返し、完成したら1件ずつロック内で入れ替える
+        """
+        with self._lock:
+            targets = [(t, k, e) for t, entries in self._entries.items() for k, e in entries.items()]
+        modified = {t: get_table_modified(t) for t in {t for _, _, e in targets for t in e["tables"]}}
+        ingest_at = last_ingest_time().timestamp()
+        for table, key, entry in targets:
+            m = tuple(modified[t] for t in entry["tables"])
+            stale = entry["modified"] != m or (None in m and entry["loaded_at"] < ingest_at)
+            if not stale:
+                continue
+            try:
+                fresh = _new_entry(entry["versions"], entry["loader"](), entry["loader"], entry["tables"], m)
+            except Exception:
+                continue  # 次回の確認で再挑戦（古いフレームはそのまま使える）
+            with self._lock:
+                entries = self._entries.get(table, {})
+                if entries.get(key) is entry:  # 取り直し中に破棄・差し替えされていなければ
+                    entries[key] = fresh
+                    self._table_stats(table)["refreshes"] += 1
+                    self._generations[table] = self._generations.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
+
+    def generation(self, table: str) -> tuple[int, int]:
+        """table のデータ世代（裏更新・クリアで変わる）"""
+        with self._lock:
+            return self._epoch, self._generations.get(table, 0)
+
+    def stats(self) -> pd.DataFrame:
+        """テーブルごとの件数・使用量・上限・ヒット/ミス・破棄数・裏更新数"""
+        with self._lock:
+            rows = []
+            for table, counts in self._stats.items():
+                entries = self._entries.get(table, {})
+                rows.append({
+                    "テーブル": table,
+                    "件数": len(entries),
+                    "使用量(MB)": round(sum(e["nbytes"] for e in entries.values()) / 1024 / 1024, 1),
+                    "上限(MB)": round(self.budgets.get(table, self.budget) / 1024 / 1024),
+                    "ヒット": counts["hits"],
+                    "ミス": counts["misses"],
+                    "破棄": counts["evictions"],
+                    "裏更新": counts["refreshes"],
+                })
+        return pd.DataFrame(rows)
+
+
+def _new_entry(
+    versions: tuple, df: pd.DataFrame, loader, tables: tuple[str, ...], modified: tuple[int | None, ...],
+) -> dict:
+    return {
+        "versions": versions,
+        "df": df,
+        "nbytes": int(df.memory_usage(deep=True).sum()),
+        "loader": loader,
+        "tables": tables,
+        "modified": modified,
+        "loaded_at": time.time(),
+        "indexes": {},  # index_cols -> FilterIndex（初回利用時に作成）
+    }
+
+
+# ===== 取り込みスケジュールに合わせた裏更新 =====
+# 上流テーブルは毎日 0/6/12/18 時（日本時間）に更新される。
+# 取り込み直後の1時間は5分おき、それ以外は30分おきにテーブルの最終更新時刻だけを確認し、
+# 変わっていたらキャッシュ済みのフレームを裏で作り直して差し替える。
+# → 利用者は常に温まったキャッシュを使え、My Settings のキャッシュクリアは基本不要になる。
+# secrets.toml の [bigquery_options] background_refresh = false で無効化できる。
+INGEST_HOURS = (0, 6, 12, 18)
+INGEST_GRACE = timedelta(minutes=30)  # 取り込み完了までの目安（ビューの作り直し判定用）
+TOKYO = ZoneInfo("Asia/Tokyo")
+
+
+def last_ingest_time(now: datetime | None = None) -> datetime:
+    """直近の取り込み完了見込み時刻（取り込み時刻 + INGEST_GRACE）"""
+    now = now or datetime.now(TOKYO)
+    day = now.replace(minute=0, second=0, microsecond=0)
+    slots = [day.replace(hour=h) + INGEST_GRACE for h in INGEST_HOURS]
+    past = [s for s in slots if s <= now]
+    return max(past) if past else slots[-1] - timedelta(days=1)
+
+
+def _next_check_delay(now: datetime | None = None) -> float:
+    now = now or datetime.now(TOKYO)
+    return 5 * 60 if now.hour in INGEST_HOURS else 30 * 60
+
+
+def _refresh_loop(cache: FrameCache):
+    while True:
+        time.sleep(_next_check_delay())
+        try:
+            cache.refresh_stale()
+        except Exception:
+            pass  # 更新確認の失敗でスレッドを止めない
+
+
+@st.cache_resource
+def get_frame_cache() -> FrameCache:
+    """
+    プロセス共通の FrameCache。作成時に裏更新スレッドも1本だけ起動する。
+    - どのページから最初にアクセスしても、ここでウォームアップ（warmup.py）を開始する。
+    """
+    opts = st.secrets.get("bigquery_options", {})
+    cache = FrameCache(
+        int(opts.get("cache_budget_mb", DEFAULT_CACHE_BUDGET_MB)),
+        dict(opts.get("cache_budgets_mb", {})),
+    )
+    if opts.get("background_refresh", True):
+        threading.Thread(target=_refresh_loop, args=(cache,), name="bq-refresh", daemon=True).start()
+    # セッション外（`python warmup.py` など）から作られた場合は開始しない
+    if opts.get("warmup", True) and get_script_run_ctx() is not None:
+        from warmup import start_warmup  # warmup は bq_data を import するのでここで読む
+        start_warmup()
+    return cache
+
+
+def _cache_key(name: str, signature: inspect.Signature, args: tuple, kwargs: dict) -> str:
+    """
+    引数を名前付きに揃えてキー化する。
+    - 位置引数/キーワード引数/既定値の違いで別キーにならないようにする。
+    - filters の空リスト（＝すべて）は条件なしと同じキーにする（未選択の Ad Drive とウォームアップを一致させる）。
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    values = {}
+    for k, v in bound.arguments.items():
+        if isinstance(v, dict):
+            v = {c: vals for c, vals in v.items() if vals is not None and len(vals) > 0} or None
+        values[k] = v
+    return json.dumps([name, values], sort_keys=True, default=str)
+
+
+def frame_cached(table: str, spinner: str | None = None, depends: tuple[str, ...] = ()):
+    """
+    ローダーを FrameCache に載せるデコレーター（st.cache_data の代わりに使う）。
+    - キーは関数名＋引数。版数は実際に読むテーブル（table・depends・filters 引数の解決に使う
+      参照テーブル）の分だけを持つので、@versioned は付けない。
+    - depends には table 以外に常に読むテーブルを指定する（例: Unit_Drive_Ready_View が参照する UnitMapping）。
+    - 返り値はコピーなので、ページ側で列を足しても共有データは汚れない。
+    - index_cols=(列, ...) を渡すと (DataFrame, FilterIndex) を返す（索引はキャッシュと一緒に保持）。
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, index_cols: tuple[str, ...] | None = None, **kwargs):
+            key = _cache_key(func.__name__, signature, args, kwargs)
+            filters = signature.bind(*args, **kwargs).arguments.get("filters")
+            reads = depends + lookup_tables(table, filters)
+
+            def load():
+                return func(*args, **kwargs)
+
+            return get_frame_cache().get_or_load(table, key, load, spinner, index_cols, reads)
+        return wrapper
+    return decorator
+
+
+# ===== テーブル別ローダー =====
+# 大きいテーブルは TTL なし・容量上限つきの FrameCache（手動クリアまで固定スナップショット）、
+# 設定系の小さいテーブルは ttl=60 で他ユーザーの編集も拾う。
+# columns には各ページが実際に使う列だけを渡す（スキャン量・転送量・キャッシュメモリを削減）。
+# filters は {列名: 選択値リスト}。SQL に押し下げて該当行だけを転送する。
+@frame_cached(FINAL_AD_DATA)
+def load_final_ad_data(
+    columns: tuple[str, ...] | None = None,
+    filters: dict | None = None,
+) -> pd.DataFrame:
+    """Final_Ad_Data_Last（キャンペーン × 配信月の広告数値）。ディメンション列は category"""
+    return as_categories(_select(FINAL_AD_DATA, columns, filters))
+
+
+@frame_cached(BANNER_DRIVE)
+def load_banner_drive(
+    columns: tuple[str, ...] | None = None,
+    filters: dict | None = None,
+) -> pd.DataFrame:
+    """Banner_Drive_Ready（バナー単位の広告数値・画像URL）。ディメンション列は category"""
+    return as_categories(_select(BANNER_DRIVE, columns, filters))
+
+
+@frame_cached(UNIT_DRIVE, spinner="データ取得中…", depends=(UNIT_MAPPING,))
+def load_unit_drive(columns: tuple[str, ...] | None = None) -> pd.DataFrame:
+    """Unit_Drive_Ready_View（Unit Score 用のキャンペーン明細）。ディメンション列は category"""
+    return as_categories(_select(UNIT_DRIVE, columns))
+
+
+@versioned(LP_SCORE)
+@st.cache_data(ttl=60, show_spinner=False)
+def load_lp_score(versions: tuple = ()) -> pd.DataFrame:
+    """LP_Score_Ready（LP/URL 単位の集計）。消化金額の多い順で返す"""
+    return run_snapshot_query(LP_SCORE, f"""
+        SELECT
+          client_name,
+          `URL`,
+          `メインカテゴリ`,
+          `サブカテゴリ`,
+          `広告目的`,
+          `広告媒体`,
+          Cost,
+          Impressions,
+          Clicks,
+          `コンバージョン数`,
+          CPA,
+          CPC,
+          CPM,
+          CVR,
+          CTR
+        FROM `{table_id(LP_SCORE)}`
+        ORDER BY Cost DESC
+    """)
+
+
+@versioned(CLIENT_SETTINGS)
+@st.cache_data(ttl=60, show_spinner=False)
+def load_client_settings(columns: tuple[str, ...] | None = None, versions: tuple = ()) -> pd.DataFrame:
+    """ClientSettings（クライアント設定。棟数セグメント・URL など）"""
+    return _select(CLIENT_SETTINGS, columns)
+
+
+@versioned(KPI_SETTINGS)
+@st.cache_data(ttl=60, show_spinner=False)
+def load_kpi_settings(columns: tuple[str, ...] | None = None, versions: tuple = ()) -> pd.DataFrame:
+    """Target_Indicators_Meta（媒体 × カテゴリ × 目的ごとの KPI 閾値）"""
+    return _select(KPI_SETTINGS, columns)
+
+
+# ===== サーバー側集計 =====
+@frame_cached(FINAL_AD_DATA)
+def load_monthly_totals(filters: dict | None = None) -> pd.DataFrame:
+    """
+    Final_Ad_Data_Last を配信月ごとに GROUP BY した合計値（数十行）。
+    - スコアカード・月別推移グラフはこの合計だけで描けるので、明細を転送しない。
+    - 列: 配信月, Cost, Clicks, Impressions, conv_total
+    """
+    where, params = build_where(FINAL_AD_DATA, filters)
+    query = f"""
+        SELECT
+          `配信月`,
+          SUM(SAFE_CAST(Cost AS FLOAT64)) AS Cost,
+          SUM(SAFE_CAST(Clicks AS FLOAT64)) AS Clicks,
+          SUM(SAFE_CAST(Impressions AS FLOAT64)) AS Impressions,
+          SUM(SAFE_CAST(`コンバージョン数` AS FLOAT64)) AS conv_total
+        FROM `{table_id(FINAL_AD_DATA)}`{where}
+        GROUP BY `配信月`
+        ORDER BY `配信月`
+    """
+    if params:
+        return run_query(query, params)  # フィルターつきはスナップショットしない
+    return run_snapshot_query(FINAL_AD_DATA, query, params)
+
+
+# ===== 月次キューブ =====
+# Final_Ad_Data_Last を「配信月 × ディメンション」の最細粒度で一度だけ GROUP BY した合計表。
+#   - Cost / Clicks / Impressions / conv_total は足し算できるので、ページ側の絞り込み・集計は
+#     明細ではなくこのキューブから rollup() で作れる（行数は明細の数十分の一以下）。
+#   - データ版（versions）ごとに FrameCache に載り、Parquet スナップショット（差分取得つき）にも残る。
+#   - キャンペーン名・広告セット名など粒度の細かい条件は含まないので、cube_covers() で判定して
+#     対応できない場合は従来の明細・サーバー集計を使う。
+CUBE_DIMS = (
+    "配信月", "client_name", "building_count", "広告媒体", "メインカテゴリ",
+    "サブカテゴリ", "特殊カテゴリ", "広告目的", "地方", "都道府県",
+)
+CUBE_MEASURES = ("Cost", "Clicks", "Impressions", "conv_total")
+
+
+@frame_cached(FINAL_AD_DATA)
+def load_ad_cube() -> pd.DataFrame:
+    """
+    月次キューブ（CUBE_DIMS のうちテーブルにある列 × 合計値）。ディメンション列は category
+    - 列: ディメンション..., Cost, Clicks, Impressions, conv_total
+    """
+    schema = get_table_schema(FINAL_AD_DATA)
+    dims = ", ".join(f"`{c}`" for c in CUBE_DIMS if c in schema)
+    query = f"""
+        SELECT
+          {dims},
+          SUM(SAFE_CAST(Cost AS FLOAT64)) AS Cost,
+          SUM(SAFE_CAST(Clicks AS FLOAT64)) AS Clicks,
+          SUM(SAFE_CAST(Impressions AS FLOAT64)) AS Impressions,
+          SUM(SAFE_CAST(`コンバージョン数` AS FLOAT64)) AS conv_total
+        FROM `{table_id(FINAL_AD_DATA)}`
+        GROUP BY {dims}
+    """
+    return as_categories(run_snapshot_query(FINAL_AD_DATA, query, month_col=MONTH_COL))
+
+
+def cube_covers(cube: pd.DataFrame, filters: dict | None) -> bool:
+    """filters の条件（空リストを除く）がすべてキューブの列で表せるか"""
+    return all(
+        col in cube.columns
+        for col, values in (filters or {}).items()
+        if values is not None and len(values) > 0
+    )
+
+
+def rollup(
+    cube: pd.DataFrame,
+    by: list[str] | tuple[str, ...],
+    filters: dict | None = None,
+    index: FilterIndex | None = None,
+) -> pd.DataFrame:
+    """
+    キューブを filters で絞り、by の列ごとに合計値を足し上げる。
+    - index は load_ad_cube(index_cols=CUBE_DIMS) で受け取った索引（省略時は isin）。
+    """
+    df = index_for(cube, index).take(cube, filters) if filters else cube
+    by = [c for c in by if c in df.columns]
+    measures = [c for c in CUBE_MEASURES if c in df.columns]
+    if not by:
+        return df[measures].sum().to_frame().T
+    return df.groupby(by, as_index=False, observed=True, dropna=False)[measures].sum()
+
+
+# ===== 並列ロード =====
+def load_parallel(*calls):
+    """
+    互いに依存しないローダーを同時に実行し、結果を引数と同じ順で返す。
+    - 例: df_num, df_kpi = load_parallel(lambda: load_final_ad_data(COLS), lambda: load_kpi_settings())
+    - 各クエリの待ち時間が重なるので、初回表示は「一番遅いクエリ」分で済む。
+    - ワーカースレッドにもセッションのコンテキストを渡し、st.cache_data をそのまま使えるようにする。
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    ctx = get_script_run_ctx()
+
+    def run(call):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return call()
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = [pool.submit(run, call) for call in calls]
+        return [f.result() for f in futures]
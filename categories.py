@@ -0,0 +1,28 @@
+# categories.py
+# ディメンション列の category 化（streamlit / BigQuery に依存しない共通処理）
+#   - 同じ文字列が全行に繰り返される列は、キャッシュする前に一度だけ pandas の category に変換する
+#   - 値は整数コード＋カテゴリ一覧で持つので、メモリが数分の一になり isin / groupby も速くなる
+#   - ※ ページ側の groupby は observed=True を付ける（付けないと未出現カテゴリの組み合わせまで展開される）
+#   - 文字列列は pandas 2 では object、pandas 3 では str 型で届くので、どちらも対象にする
+import pandas as pd
+from pandas.api.types import is_object_dtype, is_string_dtype
+
+CATEGORY_COLS = (
+    "client_name", "クライアント名", "広告媒体", "メインカテゴリ", "サブカテゴリ", "特殊カテゴリ",
+    "広告目的", "キャンペーン名", "広告セット名", "配信月", "都道府県", "地方", "担当者",
+)
+
+
+def is_text(s: pd.Series) -> bool:
+    """文字列列（object / string / str 型。category 済みは除く）なら True"""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return False
+    return is_object_dtype(s.dtype) or is_string_dtype(s.dtype)
+
+
+def as_categories(df: pd.DataFrame, columns=CATEGORY_COLS) -> pd.DataFrame:
+    """columns のうち文字列列を category に変換する（df 自体を更新して返す）"""
+    for col in columns:
+        if col in df.columns and is_text(df[col]):
+            df[col] = df[col].astype("category")
+    return df
@@ -0,0 +1,63 @@
+# figure_cache.py
+# Plotly グラフの共通キャッシュ
+#   - キーは (グラフ名, データ版, フィルター条件, 今月) など。同じキーなら集計・グラフ組み立てをやり直さない
+#   - 値は {指標名: go.Figure | None}。セクション単位でまとめて保持する
+#     （組み立て済みの Figure を渡すと st.plotly_chart は検証をやり直さない。キャッシュ後は変更しないこと）
+#   - プロセス内で共有（st.cache_resource）し、件数上限を超えたら古いものから捨てる（LRU）
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+FIGURE_CACHE_ENTRIES = 128
+_lock = threading.Lock()
+
+
+@st.cache_resource
+def _figures() -> OrderedDict:
+    return OrderedDict()
+
+
+def _normalize(part):
+    # フィルター dict は空の条件を除き、選択値の並び順に依存しないようにする
+    if isinstance(part, dict):
+        return {
+            str(k): sorted(map(str, v)) if isinstance(v, (list, tuple, set)) else v
+            for k, v in part.items()
+            if v is not None and not (isinstance(v, (list, tuple, set, str)) and len(v) == 0)
+        }
+    return part
+
+
+def figure_key(*parts) -> str:
+    raw = json.dumps([_normalize(p) for p in parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def cached_figures(parts: tuple, build) -> dict:
+    """
+    build() が返す {名前: go.Figure | None} をキー parts で保持して返す。
+    - 返り値はそのまま st.plotly_chart に渡せる。None は「データなし」。
+    - Figure は全セッションで共有するので、呼び出し側で update_layout 等をしない。
+    """
+    key = figure_key(*parts)
+    store = _figures()
+    with _lock:
+        figs = store.get(key)
+        if figs is not None:
+            store.move_to_end(key)
+    if figs is None:
+        figs = build()
+        with _lock:
+            store[key] = figs
+            store.move_to_end(key)
+            while len(store) > FIGURE_CACHE_ENTRIES:
+                store.popitem(last=False)
+    return figs
+
+
+def clear_figures():
+    with _lock:
+        _figures().clear()
@@ -0,0 +1,80 @@
+# filter_index.py
+# 複数ディメンションの絞り込みを「値 → 行番号配列」の事前索引で行う共通モジュール
+#   - 索引はキャッシュ済みテーブルごとに1回だけ作る（bq_data の frame_cached ローダーに index_cols を渡す）
+#   - 絞り込みは「列内は OR（選択値の行番号をまとめて立てる）」「列間は AND」で真偽配列を作り、最後に1回 take するだけ
+#   - 索引に無い列は従来どおり isin で判定するので、どのページの DataFrame にもそのまま使える
+#   - 選択値は factorize したユニーク値（pd.Index）で引くので、isin と同じく 1 と 1.0 も一致する
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    def __init__(self, df: pd.DataFrame, columns: tuple[str, ...] = ()):
+        self.n = len(df)
+        # 列名 -> (ユニーク値, [ユニーク値ごとの行番号の配列], 欠損の行番号の配列)
+        self._rows: dict[str, tuple[pd.Index, list[np.ndarray], np.ndarray]] = {}
+        row_dtype = np.int32 if self.n < 2**31 else np.int64
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col])  # 欠損は -1
+            order = np.argsort(codes, kind="stable").astype(row_dtype)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            n_missing = int((codes < 0).sum())
+            bounds = np.concatenate(([0], np.cumsum(counts))) + n_missing
+            self._rows[col] = (
+                pd.Index(uniques),
+                [order[bounds[i]:bounds[i + 1]] for i in range(len(uniques))],
+                order[:n_missing],
+            )
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self._rows)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            uniques.memory_usage(deep=True) + missing.nbytes + sum(a.nbytes for a in groups)
+            for uniques, groups, missing in self._rows.values()
+        )
+
+    def mask(self, filters: dict, df: pd.DataFrame | None = None) -> np.ndarray:
+        """
+        {列名: 選択値リスト} を満たす行の真偽配列。
+        - 空リスト（＝すべて）は条件に含めない。
+        - 索引に無い列は df の isin で判定し、df にも無い列は条件に含めない。
+        """
+        result = np.ones(self.n, dtype=bool)
+        for col, values in filters.items():
+            if values is None or len(values) == 0:
+                continue
+            if col in self._rows:
+                uniques, groups, missing = self._rows[col]
+                values = list(values)
+                hit = np.zeros(self.n, dtype=bool)
+                for pos in uniques.get_indexer(pd.Index(values, dtype=object)):
+                    if pos >= 0:
+                        hit[groups[pos]] = True
+                if any(pd.isna(v) for v in values):  # isin と同じく欠損の選択は欠損行に一致
+                    hit[missing] = True
+            elif df is not None and col in df.columns:
+                hit = df[col].isin(values).to_numpy()
+            else:
+                continue
+            result &= hit
+        return result
+
+    def take(self, df: pd.DataFrame, filters: dict) -> pd.DataFrame:
+        """条件に合う行だけを1回の take で取り出す（索引を作った DataFrame と同じ行順であること）"""
+        return df.take(np.flatnonzero(self.mask(filters, df)))
+
+
+def index_for(df: pd.DataFrame, index: FilterIndex | None) -> FilterIndex:
+    """
+    df に使える索引を返す。
+    - 行数が合わない（merge で行が増えた等）・索引なしの場合は、列を持たない索引（＝全列 isin）を返す。
+    """
+    if index is not None and index.n == len(df):
+        return index
+    return FilterIndex(df)
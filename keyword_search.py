@@ -0,0 +1,68 @@
+# keyword_search.py
+# 広告セット名などのキーワード検索（ベクトル化）
+#   書き方（大文字小文字は区別しない）:
+#     動画,静止画          … どちらかを含む（OR。従来どおり半角カンマ区切り。「 OR 」も可）
+#     動画&Instagram       … 両方を含む（AND。「 AND 」も可）
+#     -テスト / NOT テスト … 含まない（NOT。& と組み合わせて 動画&-テスト のように使う）
+#   判定は行ごとではなく「ユニーク値」に対して1回だけ行い、行へは整数コードで展開する。
+#   → 同じ広告セット名が何十万行に繰り返されても、文字列処理はユニーク値の数だけで済む。
+import re
+
+import numpy as np
+import pandas as pd
+
+_OR = re.compile(r",|\s+OR\s+")
+_AND = re.compile(r"&|\s+AND\s+")
+
+
+def parse_query(text: str) -> list[list[tuple[str, bool]]]:
+    """
+    検索文字列を [[(語, 否定か), ...], ...] に分解する。
+    - 外側のリストが OR、内側のリストが AND。語は小文字化済み。
+    """
+    groups = []
+    for part in _OR.split(text or ""):
+        terms = []
+        for raw in _AND.split(part):
+            word, negate = raw.strip(), False
+            if word.startswith("-"):
+                word, negate = word[1:].strip(), True
+            elif word.upper().startswith("NOT "):
+                word, negate = word[4:].strip(), True
+            if word:
+                terms.append((word.lower(), negate))
+        if terms:
+            groups.append(terms)
+    return groups
+
+
+def _match(lower: pd.Series, groups: list[list[tuple[str, bool]]]) -> np.ndarray:
+    result = np.zeros(len(lower), dtype=bool)
+    # 1語だけの OR 条件はまとめて1本の正規表現で判定
+    singles = [g[0][0] for g in groups if len(g) == 1 and not g[0][1]]
+    if singles:
+        pattern = "|".join(re.escape(w) for w in singles)
+        result |= lower.str.contains(pattern, regex=True).to_numpy()
+    for group in groups:
+        if len(group) == 1 and not group[0][1]:
+            continue
+        hit = np.ones(len(lower), dtype=bool)
+        for word, negate in group:
+            found = lower.str.contains(word, regex=False).to_numpy()
+            hit &= ~found if negate else found
+        result |= hit
+    return result
+
+
+def keyword_mask(values: pd.Series, text: str) -> np.ndarray:
+    """
+    values（文字列 or category 列）のうち、検索条件に合う行の真偽配列。
+    - 条件が空なら全行 True。欠損値の行は条件によらず False（「-テスト」だけの条件でも合わない）。
+    """
+    groups = parse_query(text)
+    if not groups:
+        return np.ones(len(values), dtype=bool)
+    codes, uniques = pd.factorize(values)
+    lower = pd.Series([str(u) for u in uniques], dtype=object).str.lower()
+    matched = np.append(_match(lower, groups), False)  # 末尾は欠損（コード -1）用
+    return matched[codes]
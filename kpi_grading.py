@@ -0,0 +1,100 @@
+# kpi_grading.py
+# KPI 評価（◎○△×）の共通ロジック（ベクトル化）
+#   - 閾値は KPI マスタの *_best / *_good / *_min 列
+#   - CPA/CPC/CPM は小さいほど良い、CVR/CTR は大きいほど良い
+#   - 行ごとの apply ではなく np.select で列全体を一度に判定する
+import numpy as np
+import pandas as pd
+
+LOWER_IS_BETTER = ("CPA", "CPC", "CPM")
+HIGHER_IS_BETTER = ("CVR", "CTR")
+METRICS = LOWER_IS_BETTER + HIGHER_IS_BETTER
+
+MARKS = ("◎", "○", "△", "×")
+
+
+def _num(values, n: int | None = None) -> np.ndarray:
+    """Series/配列/None を float の ndarray に（変換できない値は NaN）"""
+    if values is None:
+        return np.full(n or 0, np.nan)
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def grade(
+    values,
+    best,
+    good,
+    min_,
+    *,
+    higher_is_better: bool = False,
+    marks: tuple[str, str, str, str] = MARKS,
+    strict: bool = True,
+) -> np.ndarray:
+    """
+    実績値と閾値3段階から評価記号の配列（object, 判定不能は None）を返す。
+    - strict=True : 実績値と閾値がすべて揃っている行だけ評価
+    - strict=False: 揃っている閾値だけで判定し、× は実績値と best がある行のみ
+    """
+    v = _num(values)
+    b, g, m = (_num(x, len(v)) for x in (best, good, min_))
+    cmp = np.greater_equal if higher_is_better else np.less_equal
+    with np.errstate(invalid="ignore"):
+        conds = [cmp(v, b), cmp(v, g), cmp(v, m)]
+    has_v = ~np.isnan(v)
+    if strict:
+        valid = has_v & ~np.isnan(b) & ~np.isnan(g) & ~np.isnan(m)
+    else:
+        valid = has_v & ~np.isnan(b)
+    out = np.select(conds, list(marks[:3]), default=marks[3]).astype(object)
+    if not strict:
+        valid |= has_v & (conds[0] | conds[1] | conds[2])
+    out[~valid] = None
+    return out
+
+
+def grade_metric(df: pd.DataFrame, metric: str, **kwargs) -> np.ndarray:
+    """df の metric 列と metric_best/_good/_min 列で評価（列が無ければ None）"""
+    if metric not in df.columns:
+        return np.full(len(df), None, dtype=object)
+    kwargs.setdefault("higher_is_better", metric in HIGHER_IS_BETTER)
+    return grade(
+        df[metric],
+        df.get(f"{metric}_best"),
+        df.get(f"{metric}_good"),
+        df.get(f"{metric}_min"),
+        **kwargs,
+    )
+
+
+def grade_frame(df: pd.DataFrame, metrics=METRICS, suffix: str = "_評価", **kwargs) -> pd.DataFrame:
+    """metrics すべての評価列（例: CPA_評価）を df に追加して返す"""
+    for metric in metrics:
+        df[f"{metric}{suffix}"] = grade_metric(df, metric, **kwargs)
+    return df
+
+
+def meets_target(values, target, marks: tuple[str, str] = ("〇", "✕"), no_target: str = "個別目標なし") -> np.ndarray:
+    """
+    個別目標（小さいほど良い）との比較。
+    - 目標なし → no_target、実績なし → None、以下なら marks[0]、超えたら marks[1]
+    """
+    v, t = _num(values), _num(target)
+    with np.errstate(invalid="ignore"):
+        ok = v <= t
+    out = np.where(ok, marks[0], marks[1]).astype(object)
+    out[np.isnan(v)] = None
+    out[np.isnan(t)] = no_target
+    return out
+
+
+def meets_any(values, *targets) -> np.ndarray:
+    """
+    いずれかの目標（小さいほど良い）以下なら True の bool 配列。
+    - 実績・目標の欠損（nullable 型の <NA> を含む）は「満たさない」扱い
+    """
+    v = _num(values)
+    ok = np.zeros(len(v), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        for target in targets:
+            ok |= v <= _num(target, len(v))  # NaN との比較は False
+    return ok
@@ -0,0 +1,61 @@
+# metrics.py
+# 広告指標（CPA/CVR/CTR/CPC/CPM）の共通計算
+#   - 集計済みの DataFrame に対し、列単位で一度に算出する（行ごとの apply は使わない）
+#   - 分母が 0 / 負 / 欠損、または分子が欠損なら NaN（inf は出さない。入力の ±inf も欠損扱い）
+import numpy as np
+import pandas as pd
+
+# 指標名 → (分子, 分母, 倍率)。分子・分母は add_metrics の引数名
+RATIOS: dict[str, tuple[str, str, float]] = {
+    "CPA": ("cost", "conversions", 1.0),
+    "CVR": ("conversions", "clicks", 1.0),
+    "CTR": ("clicks", "impressions", 1.0),
+    "CPC": ("cost", "clicks", 1.0),
+    "CPM": ("cost", "impressions", 1000.0),
+}
+METRICS = tuple(RATIOS)
+
+
+def _num(values) -> np.ndarray:
+    return pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+
+def safe_div(num, den, scale: float = 1.0) -> np.ndarray:
+    """
+    num * scale / den。den <= 0・欠損、num 欠損は NaN
+    - num・den がどちらも Series なら den を num の index に揃える（結果は num の行順）
+    """
+    if isinstance(num, pd.Series) and isinstance(den, pd.Series):
+        den = den.reindex(num.index)
+    n, d = _num(num), _num(den)
+    ok = (d > 0) & np.isfinite(d) & np.isfinite(n)
+    out = np.full(len(d), np.nan)
+    np.divide(n * scale, d, out=out, where=ok)
+    return out
+
+
+def safe_ratio(num, den, scale: float = 1.0) -> float | None:
+    """スカラー版（合計値のスコアカード用）。計算できなければ None"""
+    value = safe_div([num], [den], scale)[0]
+    return None if np.isnan(value) else float(value)
+
+
+def add_metrics(
+    df: pd.DataFrame,
+    metrics=METRICS,
+    *,
+    cost: str = "Cost",
+    clicks: str = "Clicks",
+    impressions: str = "Impressions",
+    conversions: str = "conv_total",
+) -> pd.DataFrame:
+    """
+    df に指標列を追加して返す（df 自体を更新）。
+    - 元になる列が無い指標はスキップ
+    """
+    cols = {"cost": cost, "clicks": clicks, "impressions": impressions, "conversions": conversions}
+    for metric in metrics:
+        num, den, scale = RATIOS[metric]
+        if cols[num] in df.columns and cols[den] in df.columns:
+            df[metric] = safe_div(df[cols[num]], df[cols[den]], scale)
+    return df
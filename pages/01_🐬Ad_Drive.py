@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
-from google.cloud import bigquery
 import re
 import html
 import numpy as np
 import plotly.graph_objects as go  # ← 追加
 
+# 重いセクションは st.fragment で包み、セクション内の操作ではそのセクションだけ再実行する
+#   （引数は最後のフル実行時の値が使われるので、データ取得・絞り込みはやり直さない）
+#   ※ st.fragment が無い古い Streamlit では通常の関数として動く
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
 # ──────────────────────────────────────────────
 # ログイン認証
 # ──────────────────────────────────────────────
@@ -39,57 +43,33 @@ st.markdown(
 )
 
 # ──────────────────────────────────────────────
-# BigQuery クライアント & データ取得をキャッシュ
+# データ取得（BigQuery クライアント・キャッシュは bq_data で共通化）
 # ──────────────────────────────────────────────
-@st.cache_resource
-def get_bq_client():
-    cred = dict(st.secrets["connections"]["bigquery"])
-    cred["private_key"] = cred["private_key"].replace("\\n", "\n")
-    return bigquery.Client.from_service_account_info(cred)
-
-# ここはそのまま
-bq = get_bq_client()
-
-# 版数の取得（未設定なら0）
-ver = st.session_state.get("data_version", 0)
-last_loaded_ver = st.session_state.get("last_loaded_version", -1)
-
-# 既存のキャッシュ関数（そのままでOK）
-@st.cache_data
-def load_df_num(ver_key: int):
-    # ver_key はキャッシュキー用のダミー引数
-    return bq.query("SELECT * FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Final_Ad_Data_Last`").to_dataframe()
-
-@st.cache_data
-def load_df_banner(ver_key: int):
-    return bq.query("SELECT * FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Banner_Drive_Ready`").to_dataframe()
-
-@st.cache_data
-def load_settings(ver_key: int):
-    return bq.query("SELECT client_name, building_count FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.ClientSettings`").to_dataframe()
-
-# KPI設定のロード（SHO-SAN market と同様）
-@st.cache_data
-def load_kpi_settings(ver_key: int):
-    return bq.query("SELECT * FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Target_Indicators_Meta`").to_dataframe()
-
-# ★ スピナー制御付きロード
-if last_loaded_ver != ver:
-    # 版数が変わっている＝キャッシュクリア直後や初回 → スピナー＋生クエリ
-    with st.spinner("⏳ 初回データ読み込み中…"):
-        df_num = bq.query("SELECT * FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Final_Ad_Data_Last`").to_dataframe()
-        df_banner = bq.query("SELECT * FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Banner_Drive_Ready`").to_dataframe()
-        settings_df = bq.query("SELECT client_name, building_count FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.ClientSettings`").to_dataframe()
-    # 読み終えた版数を記録
-    st.session_state["last_loaded_version"] = ver
-else:
-    # 版数が同じ＝通常時 → キャッシュ経由（爆速）
-    df_num = load_df_num(ver)
-    df_banner = load_df_banner(ver)
-    settings_df = load_settings(ver)
-
-# KPI設定も読み込み
-df_kpi = load_kpi_settings(ver)
+from bq_data import (
+    CLIENT_SETTINGS, CUBE_DIMS, FINAL_AD_DATA, KPI_SETTINGS, cube_covers, data_version,
+    load_ad_cube, load_filter_options, load_final_ad_data, load_banner_drive, load_client_settings,
+    load_kpi_settings, load_monthly_totals, load_parallel, rollup,
+)
+# このページで使う列（ウォームアップと共有するため bq_data で定義）
+from bq_data import (
+    AD_DRIVE_NUM_COLS as NUM_COLS,
+    AD_DRIVE_BANNER_COLS as BANNER_COLS,
+    AD_DRIVE_SETTINGS_COLS as SETTINGS_COLS,
+    AD_DRIVE_KPI_COLS as KPI_COLS,
+    AD_DRIVE_OPTION_COLS as OPTION_COLS,
+    AD_DRIVE_INDEX_COLS as INDEX_COLS,
+)
+from filter_index import FilterIndex, index_for
+from keyword_search import keyword_mask, parse_query
+from metrics import add_metrics, safe_ratio
+from thumbnails import thumbnail_url
+from figure_cache import cached_figures
+
+# KPI設定と選択肢は互いに独立しているので同時に取得
+df_kpi, master = load_parallel(
+    lambda: load_kpi_settings(KPI_COLS),
+    lambda: load_filter_options(FINAL_AD_DATA, OPTION_COLS),
+)
 # SHO-SAN market と同じ固定条件で1行取得
 kpi_row = df_kpi[
     (df_kpi["メインカテゴリ"] == "注文住宅･規格住宅") &
@@ -105,93 +85,54 @@ kpi_dict = {
     "CPM": kpi_row["CPM_good"],
 }
 
-# Banner 側へ building_count を付与
-df_banner = df_banner.merge(settings_df, on="client_name", how="left")
-
-# ──────────────────────────────────────────────
-# 前処理／列リネーム（※CV 列を分離）
-# ──────────────────────────────────────────────
-rename_common = {
-    "媒体": "ServiceNameJA",
-    "クライアント名": "client_name"
-}
-
-df_num = df_num.rename(columns={
-    **rename_common,
-    "コンバージョン数": "conv_total"      # キャンペーン総 CV
-})
-df_banner = df_banner.rename(columns={
-    **rename_common,
-    "CV": "conv_banner"                  # バナー別 CV
-})
-
-if df_num.empty and df_banner.empty:
-    st.warning("データが存在しません")
-    st.stop()
-
-# 数値型を明示
-for col in ("conv_total", "conv_banner"):
-    if col in df_num.columns:
-        df_num[col] = pd.to_numeric(df_num[col], errors="coerce")
-    if col in df_banner.columns:
-        df_banner[col] = pd.to_numeric(df_banner[col], errors="coerce")
-
-# 配信月は “YYYY/MM” 文字列
-for d in (df_num, df_banner):
-    if "配信月" in d.columns:
-        d["配信月"] = d["配信月"].astype(str)
-
 # ──────────────────────────────────────────────
 # フィルター UI（「この条件で絞り込む」ボタンで確定）
 # ──────────────────────────────────────────────
 st.markdown("<h3 class='top'>🔎 広告を絞り込む</h3>", unsafe_allow_html=True)
 
-# マスタ値は df_num 基準
-master = df_num.copy()
-
 with st.form("filter_form", clear_on_submit=False):
     col1, col2, col3 = st.columns(3)
     with col1:
-        month_options = sorted(master["配信月"].dropna().unique()) if "配信月" in master else []
+        month_options = sorted(map(str, master["配信月"]))
         sel_month = st.multiselect("📅 配信月", month_options, placeholder="すべて")
 
     with col2:
-        client_options = sorted(master["client_name"].dropna().unique()) if "client_name" in master else []
+        client_options = sorted(master["client_name"])
         sel_client = st.multiselect("👤 クライアント名", client_options, placeholder="すべて")
 
     with col3:
-        seg_options = sorted(master["building_count"].dropna().unique()) if "building_count" in master else []
+        seg_options = sorted(master["building_count"])
         sel_segment = st.multiselect("🏠 棟数セグメント", seg_options, placeholder="すべて")
 
     col4, col5, col6, col7, col8 = st.columns(5)
     with col4:
-        media_options = sorted(master["広告媒体"].dropna().unique()) if "広告媒体" in master else []
+        media_options = sorted(master["広告媒体"])
         sel_media = st.multiselect("📡 広告媒体", media_options, placeholder="すべて")
     with col5:
-        cat_options = sorted(master["メインカテゴリ"].dropna().unique()) if "メインカテゴリ" in master else []
+        cat_options = sorted(master["メインカテゴリ"])
         sel_cat = st.multiselect("📁 メインカテゴリ", cat_options, placeholder="すべて")
     with col6:
-        subcat_options = sorted(master["サブカテゴリ"].dropna().unique()) if "サブカテゴリ" in master else []
+        subcat_options = sorted(master["サブカテゴリ"])
         sel_subcat = st.multiselect("📂 サブカテゴリ", subcat_options, placeholder="すべて")
     with col7:
-        specialcat_options = sorted(master["特殊カテゴリ"].dropna().unique()) if "特殊カテゴリ" in master else []
+        specialcat_options = sorted(master["特殊カテゴリ"])
         sel_specialcat = st.multiselect("🏷️ 特殊カテゴリ", specialcat_options, placeholder="すべて")
     with col8:
-        goal_options = sorted(master["広告目的"].dropna().unique()) if "広告目的" in master else []
+        goal_options = sorted(master["広告目的"])
         sel_goal = st.multiselect("🎯 広告目的", goal_options, placeholder="すべて")
 
     camp_col, adg_col = st.columns(2)
     with camp_col:
-        camp_options = sorted(master["キャンペーン名"].dropna().unique()) if "キャンペーン名" in master else []
+        camp_options = sorted(master["キャンペーン名"])
         sel_campaign = st.multiselect("📣 キャンペーン名", camp_options, placeholder="すべて")
     with adg_col:
-        adg_options = sorted(master["広告セット名"].dropna().unique()) if "広告セット名" in master else []
+        adg_options = sorted(master["広告セット名"])
         sel_adgroup = st.multiselect("*️⃣ 広告セット名", adg_options, placeholder="すべて")
 
     keyword = st.text_input(
-        "🔍 広告セット名キーワード検索（複数ワードは半角カンマ区切り可）",
+        "🔍 広告セット名キーワード検索（, で OR／& で AND／先頭に - で除外）",
         value="",
-        placeholder="例: 動画,静止画,Instagram"
+        placeholder="例: 動画,静止画,Instagram　／　動画&Instagram　／　動画&-テスト"
     )
 
     submitted = st.form_submit_button("✅ この条件で絞り込む")
@@ -227,6 +168,73 @@ sel_adgroup     = F["sel_adgroup"]
 keyword         = F["keyword"]
 sel_segment     = F["sel_segment"]
 
+# ──────────────────────────────────────────────
+# データ取得（確定したフィルターを SQL の WHERE に押し下げ、該当行だけを転送）
+#   ※ キーワード検索・旧列名の行は下の apply_filters（pandas）で絞る
+# ──────────────────────────────────────────────
+pushdown = {
+    "配信月": sel_month,
+    "client_name": sel_client,
+    "building_count": sel_segment,
+    "広告媒体": sel_media,
+    "メインカテゴリ": sel_cat,
+    "サブカテゴリ": sel_subcat,
+    "特殊カテゴリ": sel_specialcat,
+    "広告目的": sel_goal,
+    "キャンペーン名": sel_campaign,
+    "広告セット名": sel_adgroup,
+}
+# キャンペーン一覧は広告セット名を無視して集計するため、数値側は広告セット名を押し下げない
+pushdown_num = {k: v for k, v in pushdown.items() if k != "広告セット名"}
+
+def load_detail_frames() -> tuple[pd.DataFrame, pd.DataFrame, FilterIndex, FilterIndex]:
+    """
+    キャンペーン明細・バナー明細を取得して前処理（列リネーム・型変換）まで済ませる。
+    - 絞り込み用の索引（キャッシュと一緒に保持）も返す。前処理は行順を変えないのでそのまま使える。
+    """
+    # キャッシュ経由の1経路のみ（初回・invalidate 直後はここで取得してそのままキャッシュに載る）
+    # 3テーブルは互いに独立しているので同時に取得する
+    with st.spinner("⏳ データ読み込み中…"):
+        (df_num, num_index), (df_banner, banner_index), settings_df = load_parallel(
+            lambda: load_final_ad_data(NUM_COLS, pushdown_num, index_cols=INDEX_COLS),
+            lambda: load_banner_drive(BANNER_COLS, pushdown, index_cols=INDEX_COLS),
+            lambda: load_client_settings(SETTINGS_COLS),
+        )
+
+    # Banner 側へ building_count を付与
+    df_banner = df_banner.merge(settings_df, on="client_name", how="left")
+
+    # ──────────────────────────────────────────────
+    # 前処理／列リネーム（※CV 列を分離）
+    # ──────────────────────────────────────────────
+    rename_common = {
+        "媒体": "ServiceNameJA",
+        "クライアント名": "client_name"
+    }
+
+    df_num = df_num.rename(columns={
+        **rename_common,
+        "コンバージョン数": "conv_total"      # キャンペーン総 CV
+    })
+    df_banner = df_banner.rename(columns={
+        **rename_common,
+        "CV": "conv_banner"                  # バナー別 CV
+    })
+
+    # 数値型を明示
+    for col in ("conv_total", "conv_banner"):
+        if col in df_num.columns:
+            df_num[col] = pd.to_numeric(df_num[col], errors="coerce")
+        if col in df_banner.columns:
+            df_banner[col] = pd.to_numeric(df_banner[col], errors="coerce")
+
+    # 配信月は “YYYY/MM” 文字列
+    for d in (df_num, df_banner):
+        if "配信月" in d.columns:
+            d["配信月"] = d["配信月"].astype(str)
+    return df_num, df_banner, num_index, banner_index
+
+
 # 👇 SHO-SAN market と同じノリの「フィルター条件サマリ」関数を追加
 def show_filter_summary():
     filter_items = [
@@ -257,6 +265,7 @@ def show_filter_summary():
 # ──────────────────────────────────────────────
 def apply_filters(
     df: pd.DataFrame,
+    index: FilterIndex | None = None,
     sel_client=None, sel_month=None,
     sel_cat=None, sel_subcat=None,
     sel_goal=None, sel_media=None,
@@ -266,153 +275,156 @@ def apply_filters(
     keyword=None,
     sel_segment=None,
 ) -> pd.DataFrame:
-    cond = pd.Series(True, index=df.index)
-    if "client_name" in df.columns and sel_client:
-        cond &= df["client_name"].isin(sel_client)
-    if "配信月" in df.columns and sel_month:
-        cond &= df["配信月"].isin(sel_month)
-    if "広告媒体" in df.columns and sel_media:
-        cond &= df["広告媒体"].isin(sel_media)
-    if "メインカテゴリ" in df.columns and sel_cat:
-        cond &= df["メインカテゴリ"].isin(sel_cat)
-    if "サブカテゴリ" in df.columns and sel_subcat:
-        cond &= df["サブカテゴリ"].isin(sel_subcat)
-    if "特殊カテゴリ" in df.columns and sel_specialcat:
-        cond &= df["特殊カテゴリ"].isin(sel_specialcat)
-    if "広告目的" in df.columns and sel_goal:
-        cond &= df["広告目的"].isin(sel_goal)
-    if "キャンペーン名" in df.columns and sel_campaign:
-        cond &= df["キャンペーン名"].isin(sel_campaign)
-    if "広告セット名" in df.columns and sel_adgroup:
-        cond &= df["広告セット名"].isin(sel_adgroup)
-    if "building_count" in df.columns and sel_segment:
-        cond &= df["building_count"].isin(sel_segment)
-
-    # ▼ キーワード検索は広告セット名のみ
-    if keyword:
-        keywords = [w.strip() for w in keyword.split(",") if w.strip()]
-        if keywords and "広告セット名" in df.columns:
-            subcond = df["広告セット名"].astype(str).apply(
-                lambda x: any(kw.lower() in x.lower() for kw in keywords)
-            )
-            cond &= subcond
-    return df.loc[cond].copy()
-
-df_num_filt = apply_filters(
-    df_num,
-    sel_client=sel_client, sel_month=sel_month,
-    sel_cat=sel_cat, sel_subcat=sel_subcat,
-    sel_goal=sel_goal, sel_media=sel_media,
-    sel_specialcat=sel_specialcat,
-    sel_campaign=sel_campaign, sel_adgroup=sel_adgroup,
-    keyword=keyword, sel_segment=sel_segment,
-)
+    # 索引にある列は事前に作った行番号配列の OR/AND、無い列（merge で足した列など）は isin で判定
+    cond = index_for(df, index).mask({
+        "client_name": sel_client,
+        "配信月": sel_month,
+        "広告媒体": sel_media,
+        "メインカテゴリ": sel_cat,
+        "サブカテゴリ": sel_subcat,
+        "特殊カテゴリ": sel_specialcat,
+        "広告目的": sel_goal,
+        "キャンペーン名": sel_campaign,
+        "広告セット名": sel_adgroup,
+        "building_count": sel_segment,
+    }, df)
+
+    # ▼ キーワード検索は広告セット名のみ（ユニーク値単位でベクトル判定。AND/OR/NOT 対応）
+    if keyword and parse_query(keyword) and "広告セット名" in df.columns:
+        cond &= keyword_mask(df["広告セット名"], keyword)
+    return df.take(np.flatnonzero(cond))
 
-df_banner_filt = apply_filters(
-    df_banner,
-    sel_client=sel_client, sel_month=sel_month,
-    sel_cat=sel_cat, sel_subcat=sel_subcat,
-    sel_goal=sel_goal, sel_media=sel_media,
-    sel_specialcat=sel_specialcat,
-    sel_campaign=sel_campaign, sel_adgroup=sel_adgroup,
-    keyword=keyword, sel_segment=sel_segment,
-)
+# ──────────────────────────────────────────────
+# スコアカード・月別推移の集計元
+#   キーワード検索なし → BigQuery 側で GROUP BY 配信月 した合計（数十行）だけを取得し、
+#                        明細の読み込みを待たずにページ上部を描画する（サーバー側集計モード）
+#   キーワード検索あり → 広告セット名の部分一致は SQL に押し下げていないため、
+#                        従来どおり明細を読み込んで pandas で集計する
+# ──────────────────────────────────────────────
+def stop_if_empty(df_num: pd.DataFrame, df_banner: pd.DataFrame):
+    if df_num.empty and df_banner.empty:
+        st.warning("この条件に該当するデータが存在しません")
+        st.stop()
 
-# バナーは画像URLがある行のみ（最大100件）
-df_banner_disp = df_banner_filt[df_banner_filt["CloudStorageUrl"].notna()].head(100) \
-    if "CloudStorageUrl" in df_banner_filt.columns else df_banner_filt.head(100)
+if keyword:
+    df_num, df_banner, num_index, banner_index = load_detail_frames()
+    stop_if_empty(df_num, df_banner)
+    df_num_filt = apply_filters(
+        df_num, num_index,
+        sel_client=sel_client, sel_month=sel_month,
+        sel_cat=sel_cat, sel_subcat=sel_subcat,
+        sel_goal=sel_goal, sel_media=sel_media,
+        sel_specialcat=sel_specialcat,
+        sel_campaign=sel_campaign, sel_adgroup=sel_adgroup,
+        keyword=keyword, sel_segment=sel_segment,
+    )
+    df_top = df_num_filt
+else:
+    # 月次キューブで表せる条件ならキューブから足し上げ、キャンペーン名・広告セット名の指定時はサーバー集計
+    cube, cube_index = load_ad_cube(index_cols=CUBE_DIMS)
+    if cube_covers(cube, pushdown):
+        df_top = rollup(cube, ["配信月"], pushdown, cube_index)
+    else:
+        df_top = load_monthly_totals(pushdown)
+    df_top["配信月"] = df_top["配信月"].astype(str)
 
 # ──────────────────────────────────────────────
 # KPI スコアカード（キャンペーン単位）
 # ──────────────────────────────────────────────
-total_cost  = df_num_filt["Cost"].sum() if "Cost" in df_num_filt.columns else 0
-total_click = df_num_filt["Clicks"].sum() if "Clicks" in df_num_filt.columns else 0
-total_cv    = df_num_filt["conv_total"].sum() if "conv_total" in df_num_filt.columns else 0
-total_imp   = df_num_filt["Impressions"].sum() if "Impressions" in df_num_filt.columns else 0
-
-cpa = total_cost / total_cv if total_cv else None
-cvr = total_cv / total_click if total_click else None
-ctr = total_click / total_imp if total_imp else None
-cpm = (total_cost * 1000 / total_imp) if total_imp else None
-cpc = total_cost / total_click if total_click else None
-
-# 配信月レンジ
-if "配信月" not in df_num_filt.columns or df_num_filt["配信月"].dropna().empty:
-    delivery_range = "-"
-else:
-    delivery_range = f"{df_num_filt['配信月'].dropna().min()} 〜 {df_num_filt['配信月'].dropna().max()}"
+@fragment
+def render_scorecards(df_top: pd.DataFrame):
+    """配信月レンジ・フィルター条件・広告数値カード"""
+    total_cost  = df_top["Cost"].sum() if "Cost" in df_top.columns else 0
+    total_click = df_top["Clicks"].sum() if "Clicks" in df_top.columns else 0
+    total_cv    = df_top["conv_total"].sum() if "conv_total" in df_top.columns else 0
+    total_imp   = df_top["Impressions"].sum() if "Impressions" in df_top.columns else 0
+
+    cpa = safe_ratio(total_cost, total_cv)
+    cvr = safe_ratio(total_cv, total_click)
+    ctr = safe_ratio(total_click, total_imp)
+    cpm = safe_ratio(total_cost, total_imp, 1000)
+    cpc = safe_ratio(total_cost, total_click)
+
+    # 配信月レンジ
+    if "配信月" not in df_top.columns or df_top["配信月"].dropna().empty:
+        delivery_range = "-"
+    else:
+        delivery_range = f"{df_top['配信月'].dropna().min()} 〜 {df_top['配信月'].dropna().max()}"
 
-st.markdown(
-    f"📅 配信月：{delivery_range}　"
-    f"👤 クライアント：{sel_client or 'すべて'}<br>"
-    f"🏠 棟数セグメント：{sel_segment or 'すべて'}<br>"
-    f"📁 メインカテゴリ：{sel_cat or 'すべて'}　"
-    f"📂 サブカテゴリ：{sel_subcat or 'すべて'}　"
-    f"🏷️ 特殊カテゴリ：{sel_specialcat or 'すべて'}<br>"
-    f"📡 広告媒体：{sel_media or 'すべて'}　"
-    f"🎯 広告目的：{sel_goal or 'すべて'}<br>"
-    f"📣 キャンペーン名：{sel_campaign or 'すべて'}<br>"
-    f"*️⃣ 広告セット名：{sel_adgroup or 'すべて'}<br>"
-    f"🔍 広告セット名キーワード：{keyword or '未入力'}",
-    unsafe_allow_html=True
-)
+    st.markdown(
+        f"📅 配信月：{delivery_range}　"
+        f"👤 クライアント：{sel_client or 'すべて'}<br>"
+        f"🏠 棟数セグメント：{sel_segment or 'すべて'}<br>"
+        f"📁 メインカテゴリ：{sel_cat or 'すべて'}　"
+        f"📂 サブカテゴリ：{sel_subcat or 'すべて'}　"
+        f"🏷️ 特殊カテゴリ：{sel_specialcat or 'すべて'}<br>"
+        f"📡 広告媒体：{sel_media or 'すべて'}　"
+        f"🎯 広告目的：{sel_goal or 'すべて'}<br>"
+        f"📣 キャンペーン名：{sel_campaign or 'すべて'}<br>"
+        f"*️⃣ 広告セット名：{sel_adgroup or 'すべて'}<br>"
+        f"🔍 広告セット名キーワード：{keyword or '未入力'}",
+        unsafe_allow_html=True
+    )
 
-# ──────────────────────────────────────────────
-# 広告数値（カード）
-# ──────────────────────────────────────────────
-st.subheader("💠 広告数値")
-row1 = [
-    {"label": "CPA - 獲得単価", "value": f"{cpa:,.0f}円" if cpa else "-", "bg": "#fff"},
-    {"label": "コンバージョン数", "value": f"{int(total_cv):,}", "bg": "#fff"},
-    {"label": "CVR - コンバージョン率", "value": f"{cvr*100:,.2f}%" if cvr else "-", "bg": "#fff"},
-    {"label": "消化金額", "value": f"{total_cost:,.0f}円", "bg": "#fff"},
-]
-cols1 = st.columns(4)
-for i, card in enumerate(row1):
-    with cols1[i]:
-        st.markdown(f"""
-            <div class="scorecard" style="
-                background:{card['bg']};
-                border-radius: 11px;
-                padding: .8rem;
-                margin-bottom: 0.8rem;
-                box-shadow: 0 2px 6px rgba(50,60,80,.04);
-                border:1px solid #e4e4e4;">
-              <div class="scorecard-label" style="font-size:12px; color:#111; margin-bottom:2px;">
-                {card['label']}
-              </div>
-              <div class="scorecard-value" style="font-size:1.35rem; font-weight:600; color:#111; letter-spacing:0.01em; margin-bottom: 0.8rem !important;">
-                {card['value']}
-              </div>
-            </div>
-        """, unsafe_allow_html=True)
-
-row2 = [
-    {"label": "インプレッション", "value": f"{int(total_imp):,}", "bg": "#fff"},
-    {"label": "CTR - クリック率", "value": f"{ctr*100:,.2f}%" if ctr else "-", "bg": "#fff"},
-    {"label": "CPC - クリック単価",   "value": f"{cpc:,.0f}円" if cpc else "-",     "bg": "#fff"},
-    {"label": "CPM", "value": f"{cpm:,.0f}" if cpm else "-", "bg": "#fff"},
-    {"label": "クリック", "value": f"{int(total_click):,}", "bg": "#fff"},
-]
-cols2 = st.columns(5)
-for i, card in enumerate(row2):
-    with cols2[i]:
-        st.markdown(f"""
-            <div class="scorecard" style="
-                background:{card['bg']};
-                border-radius: 11px;
-                padding: .8rem;
-                margin-bottom: 0.8rem;
-                box-shadow: 0 2px 6px rgba(50,60,80,.04);
-                border:1px solid #e4e4e4;">
-              <div class="scorecard-label" style="font-size:12px; color:#111; margin-bottom:2px;">
-                {card['label']}
-              </div>
-              <div class="scorecard-value" style="font-size:1.35rem; font-weight:600; color:#111; letter-spacing:0.01em; margin-bottom: 0.8rem !important;">
-                {card['value']}
-              </div>
-            </div>
-        """, unsafe_allow_html=True)
+    # ──────────────────────────────────────────────
+    # 広告数値（カード）
+    # ──────────────────────────────────────────────
+    st.subheader("💠 広告数値")
+    row1 = [
+        {"label": "CPA - 獲得単価", "value": f"{cpa:,.0f}円" if cpa else "-", "bg": "#fff"},
+        {"label": "コンバージョン数", "value": f"{int(total_cv):,}", "bg": "#fff"},
+        {"label": "CVR - コンバージョン率", "value": f"{cvr*100:,.2f}%" if cvr else "-", "bg": "#fff"},
+        {"label": "消化金額", "value": f"{total_cost:,.0f}円", "bg": "#fff"},
+    ]
+    cols1 = st.columns(4)
+    for i, card in enumerate(row1):
+        with cols1[i]:
+            st.markdown(f"""
+                <div class="scorecard" style="
+                    background:{card['bg']};
+                    border-radius: 11px;
+                    padding: .8rem;
+                    margin-bottom: 0.8rem;
+                    box-shadow: 0 2px 6px rgba(50,60,80,.04);
+                    border:1px solid #e4e4e4;">
+                  <div class="scorecard-label" style="font-size:12px; color:#111; margin-bottom:2px;">
+                    {card['label']}
+                  </div>
+                  <div class="scorecard-value" style="font-size:1.35rem; font-weight:600; color:#111; letter-spacing:0.01em; margin-bottom: 0.8rem !important;">
+                    {card['value']}
+                  </div>
+                </div>
+            """, unsafe_allow_html=True)
+
+    row2 = [
+        {"label": "インプレッション", "value": f"{int(total_imp):,}", "bg": "#fff"},
+        {"label": "CTR - クリック率", "value": f"{ctr*100:,.2f}%" if ctr else "-", "bg": "#fff"},
+        {"label": "CPC - クリック単価",   "value": f"{cpc:,.0f}円" if cpc else "-",     "bg": "#fff"},
+        {"label": "CPM", "value": f"{cpm:,.0f}" if cpm else "-", "bg": "#fff"},
+        {"label": "クリック", "value": f"{int(total_click):,}", "bg": "#fff"},
+    ]
+    cols2 = st.columns(5)
+    for i, card in enumerate(row2):
+        with cols2[i]:
+            st.markdown(f"""
+                <div class="scorecard" style="
+                    background:{card['bg']};
+                    border-radius: 11px;
+                    padding: .8rem;
+                    margin-bottom: 0.8rem;
+                    box-shadow: 0 2px 6px rgba(50,60,80,.04);
+                    border:1px solid #e4e4e4;">
+                  <div class="scorecard-label" style="font-size:12px; color:#111; margin-bottom:2px;">
+                    {card['label']}
+                  </div>
+                  <div class="scorecard-value" style="font-size:1.35rem; font-weight:600; color:#111; letter-spacing:0.01em; margin-bottom: 0.8rem !important;">
+                    {card['value']}
+                  </div>
+                </div>
+            """, unsafe_allow_html=True)
+
+
+render_scorecards(df_top)
 
 # ──────────────────────────────────────────────
 # 月別推移グラフ（指標別）★ ここにフィルターサマリを追加
@@ -431,11 +443,13 @@ def get_label(val, indicator, is_kpi=False):
     else:
         return f"{val}"
 
-st.markdown("### 📈 月別推移グラフ（指標別）")
+TREND_INDICATORS = ["CPA", "CVR", "CTR", "CPC", "CPM"]
+
 
-# df_num_filt を配信月ごとに集計して指標算出
-if "配信月" in df_num_filt.columns and not df_num_filt.empty:
-    df_month = df_num_filt.copy()
+def build_trend_figures(df_top: pd.DataFrame) -> dict:
+    """指標ごとの月別推移グラフ {指標: go.Figure | None}（None はデータなし）"""
+    # df_top を配信月ごとに集計して指標算出（サーバー集計済みでも同じ処理で OK）
+    df_month = df_top.copy()
     df_month["配信月_dt"] = pd.to_datetime(
         df_month["配信月"].astype(str) + "/01",
         format="%Y/%m/%d",
@@ -453,34 +467,10 @@ if "配信月" in df_num_filt.columns and not df_num_filt.empty:
     )
 
     # 指標の算出
-    monthly["CPA"] = monthly.apply(
-        lambda r: r["Cost"] / r["conv_total"] if r["conv_total"] > 0 else np.nan,
-        axis=1
-    )
-    monthly["CVR"] = monthly.apply(
-        lambda r: r["conv_total"] / r["Clicks"] if r["Clicks"] > 0 else np.nan,
-        axis=1
-    )
-    monthly["CTR"] = monthly.apply(
-        lambda r: r["Clicks"] / r["Impressions"] if r["Impressions"] > 0 else np.nan,
-        axis=1
-    )
-    monthly["CPC"] = monthly.apply(
-        lambda r: r["Cost"] / r["Clicks"] if r["Clicks"] > 0 else np.nan,
-        axis=1
-    )
-    monthly["CPM"] = monthly.apply(
-        lambda r: (r["Cost"] * 1000 / r["Impressions"]) if r["Impressions"] > 0 else np.nan,
-        axis=1
-    )
+    add_metrics(monthly)
 
-    指標群 = ["CPA", "CVR", "CTR", "CPC", "CPM"]
-    for 指標 in 指標群:
-        st.markdown(f"#### 📉 {指標} 推移")
-        # 👇 SHO-SAN market と同じように、各グラフ直前にフィルターを表示
-        show_filter_summary()
-
-        # ——— ここから置き換え ———
+    figs = {}
+    for 指標 in TREND_INDICATORS:
         # 1) 月キーを必ず「各月1日00:00:00」の naive datetime に正規化してカテゴリ軸化を防ぐ
         df_plot = monthly[["配信月_dt", 指標]].dropna().copy()
         df_plot["配信月_dt"] = pd.to_datetime(df_plot["配信月_dt"]).dt.to_period("M").dt.to_timestamp()
@@ -518,7 +508,7 @@ if "配信月" in df_num_filt.columns and not df_num_filt.empty:
         df_lastyear = df_lastyear[df_lastyear["配信月_dt"] <= current_month_start]
 
         if df_plot.empty:
-            st.info("この条件ではグラフ用のデータがありません。")
+            figs[指標] = None
             continue
 
         fig = go.Figure()
@@ -567,153 +557,192 @@ if "配信月" in df_num_filt.columns and not df_num_filt.empty:
 
         fig.update_layout(height=400, hovermode="x unified")
 
-        st.plotly_chart(fig, use_container_width=True)
-        # ——— 置き換えここまで ———
+        figs[指標] = fig
+    return figs
+
+
+@fragment
+def render_monthly_charts(df_top: pd.DataFrame, figure_parts: tuple):
+    """
+    指標別の月別推移グラフ（df_top は配信月ごとの合計 or 明細）。
+    - グラフは figure_parts（データ版・フィルター条件・今月）ごとにキャッシュし、同じ条件の再実行では組み立て直さない
+    """
+    st.markdown("### 📈 月別推移グラフ（指標別）")
+
+    if "配信月" not in df_top.columns or df_top.empty:
+        st.info("配信月の情報がないため、月別推移グラフは表示できません。")
+        return
+
+    trend_figs = cached_figures(figure_parts, lambda: build_trend_figures(df_top))
+    for 指標 in TREND_INDICATORS:
+        st.markdown(f"#### 📉 {指標} 推移")
+        # 👇 SHO-SAN market と同じように、各グラフ直前にフィルターを表示
+        show_filter_summary()
+        if trend_figs.get(指標) is None:
+            st.info("この条件ではグラフ用のデータがありません。")
+            continue
+        st.plotly_chart(trend_figs[指標], use_container_width=True)
 
-else:
-    st.info("配信月の情報がないため、月別推移グラフは表示できません。")
+
+render_monthly_charts(df_top, (
+    "ad_drive/monthly",
+    data_version(FINAL_AD_DATA, CLIENT_SETTINGS, KPI_SETTINGS),
+    tuple(sorted(kpi_dict.items())),  # 目標線の値（別プロセスでの KPI 編集は版数に出ないので値そのものをキーに）
+    pushdown, keyword,
+    pd.Timestamp.today().strftime("%Y-%m"),
+))
 
 # ──────────────────────────────────────────────
-# キャンペーン一覧（キーワード・広告セット名なしで集計）
+# 明細（キャンペーン一覧・バナー用）
 # ──────────────────────────────────────────────
-st.subheader("💠 キャンペーン単位 一覧")
-
-def apply_filters_campaign_only(df: pd.DataFrame) -> pd.DataFrame:
-    return apply_filters(
-        df,
+if not keyword:
+    df_num, df_banner, num_index, banner_index = load_detail_frames()
+    stop_if_empty(df_num, df_banner)
+    df_num_filt = apply_filters(
+        df_num, num_index,
         sel_client=sel_client, sel_month=sel_month,
         sel_cat=sel_cat, sel_subcat=sel_subcat,
         sel_goal=sel_goal, sel_media=sel_media,
         sel_specialcat=sel_specialcat,
-        sel_campaign=sel_campaign,
-        sel_adgroup=None,
-        keyword=None,
-        sel_segment=sel_segment
+        sel_campaign=sel_campaign, sel_adgroup=sel_adgroup,
+        keyword=keyword, sel_segment=sel_segment,
     )
 
-df_num_campaign_only = apply_filters_campaign_only(df_num)
-
-display_rename = {
-    "キャンペーン名": "キャンペーン名",
-    "配信月": "配信月",
-    "Cost": "消化金額",
-    "conv_total": "コンバージョン数",
-    "CPA": "CPA",
-    "CVR": "CVR",
-    "Impressions": "IMP",
-    "Clicks": "クリック",
-    "CTR": "CTR"
-}
-
-if keyword:
-    st.info("⚠️ 広告セット名のキーワード検索でフィルターされているため、キャンペーンデータは表示されません。")
-elif not df_num_campaign_only.empty:
-    camp_grouped = (
-        df_num_campaign_only.groupby(["キャンペーン名", "配信月"], as_index=False)
-        .agg({
-            "Cost": "sum",
-            "conv_total": "sum",
-            "Impressions": "sum",
-            "Clicks": "sum"
-        })
-    )
-    camp_grouped["CPA"] = camp_grouped["Cost"] / camp_grouped["conv_total"]
-    camp_grouped["CTR"] = camp_grouped["Clicks"] / camp_grouped["Impressions"]
-    camp_grouped["CVR"] = camp_grouped["conv_total"] / camp_grouped["Clicks"]
-
-    # 表示フォーマット
-    camp_grouped["Cost"] = camp_grouped["Cost"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) else "-")
-    camp_grouped["CPA"] = camp_grouped["CPA"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) and np.isfinite(x) else "-")
-    camp_grouped["CTR"] = camp_grouped["CTR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
-    camp_grouped["CVR"] = camp_grouped["CVR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
-    camp_grouped["Impressions"] = camp_grouped["Impressions"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
-    camp_grouped["Clicks"] = camp_grouped["Clicks"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
-    camp_grouped["conv_total"] = camp_grouped["conv_total"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
-
-    camp_grouped_disp = camp_grouped.rename(columns=display_rename)
-    show_cols_disp = list(display_rename.values())
-    st.dataframe(camp_grouped_disp[show_cols_disp].head(1000), use_container_width=True, hide_index=True)
-else:
-    st.info("データがありません")
+df_banner_filt = apply_filters(
+    df_banner, banner_index,
+    sel_client=sel_client, sel_month=sel_month,
+    sel_cat=sel_cat, sel_subcat=sel_subcat,
+    sel_goal=sel_goal, sel_media=sel_media,
+    sel_specialcat=sel_specialcat,
+    sel_campaign=sel_campaign, sel_adgroup=sel_adgroup,
+    keyword=keyword, sel_segment=sel_segment,
+)
 
 # ──────────────────────────────────────────────
-# キャンペーン＋広告セット単位 一覧
+# キャンペーン一覧（キーワード・広告セット名なしで集計）
 # ──────────────────────────────────────────────
-st.subheader("💠 キャンペーン＋広告セット単位 一覧")
-display_rename2 = {
-    "キャンペーン名": "キャンペーン名",
-    "広告セット名": "広告セット名",
-    "配信月": "配信月",
-    "Cost": "消化金額",
-    "conv_total": "コンバージョン数",
-    "CPA": "CPA",
-    "CVR": "CVR",
-    "Impressions": "IMP",
-    "Clicks": "クリック",
-    "CTR": "CTR"
-}
-show_cols2_disp = list(display_rename2.values())
-
-if not df_num_filt.empty:
-    camp_adg_grouped = (
-        df_num_filt.groupby(["キャンペーン名", "広告セット名", "配信月"], as_index=False)
-        .agg({
-            "Cost": "sum",
-            "conv_total": "sum",
-            "Impressions": "sum",
-            "Clicks": "sum"
-        })
-    )
-    camp_adg_grouped["CPA"] = camp_adg_grouped["Cost"] / camp_adg_grouped["conv_total"]
-    camp_adg_grouped["CTR"] = camp_adg_grouped["Clicks"] / camp_adg_grouped["Impressions"]
-    camp_adg_grouped["CVR"] = camp_adg_grouped["conv_total"] / camp_adg_grouped["Clicks"]
-
-    camp_adg_grouped["Cost"] = camp_adg_grouped["Cost"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) else "-")
-    camp_adg_grouped["CPA"] = camp_adg_grouped["CPA"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) and np.isfinite(x) else "-")
-    camp_adg_grouped["CTR"] = camp_adg_grouped["CTR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
-    camp_adg_grouped["CVR"] = camp_adg_grouped["CVR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
-    camp_adg_grouped["Impressions"] = camp_adg_grouped["Impressions"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
-    camp_adg_grouped["Clicks"] = camp_adg_grouped["Clicks"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
-    camp_adg_grouped["conv_total"] = camp_adg_grouped["conv_total"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
-
-    camp_adg_grouped_disp = camp_adg_grouped.rename(columns=display_rename2)
-    st.dataframe(camp_adg_grouped_disp[show_cols2_disp].head(1000), use_container_width=True, hide_index=True)
-else:
-    st.info("データがありません")
+@fragment
+def render_campaign_tables(df_num: pd.DataFrame, df_num_filt: pd.DataFrame, num_index: FilterIndex):
+    """キャンペーン単位／キャンペーン＋広告セット単位の集計表"""
+    st.subheader("💠 キャンペーン単位 一覧")
+
+    def apply_filters_campaign_only(df: pd.DataFrame) -> pd.DataFrame:
+        return apply_filters(
+            df, num_index,
+            sel_client=sel_client, sel_month=sel_month,
+            sel_cat=sel_cat, sel_subcat=sel_subcat,
+            sel_goal=sel_goal, sel_media=sel_media,
+            sel_specialcat=sel_specialcat,
+            sel_campaign=sel_campaign,
+            sel_adgroup=None,
+            keyword=None,
+            sel_segment=sel_segment
+        )
 
-# ──────────────────────────────────────────────
-# バナー並び替え UI
-# ──────────────────────────────────────────────
-st.subheader("💠 配信バナー")
-st.write("###### ※一度に表示できる配信バナーの表示は最大100件です")
-order = st.radio("🐬並び替え基準", ["広告番号順", "コンバージョン数の多い順", "CPA金額の安い順"])
-
-df_banner_sorted = df_banner_filt.copy()
-if order == "コンバージョン数の多い順":
-    df_banner_sorted = df_banner_sorted.sort_values("conv_banner", ascending=False)
-elif order == "CPA金額の安い順":
-    df_banner_sorted = df_banner_sorted[df_banner_sorted["CPA"].notna()].sort_values("CPA")
-elif order == "広告番号順":
-    if "banner_number" in df_banner_sorted.columns:
-        df_banner_sorted = df_banner_sorted.copy()
-        df_banner_sorted["banner_number"] = pd.to_numeric(df_banner_sorted["banner_number"], errors="coerce")
-        df_banner_sorted = df_banner_sorted.sort_values("banner_number", na_position="last")
+    df_num_campaign_only = apply_filters_campaign_only(df_num)
+
+    display_rename = {
+        "キャンペーン名": "キャンペーン名",
+        "配信月": "配信月",
+        "Cost": "消化金額",
+        "conv_total": "コンバージョン数",
+        "CPA": "CPA",
+        "CVR": "CVR",
+        "Impressions": "IMP",
+        "Clicks": "クリック",
+        "CTR": "CTR"
+    }
+
+    if keyword:
+        st.info("⚠️ 広告セット名のキーワード検索でフィルターされているため、キャンペーンデータは表示されません。")
+    elif not df_num_campaign_only.empty:
+        camp_grouped = (
+            df_num_campaign_only.groupby(["キャンペーン名", "配信月"], as_index=False, observed=True)
+            .agg({
+                "Cost": "sum",
+                "conv_total": "sum",
+                "Impressions": "sum",
+                "Clicks": "sum"
+            })
+        )
+        add_metrics(camp_grouped, ["CPA", "CTR", "CVR"])
+
+        # 表示フォーマット
+        camp_grouped["Cost"] = camp_grouped["Cost"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) else "-")
+        camp_grouped["CPA"] = camp_grouped["CPA"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) and np.isfinite(x) else "-")
+        camp_grouped["CTR"] = camp_grouped["CTR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
+        camp_grouped["CVR"] = camp_grouped["CVR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
+        camp_grouped["Impressions"] = camp_grouped["Impressions"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
+        camp_grouped["Clicks"] = camp_grouped["Clicks"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
+        camp_grouped["conv_total"] = camp_grouped["conv_total"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
+
+        camp_grouped_disp = camp_grouped.rename(columns=display_rename)
+        show_cols_disp = list(display_rename.values())
+        st.dataframe(camp_grouped_disp[show_cols_disp].head(1000), use_container_width=True, hide_index=True)
+    else:
+        st.info("データがありません")
+
+    # ──────────────────────────────────────────────
+    # キャンペーン＋広告セット単位 一覧
+    # ──────────────────────────────────────────────
+    st.subheader("💠 キャンペーン＋広告セット単位 一覧")
+    display_rename2 = {
+        "キャンペーン名": "キャンペーン名",
+        "広告セット名": "広告セット名",
+        "配信月": "配信月",
+        "Cost": "消化金額",
+        "conv_total": "コンバージョン数",
+        "CPA": "CPA",
+        "CVR": "CVR",
+        "Impressions": "IMP",
+        "Clicks": "クリック",
+        "CTR": "CTR"
+    }
+    show_cols2_disp = list(display_rename2.values())
+
+    if not df_num_filt.empty:
+        camp_adg_grouped = (
+            df_num_filt.groupby(["キャンペーン名", "広告セット名", "配信月"], as_index=False, observed=True)
+            .agg({
+                "Cost": "sum",
+                "conv_total": "sum",
+                "Impressions": "sum",
+                "Clicks": "sum"
+            })
+        )
+        add_metrics(camp_adg_grouped, ["CPA", "CTR", "CVR"])
+
+        camp_adg_grouped["Cost"] = camp_adg_grouped["Cost"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) else "-")
+        camp_adg_grouped["CPA"] = camp_adg_grouped["CPA"].map(lambda x: f"¥{x:,.0f}" if pd.notna(x) and np.isfinite(x) else "-")
+        camp_adg_grouped["CTR"] = camp_adg_grouped["CTR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
+        camp_adg_grouped["CVR"] = camp_adg_grouped["CVR"].map(lambda x: f"{x*100:.2f}%" if pd.notna(x) else "-")
+        camp_adg_grouped["Impressions"] = camp_adg_grouped["Impressions"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
+        camp_adg_grouped["Clicks"] = camp_adg_grouped["Clicks"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
+        camp_adg_grouped["conv_total"] = camp_adg_grouped["conv_total"].map(lambda x: f"{int(x):,}" if pd.notna(x) else "-")
+
+        camp_adg_grouped_disp = camp_adg_grouped.rename(columns=display_rename2)
+        st.dataframe(camp_adg_grouped_disp[show_cols2_disp].head(1000), use_container_width=True, hide_index=True)
     else:
-        st.warning("⚠️ banner_number列が存在しません。元の順序で表示します。")
+        st.info("データがありません")
+
 
-# 並び替え後に URL ありを上位100件
-df_banner_disp = df_banner_sorted[df_banner_sorted["CloudStorageUrl"].notna()].head(100)
+render_campaign_tables(df_num, df_num_filt, num_index)
 
 # ──────────────────────────────────────────────
-# バナーカード描画
+# バナー並び替え UI・カード描画
+#   1ページ分のカードを1つの HTML（CSS グリッド）にまとめて1回で送る
+#   画像は固定幅 WebP のサムネイル（thumbnails.py）を loading="lazy" で表示し、クリックで原寸を開く
 # ──────────────────────────────────────────────
+BANNER_PAGE_SIZE = 60  # 3列 × 20行
+
+
 def split_urls(raw):
     urls = re.split(r"[,\s　]+", str(raw or ""))
     urls = [u.strip() for u in urls if u.strip().startswith("http")]
     return urls
 
-cols = st.columns(3, gap="small")
-for i, (_, row) in enumerate(df_banner_disp.iterrows()):
+
+def banner_card_html(row: dict) -> str:
     cost = row.get("Cost", 0)
     imp  = row.get("Impressions", 0)
     clk  = row.get("Clicks", 0)
@@ -741,8 +770,8 @@ for i, (_, row) in enumerate(df_banner_disp.iterrows()):
         url_html = '<span class="gray-text">飛び先URL：未記入</span>'
 
     caption = [
-        f"<div style='font-size:9px;color:#888;margin-bottom:-17px;line-height:1.4;'>{row.get('キャンペーン名','')}</div>",
-        f"<b>広告名：</b>{row.get('AdName', '')}",
+        f"<div style='font-size:9px;color:#888;margin-bottom:-17px;line-height:1.4;'>{html.escape(str(row.get('キャンペーン名', '')))}</div>",
+        f"<b>広告名：</b>{html.escape(str(row.get('AdName', '')))}",
         f"<b>消化金額：</b>{cost:,.0f}円",
         f"<b>IMP：</b>{imp:,.0f}",
         f"<b>クリック：</b>{clk:,.0f}",
@@ -752,19 +781,70 @@ for i, (_, row) in enumerate(df_banner_disp.iterrows()):
         f"<b>CPA：</b>{cpa_:,.0f}円" if pd.notna(cpa_) else "<b>CPA：</b>-",
         url_html,
         canva_html,
-        f"<b>メインテキスト：</b>{row.get('Description', '')}"
+        f"<b>メインテキスト：</b>{html.escape(str(row.get('Description', '')))}"
     ]
 
-    card_html = f"""
-      <div class='banner-card'>
-        <a href="{row.get('CloudStorageUrl', '')}" target="_blank" rel="noopener">
-          <img src="{row.get('CloudStorageUrl', '')}">
-        </a>
-        <div class='banner-caption'>{"<br>".join(caption)}</div>
-      </div>
-    """
-    with cols[i % 3]:
-        st.markdown(card_html, unsafe_allow_html=True)
+    original = html.escape(str(row.get("CloudStorageUrl", "")))
+    thumb = html.escape(thumbnail_url(row.get("CloudStorageUrl", "")))
+    return (
+        "<div class='banner-card'>"
+        f'<a href="{original}" target="_blank" rel="noopener">'
+        f'<img src="{thumb}" loading="lazy" decoding="async">'
+        "</a>"
+        f"<div class='banner-caption'>{'<br>'.join(caption)}</div>"
+        "</div>"
+    )
+
+
+def reset_banner_page():
+    st.session_state["banner_page"] = 1
+
+
+@fragment
+def render_banner_grid(df_banner_filt: pd.DataFrame):
+    """バナー並び替え＋ページ送り＋カード一覧。操作してもこのセクションだけ再実行する"""
+    st.subheader("💠 配信バナー")
+    order = st.radio(
+        "🐬並び替え基準", ["広告番号順", "コンバージョン数の多い順", "CPA金額の安い順"],
+        key="banner_order", on_change=reset_banner_page,
+    )
+
+    df_banner_sorted = df_banner_filt
+    if order == "コンバージョン数の多い順":
+        df_banner_sorted = df_banner_sorted.sort_values("conv_banner", ascending=False)
+    elif order == "CPA金額の安い順":
+        df_banner_sorted = df_banner_sorted[df_banner_sorted["CPA"].notna()].sort_values("CPA")
+    elif order == "広告番号順":
+        if "banner_number" in df_banner_sorted.columns:
+            df_banner_sorted = df_banner_sorted.copy()
+            df_banner_sorted["banner_number"] = pd.to_numeric(df_banner_sorted["banner_number"], errors="coerce")
+            df_banner_sorted = df_banner_sorted.sort_values("banner_number", na_position="last")
+        else:
+            st.warning("⚠️ banner_number列が存在しません。元の順序で表示します。")
+
+    # 並び替え後、画像URLがある行だけをページ単位で表示
+    df_banner_disp = df_banner_sorted[df_banner_sorted["CloudStorageUrl"].notna()]
+    total = len(df_banner_disp)
+    if total == 0:
+        st.info("表示できるバナーがありません")
+        return
+
+    pages = (total - 1) // BANNER_PAGE_SIZE + 1
+    if st.session_state.get("banner_page", 1) > pages:
+        reset_banner_page()  # 絞り込みで件数が減ったとき
+    page = st.number_input(
+        f"ページ（全 {pages:,} ページ／{total:,} 件）",
+        min_value=1, max_value=pages, step=1, key="banner_page",
+    )
+    start = (int(page) - 1) * BANNER_PAGE_SIZE
+    rows = df_banner_disp.iloc[start:start + BANNER_PAGE_SIZE].to_dict("records")
+    st.caption(f"{start + 1:,}〜{start + len(rows):,} 件目を表示")
+
+    cards = "".join(banner_card_html(row) for row in rows)
+    st.markdown(f"<div class='banner-grid'>{cards}</div>", unsafe_allow_html=True)
+
+
+render_banner_grid(df_banner_filt)
 
 # ──────────────────────────────────────────────
 #  フォント & CSS
@@ -803,6 +883,11 @@ st.markdown("""
     margin-bottom: 1.4rem;
     font-family: 'Inter', 'Roboto', sans-serif;
   }
+  .banner-grid {
+    display: grid;
+    grid-template-columns: repeat(3, minmax(0, 1fr));
+    gap: 0 14px;
+  }
   .banner-card {
     padding: 12px 12px 20px;
     border: 1px solid #e6e6e6;
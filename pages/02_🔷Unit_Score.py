@@ -1,6 +1,5 @@
 # final-ad-data-dashboard/pages /02_🔷Unit_Score.py
 import streamlit as st  
-from google.cloud import bigquery
 import pandas as pd
 import numpy as np
 import requests
@@ -39,16 +38,12 @@ st.markdown(
 
 # st.subheader（”📊 広告TM パフォーマンス”）
 
-info_dict = dict(st.secrets["connections"]["bigquery"])
-info_dict["private_key"] = info_dict["private_key"].replace("\\n", "\n")
-client = bigquery.Client.from_service_account_info(info_dict)
+# 集計キー・並び替えキー・agg_dict の列だけを取得（SELECT * をやめる。列はウォームアップと共有）
+from bq_data import UNIT_SCORE_COLS as LOAD_COLS, load_unit_drive
+from kpi_grading import grade_metric, meets_any, meets_target
+from metrics import add_metrics, safe_div
 
-@st.cache_data(show_spinner="データ取得中…")
-def load_data():
-    df = client.query("SELECT * FROM careful-chess-406412.SHOSAN_Ad_Tokyo.Unit_Drive_Ready_View").to_dataframe()
-    return df
-
-df = load_data()
+df = load_unit_drive(LOAD_COLS)
 
 # 📅 配信月フィルタ（新しい月順、Noneは最下部・現在月をデフォルト選択）
 raw_months = df["配信月"].unique().tolist()
@@ -144,87 +139,54 @@ agg_dict = {
     "個別CPA_達成": "last",
     "達成状況": "last"
 }
-df = df.groupby(group_cols, dropna=False).agg(agg_dict).reset_index()
+df = df.groupby(group_cols, dropna=False, observed=True).agg(agg_dict).reset_index()
 
 # ▼ CPA/CVRを再計算
-df["CPA"] = df["消化金額"] / df["コンバージョン数"].replace(0, np.nan)
-if "クリック数" in df.columns:
-    df["CVR"] = df["コンバージョン数"] / df["クリック数"].replace(0, np.nan)
+add_metrics(df, ["CPA", "CVR"], cost="消化金額", clicks="クリック数", conversions="コンバージョン数")
 
 # ───────── 再評価（“コンバージョン”を含む） ─────────
-is_conv = df["広告目的"].fillna("").str.contains("コンバージョン", na=False)
-has_cpa = df["CPA"].notna()
-
-# 評価列は最初から “string” dtype で初期化
-df["CPA_KPI_評価"] = pd.Series(pd.NA, index=df.index, dtype="string")
-
-# 評価外（コンバージョン以外）
-df.loc[~is_conv, "CPA_KPI_評価"] = "評価外"
-
-# 閾値が存在するか
-has_best = df["CPA_best"].notna()
+is_conv = df["広告目的"].str.contains("コンバージョン", na=False)
 
-# 各評価用の条件
-cond_best = is_conv & has_cpa & has_best & (df["CPA"] <= df["CPA_best"])
-cond_good = is_conv & has_cpa & df["CPA_good"].notna() & (df["CPA"] <= df["CPA_good"])
-cond_min  = is_conv & has_cpa & df["CPA_min"].notna()  & (df["CPA"] <= df["CPA_min"])
-
-# 順に上書き
-df.loc[cond_best, "CPA_KPI_評価"] = "◎"
-df.loc[~df["CPA_KPI_評価"].isin(["◎"]) & cond_good, "CPA_KPI_評価"] = "〇"
-df.loc[~df["CPA_KPI_評価"].isin(["◎","〇"]) & cond_min, "CPA_KPI_評価"] = "△"
-
-# 未設定かつ（CV目的 かつ CPAとbestが有効）→ ✕
-df.loc[
-    df["CPA_KPI_評価"].isna() & is_conv & has_cpa & has_best,
-    "CPA_KPI_評価"
-] = "✕"
+# 評価列は “string” dtype（◎/〇/△/✕、コンバージョン以外は「評価外」）
+cpa_eval = grade_metric(df, "CPA", marks=("◎", "〇", "△", "✕"), strict=False)
+df["CPA_KPI_評価"] = pd.Series(
+    np.where(is_conv, cpa_eval, "評価外"), index=df.index, dtype="string"
+)
 
 # ===== 個別CPA_達成（安全に判定） =====
-df["個別CPA_達成"] = pd.Series(pd.NA, index=df.index, dtype="string")
-
-mask_target = df["目標CPA"].notna()
-mask_cpa    = df["CPA"].notna()
-mask_valid  = mask_target & mask_cpa
-
-df.loc[~mask_target, "個別CPA_達成"] = "個別目標なし"
-df.loc[mask_valid & (df["CPA"] <= df["目標CPA"]), "個別CPA_達成"] = "〇"
-df.loc[mask_valid & (df["CPA"] >  df["目標CPA"]), "個別CPA_達成"] = "✕"
+df["個別CPA_達成"] = pd.Series(
+    meets_target(df["CPA"], df["目標CPA"]), index=df.index, dtype="string"
+)
 
 # ===== 達成状況（安全に判定） =====
 # ルール：
 # - 広告目的が「コンバージョン」を含まない -> 「評価外」
 # - それ以外は、(CPA<=CPA_good) または (CPA<=目標CPA) のどちらか満たせば「達成」、そうでなければ「未達成」
-df["達成状況"] = pd.Series(pd.NA, index=df.index, dtype="string")
-
-mask_conv   = df["広告目的"].fillna("").str.contains("コンバージョン", case=False, na=False)
-mask_cpa    = df["CPA"].notna()
-mask_cpa_go = df["CPA_good"].notna()
-mask_target = df["目標CPA"].notna()
-
-# デフォルト：評価対象外
-df.loc[~mask_conv, "達成状況"] = "評価外"
-
-# コンバージョン目的のみ判定
-mask_judge = mask_conv & mask_cpa
-
-# まず未達成で埋める
-df.loc[mask_judge, "達成状況"] = "未達成"
-
-# 達成条件： (CPA <= CPA_good) or (CPA <= 目標CPA)
-df.loc[mask_judge & mask_cpa_go & (df["CPA"] <= df["CPA_good"]), "達成状況"] = "達成"
-df.loc[mask_judge & mask_target & (df["CPA"] <= df["目標CPA"]),  "達成状況"] = "達成"
+# ※ 閾値列は BigQuery の INT64 が nullable（Int64）で届くので、比較は float 配列で行う（<NA> は未達扱い）
+mask_conv  = df["広告目的"].str.contains("コンバージョン", case=False, na=False).to_numpy(dtype=bool)
+mask_judge = mask_conv & df["CPA"].notna().to_numpy(dtype=bool)
+achieved   = meets_any(df["CPA"], df["CPA_good"], df["目標CPA"])
+
+df["達成状況"] = pd.Series(
+    np.select(
+        [~mask_conv, mask_judge & achieved, mask_judge],
+        ["評価外", "達成", "未達成"],
+        default=None,
+    ),
+    index=df.index,
+    dtype="string",
+)
 
 # ===== ここから表示用の補助関数 =====
 def safe_cpa(cost, cv):
-    return cost / cv if cv > 0 else np.nan
+    return safe_div([cost], [cv])[0]
 
 def fill_cpa_eval_for_display(df_in: pd.DataFrame) -> pd.DataFrame:
     """表示専用：CV=0 かつ CPA=0円 かつ コンバージョン目的 かつ 評価が空/NaN → '✕' に置換"""
     d = df_in.copy()
     if "CPA_KPI_評価" not in d.columns:
         return d
-    is_conv = d.get("広告目的", pd.Series(index=d.index)).fillna("").str.contains("コンバージョン", na=False)
+    is_conv = d.get("広告目的", pd.Series("", index=d.index)).str.contains("コンバージョン", na=False)
     zero_cv  = d.get("コンバージョン数", pd.Series(index=d.index)).fillna(0).astype(float).eq(0)
     zero_cpa = d.get("CPA", pd.Series(index=d.index)).fillna(0).astype(float).eq(0)
     blank_eval = d["CPA_KPI_評価"].isna() | (d["CPA_KPI_評価"].astype(str).str.strip() == "")
@@ -315,10 +277,10 @@ if df_filtered.empty:
 def campaign_key(df_):
     return df_["配信月"].astype(str) + "_" + df_["CampaignId"].astype(str) + "_" + df_["クライアント名"].astype(str)
 
-unit_group = df_filtered.groupby("所属", dropna=False)
+unit_group = df_filtered.groupby("所属", dropna=False, observed=True)
 unit_summary = []
 for unit, group in unit_group:
-    group_conv = group[group["広告目的"].fillna("").str.contains("コンバージョン", na=False)]
+    group_conv = group[group["広告目的"].str.contains("コンバージョン", na=False)]
     camp_count_conv = campaign_key(group_conv).nunique()
     camp_count_all = campaign_key(group).nunique()
     spend_conv = group_conv["消化金額"].sum()
@@ -350,7 +312,7 @@ else:
     st.write("#### 🍋🍋‍🟩 Unitごとのスコア 🍒🍏")
 
     # 🆕 全体CPA
-    overall_conv = df_filtered[df_filtered["広告目的"].fillna("").str.contains("コンバージョン", na=False)]
+    overall_conv = df_filtered[df_filtered["広告目的"].str.contains("コンバージョン", na=False)]
     overall_camp_count_conv = campaign_key(overall_conv).nunique()
     overall_camp_count_all = campaign_key(df_filtered).nunique()
     overall_spend_conv = overall_conv["消化金額"].sum()
@@ -404,11 +366,11 @@ else:
 # -----------------------------
 # 2. 担当者ごとのスコア（2軸）
 # -----------------------------
-person_group = df_filtered.groupby("担当者", dropna=False)
+person_group = df_filtered.groupby("担当者", dropna=False, observed=True)
 
 person_summary = []
 for person, group in person_group:
-    group_conv = group[group["広告目的"].fillna("").str.contains("コンバージョン", na=False)]
+    group_conv = group[group["広告目的"].str.contains("コンバージョン", na=False)]
     camp_count_conv = group_conv.shape[0]
     spend_conv = group_conv["消化金額"].sum()
     camp_count_all = group.shape[0]
@@ -471,11 +433,11 @@ if "達成状況" in df_filtered.columns:
     #    まずは従来通り df_filtered は (配信月 + CampaignId + クライアント名) で集計済み
     #    その上で「配信月 + クライアント名 + キャンペーン名（完全一致）」が合致するものだけ 1キャンペーンに吸収し、
     #    ①②を合算した CPA で「達成」かどうかを判定する
-    conv_df = df_filtered[df_filtered["広告目的"].fillna("").str.contains("コンバージョン", na=False)].copy()
+    conv_df = df_filtered[df_filtered["広告目的"].str.contains("コンバージョン", na=False)].copy()
     conv_df["concept_key"] = (
         conv_df["配信月"].astype(str) + "_" +
         conv_df["クライアント名"].astype(str) + "_" +
-        conv_df["キャンペーン名"].fillna("").astype(str)
+        conv_df["キャンペーン名"].astype("string").fillna("")
     )
 
     def _min_or_nan(s):
@@ -485,7 +447,7 @@ if "達成状況" in df_filtered.columns:
 
     # concept_key 単位で「合算CPA」で達成判定（Unit別）
     concept_agg = (
-        conv_df.groupby(["所属", "concept_key"], dropna=False)
+        conv_df.groupby(["所属", "concept_key"], dropna=False, observed=True)
         .agg(
             spend=("消化金額", "sum"),
             cv=("コンバージョン数", "sum"),
@@ -496,7 +458,7 @@ if "達成状況" in df_filtered.columns:
     )
 
     # 合算CPA
-    concept_agg["CPA_sum"] = concept_agg["spend"] / concept_agg["cv"].replace(0, np.nan)
+    concept_agg["CPA_sum"] = safe_div(concept_agg["spend"], concept_agg["cv"])
 
     # 達成判定： (CPA_sum <= CPA_good) or (CPA_sum <= 目標CPA)
     concept_agg["concept_達成"] = False
@@ -505,7 +467,7 @@ if "達成状況" in df_filtered.columns:
     concept_agg.loc[mask_cpa & concept_agg["target"].notna()   & (concept_agg["CPA_sum"] <= concept_agg["target"]),   "concept_達成"] = True
 
     unit_agg = (
-        concept_agg.groupby("所属", dropna=False)
+        concept_agg.groupby("所属", dropna=False, observed=True)
         .agg(
             campaign_count=("concept_key", "nunique"),
             達成件数=("concept_達成", lambda x: int(x.sum()))
@@ -565,11 +527,11 @@ if "達成状況" in df_filtered.columns:
     # ✅ 達成率用の補足処理（合算して達成判定）：
     #    「配信月 + クライアント名 + キャンペーン名（完全一致）」が合致するものだけ 1キャンペーンに吸収し、
     #    ①②を合算した CPA で「達成」かどうかを判定する
-    conv_df = df_filtered[df_filtered["広告目的"].fillna("").str.contains("コンバージョン", na=False)].copy()
+    conv_df = df_filtered[df_filtered["広告目的"].str.contains("コンバージョン", na=False)].copy()
     conv_df["concept_key"] = (
         conv_df["配信月"].astype(str) + "_" +
         conv_df["クライアント名"].astype(str) + "_" +
-        conv_df["キャンペーン名"].fillna("").astype(str)
+        conv_df["キャンペーン名"].astype("string").fillna("")
     )
 
     def _min_or_nan(s):
@@ -579,7 +541,7 @@ if "達成状況" in df_filtered.columns:
 
     # concept_key 単位で「合算CPA」で達成判定（担当者別）
     concept_person = (
-        conv_df.groupby(["担当者", "concept_key"], dropna=False)
+        conv_df.groupby(["担当者", "concept_key"], dropna=False, observed=True)
         .agg(
             spend=("消化金額", "sum"),
             cv=("コンバージョン数", "sum"),
@@ -589,7 +551,7 @@ if "達成状況" in df_filtered.columns:
         .reset_index()
     )
 
-    concept_person["CPA_sum"] = concept_person["spend"] / concept_person["cv"].replace(0, np.nan)
+    concept_person["CPA_sum"] = safe_div(concept_person["spend"], concept_person["cv"])
 
     # 達成判定： (CPA_sum <= CPA_good) or (CPA_sum <= 目標CPA)
     concept_person["concept_達成"] = False
@@ -598,7 +560,7 @@ if "達成状況" in df_filtered.columns:
     concept_person.loc[mask_cpa & concept_person["target"].notna()   & (concept_person["CPA_sum"] <= concept_person["target"]),   "concept_達成"] = True
 
     person_agg = (
-        concept_person.groupby("担当者", dropna=False)
+        concept_person.groupby("担当者", dropna=False, observed=True)
         .agg(
             campaign_count=("concept_key", "nunique"),
             達成件数=("concept_達成", lambda x: int(x.sum()))
@@ -668,7 +630,7 @@ st.markdown("<div style='margin-top: 2rem;'></div>", unsafe_allow_html=True)
 # --- 達成キャンペーン一覧 ---
 if "達成状況" in df_filtered.columns:
     st.write("#### 👍 達成キャンペーン一覧")
-    achieved = df_filtered[(df_filtered["達成状況"] == "達成") & (df_filtered["広告目的"].fillna("").str.contains("コンバージョン", na=False))]
+    achieved = df_filtered[(df_filtered["達成状況"] == "達成") & (df_filtered["広告目的"].str.contains("コンバージョン", na=False))]
     if not achieved.empty:
         cols = [
             "配信月", "キャンペーン名", "担当者", "所属",
@@ -697,7 +659,7 @@ if "達成状況" in df_filtered.columns:
     df_for_missed = fill_cpa_eval_for_display(df_filtered.copy())
 
     # 2) コンバージョン目的 かつ CPA_KPI_評価が「✕」または空白を未達成とする
-    conv_mask = df_for_missed["広告目的"].fillna("").str.contains("コンバージョン", na=False)
+    conv_mask = df_for_missed["広告目的"].str.contains("コンバージョン", na=False)
     eval_col  = df_for_missed["CPA_KPI_評価"].astype("string")
     is_x      = eval_col == "✕"
     is_delta  = eval_col == "△"
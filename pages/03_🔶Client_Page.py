@@ -1,7 +1,4 @@
 import streamlit as st
-import pandas as pd
-from google.cloud import bigquery
-import html
 
 # ──────────────────────────────────────────────
 # ログイン認証
@@ -32,25 +29,15 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# --- BigQuery認証 ---
-info = dict(st.secrets["connections"]["bigquery"])
-info["private_key"] = info["private_key"].replace("\\n", "\n")
-client = bigquery.Client.from_service_account_info(info)
-
-# ① BigQueryクライアントをキャッシュ
-@st.cache_resource
-def get_bq_client():
-    info = dict(st.secrets["connections"]["bigquery"])
-    info["private_key"] = info["private_key"].replace("\\n", "\n")
-    return bigquery.Client.from_service_account_info(info)
-
-client = get_bq_client()
+# ① BigQueryクライアント（bq_data で共通化・キャッシュ済み）
+from bq_data import CLIENT_SETTINGS, table_id, run_query, versioned
 
 # ② データ取得（TTLなし＝手動クリアまで固定スナップショット）
+@versioned(CLIENT_SETTINGS)
 @st.cache_data(show_spinner=False)
-def load_client_view():
+def load_client_view(versions=()):
     # Client_List_For_Page に building_count が無い前提で ClientSettings を JOIN
-    query = """
+    query = f"""
     SELECT 
       lp.client_name,
       lp.client_id,
@@ -59,11 +46,11 @@ def load_client_view():
       lp.`過去の担当者`,
       lp.`フロント`,
       cs.building_count  -- 棟数セグメント
-    FROM `SHOSAN_Ad_Tokyo.Client_List_For_Page` AS lp
-    LEFT JOIN `SHOSAN_Ad_Tokyo.ClientSettings` AS cs
+    FROM `{table_id("Client_List_For_Page")}` AS lp
+    LEFT JOIN `{table_id(CLIENT_SETTINGS)}` AS cs
       ON lp.client_name = cs.client_name
     """
-    return client.query(query).to_dataframe()
+    return run_query(query)
 
 df = load_client_view()
 
@@ -97,75 +84,27 @@ if sel_segment:
     filtered_df = filtered_df[filtered_df["building_count"].isin(sel_segment)]
 
 # --- リンクURL生成 ---
-filtered_df["リンクURL"] = filtered_df["client_id"].apply(
-    lambda cid: f"https://sho-san-client-ad-score.streamlit.app/?client_id={cid}"
+filtered_df["リンクURL"] = (
+    "https://sho-san-client-ad-score.streamlit.app/?client_id=" + filtered_df["client_id"].astype(str)
 )
 
 st.divider()
 
-# --- CSS追加（テーブル行のテキストサイズを小さく） ---
-st.markdown("""
-<style>
-.table-row-text {
-    font-size: 13px !important;
-    letter-spacing: 0.02em;
-}
-</style>
-""", unsafe_allow_html=True)
-
-# --- ヘッダー（棟数セグメントを追加） ---
-header_cols = st.columns([2, 1.5, 2, 2, 2, 1.5, 1.5])
-header_cols[0].markdown("**クライアント名**")
-header_cols[1].markdown("**リンク**")
-header_cols[2].markdown("**現在の担当者**")
-header_cols[3].markdown("**過去の担当者**")
-header_cols[4].markdown("**フロント**")
-header_cols[5].markdown("**注力度**")
-header_cols[6].markdown("**棟数セグメント**")
-
-st.divider()
-
-def vertical_center(content, height="70px"):
-    safe_content = content if pd.notna(content) and str(content).strip() != "" else "&nbsp;"
-    return f"""
-    <div class="table-row-text" style="display: flex; align-items: center; height: {height}; min-height: {height};">
-        {html.escape(safe_content) if safe_content != "&nbsp;" else safe_content}
-    </div>
-    """
-
-# --- 表示（棟数セグメント列も描画） ---
-for _, row in filtered_df.iterrows():
-    cols = st.columns([2, 1.5, 2, 2, 2, 1.5, 1.5])
-    row_height = "70px"
-    row_style = f"border-bottom: 1px solid #ddd; height: {row_height}; min-height: {row_height}; display: flex; align-items: center;"
-    with cols[0]:
-        st.markdown(f'<div style="{row_style}">{vertical_center(row.get("client_name"))}</div>', unsafe_allow_html=True)
-    with cols[1]:
-        button_html = f"""
-        <a href="{row['リンクURL']}" target="_blank" style="
-            text-decoration: none;
-            display: inline-block;
-            padding: 0.3em 0.8em;
-            border-radius: 6px;
-            background-color: rgb(53, 169, 195);
-            color: white;
-            font-weight: bold;
-            font-size: 13px;
-        ">
-            ▶ ページを開く
-        </a>
-        """
-        st.markdown(f'<div style="{row_style}">{button_html}</div>', unsafe_allow_html=True)
-    with cols[2]:
-        st.markdown(f'<div style="{row_style}">{vertical_center(row.get("現在の担当者"))}</div>', unsafe_allow_html=True)
-    with cols[3]:
-        st.markdown(f'<div style="{row_style}">{vertical_center(row.get("過去の担当者"))}</div>', unsafe_allow_html=True)
-    with cols[4]:
-        st.markdown(f'<div style="{row_style}">{vertical_center(row.get("フロント"))}</div>', unsafe_allow_html=True)
-    with cols[5]:
-        st.markdown(f'<div style="{row_style}">{vertical_center(row.get("focus_level"))}</div>', unsafe_allow_html=True)
-    with cols[6]:
-        # building_count が NaN の場合も空白で崩れないよう処理
-        seg = row.get("building_count")
-        seg_txt = "" if pd.isna(seg) else str(seg)
-        st.markdown(f'<div style="{row_style}">{vertical_center(seg_txt)}</div>', unsafe_allow_html=True)
+# --- 表示（1つの表コンポーネントで描画。件数が増えても要素数は一定） ---
+#   列見出しクリックで並び替え、表右上の検索で絞り込みができる
+show_cols = ["client_name", "リンクURL", "現在の担当者", "過去の担当者", "フロント", "focus_level", "building_count"]
+st.dataframe(
+    filtered_df[[c for c in show_cols if c in filtered_df.columns]],
+    use_container_width=True,
+    hide_index=True,
+    height=min(36 * (len(filtered_df) + 1) + 2, 800),
+    column_config={
+        "client_name": "クライアント名",
+        "リンクURL": st.column_config.LinkColumn("リンク", display_text="▶ ページを開く"),
+        "現在の担当者": "現在の担当者",
+        "過去の担当者": "過去の担当者",
+        "フロント": "フロント",
+        "focus_level": "注力度",
+        "building_count": "棟数セグメント",
+    },
+)
@@ -1,9 +1,7 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from google.cloud import bigquery
 
 from auth import require_login
 
@@ -18,59 +16,51 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# ──────────────────────────────────────────────
-# BigQuery クライアント
-# ──────────────────────────────────────────────
-@st.cache_resource
-def get_bq_client():
-    cred = dict(st.secrets["connections"]["bigquery"])
-    # 改行コードを復元（Ad Drive と同じ）
-    cred["private_key"] = cred["private_key"].replace("\\n", "\n")
-    return bigquery.Client.from_service_account_info(cred)
-
-bq = get_bq_client()
-
 # ──────────────────────────────────────────────
 # データ取得
 #   ※ Ad Drive と同じ Final_Ad_Data_Last をベースにする
+#   ※ クライアント・共通テーブルのローダーは bq_data で共通化
 # ──────────────────────────────────────────────
-@st.cache_data(show_spinner=False)
-def load_final_ad_data():
-    query = """
-        SELECT *
-        FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Final_Ad_Data_Last`
-    """
-    return bq.query(query).to_dataframe()
-
-
-@st.cache_data(show_spinner=False)
-def load_kpi_settings():
-    query = """
-        SELECT *
-        FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.Target_Indicators_Meta`
-    """
-    return bq.query(query).to_dataframe()
+from filter_index import FilterIndex, index_for
+from kpi_grading import grade_frame
+from metrics import add_metrics
+from figure_cache import cached_figures
+from bq_data import (
+    CLIENT_SETTINGS, CUBE_DIMS, FINAL_AD_DATA, KPI_SETTINGS, MARKET_RAW_COLS, MARKET_KPI_COLS,
+    MARKET_INDEX_COLS, cube_covers, data_version, table_id, run_query, load_ad_cube, load_final_ad_data, load_kpi_settings,
+    load_parallel, rollup,
+)
 
 
 @st.cache_data
 def load_cv_targets():
-    query = """
+    query = f"""
     SELECT
       `キャンペーンID`,
       `配信月`,
       MAX(SAFE_CAST(`目標CPA` AS FLOAT64)) AS `目標CPA`
-    FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.CV_List`
+    FROM `{table_id("CV_List")}`
     WHERE SAFE_CAST(`目標CPA` AS FLOAT64) IS NOT NULL
     GROUP BY
       `キャンペーンID`,
       `配信月`
     """
-    return bq.query(query).to_dataframe()
+    return run_query(query)
+
 
+# このページで使う列だけを取得（キャンペーン集計キー＋集計値。列はウォームアップと共有）
+RAW_COLS = MARKET_RAW_COLS
+KPI_COLS = MARKET_KPI_COLS
 
-df_raw = load_final_ad_data()
-df_kpi = load_kpi_settings()
-df_cv_target = load_cv_targets()
+# 3つのクエリは互いに独立しているので同時に取得する
+#   ※ 明細には絞り込み用の索引も付けて受け取る（キャッシュと一緒に保持。前処理は行順を変えない）
+#   ※ 月別推移・複合折れ線は明細ではなく月次キューブ（配信月 × ディメンションの合計表）から描く
+(df_raw, raw_index), (cube, cube_index), df_kpi, df_cv_target = load_parallel(
+    lambda: load_final_ad_data(RAW_COLS, index_cols=MARKET_INDEX_COLS),
+    lambda: load_ad_cube(index_cols=CUBE_DIMS),
+    lambda: load_kpi_settings(KPI_COLS),
+    load_cv_targets,
+)
 
 if df_raw.empty:
     st.warning("Final_Ad_Data_Last にデータがありません。")
@@ -90,19 +80,19 @@ for col in ["Cost", "Clicks", "Impressions", "conv_total"]:
         df_raw[col] = pd.to_numeric(df_raw[col], errors="coerce")
 
 # 配信月（文字列と datetime の両方を用意）
-if "配信月" in df_raw.columns:
-    df_raw["配信月"] = df_raw["配信月"].astype(str)
+def month_start(values: pd.Series) -> pd.Series:
     # "YYYY/MM" でも "YYYY-MM" でもパースできるように一旦 - に統一
-    df_raw["配信月_norm"] = (
-        df_raw["配信月"]
+    norm = (
+        values.astype(str)
         .str.replace(".", "-", regex=False)
         .str.replace("/", "-", regex=False)
     )
-    df_raw["配信月_dt"] = pd.to_datetime(
-        df_raw["配信月_norm"] + "-01",
-        format="%Y-%m-%d",
-        errors="coerce",
-    )
+    return pd.to_datetime(norm + "-01", format="%Y-%m-%d", errors="coerce")
+
+
+if "配信月" in df_raw.columns:
+    df_raw["配信月"] = df_raw["配信月"].astype(str)
+    df_raw["配信月_dt"] = month_start(df_raw["配信月"])
     # 表示用は "YYYY/MM" 統一
     df_raw["配信月"] = df_raw["配信月_dt"].dt.strftime("%Y/%m")
 
@@ -139,7 +129,7 @@ agg_dict = {
 
 df_campaign = (
     df_raw
-    .groupby(group_cols, dropna=False, as_index=False)
+    .groupby(group_cols, dropna=False, as_index=False, observed=True)
     .agg(agg_dict)
 )
 
@@ -148,20 +138,7 @@ for col in ["Cost", "Clicks", "Impressions", "conv_total"]:
     if col in df_campaign.columns:
         df_campaign[col] = pd.to_numeric(df_campaign[col], errors="coerce")
 
-cost = df_campaign["Cost"]
-clicks = df_campaign["Clicks"]
-imps = df_campaign["Impressions"]
-cv = df_campaign["conv_total"]
-
-mask_cv_pos    = (cv > 0).fillna(False)
-mask_click_pos = (clicks > 0).fillna(False)
-mask_imp_pos   = (imps > 0).fillna(False)
-
-df_campaign["CPA"] = np.where(mask_cv_pos,    cost / cv,             np.nan)
-df_campaign["CVR"] = np.where(mask_click_pos, cv / clicks,           np.nan)
-df_campaign["CTR"] = np.where(mask_imp_pos,   clicks / imps,         np.nan)
-df_campaign["CPC"] = np.where(mask_click_pos, cost / clicks,         np.nan)
-df_campaign["CPM"] = np.where(mask_imp_pos,   cost * 1000.0 / imps,  np.nan)
+add_metrics(df_campaign)
 
 # KPI マスタを JOIN
 if not df_kpi.empty:
@@ -188,47 +165,7 @@ if (
 # ──────────────────────────────────────────────
 # 評価列（◎○△×）
 # ──────────────────────────────────────────────
-def grade_lower_better(val, best, good, min_):
-    if pd.isna(val) or pd.isna(best) or pd.isna(good) or pd.isna(min_):
-        return None
-    if val <= best:
-        return "◎"
-    if val <= good:
-        return "○"
-    if val <= min_:
-        return "△"
-    return "×"
-
-
-def grade_higher_better(val, best, good, min_):
-    if pd.isna(val) or pd.isna(best) or pd.isna(good) or pd.isna(min_):
-        return None
-    if val >= best:
-        return "◎"
-    if val >= good:
-        return "○"
-    if val >= min_:
-        return "△"
-    return "×"
-
-
-for metric, grader in [
-    ("CPA", grade_lower_better),
-    ("CPC", grade_lower_better),
-    ("CPM", grade_lower_better),
-    ("CVR", grade_higher_better),
-    ("CTR", grade_higher_better),
-]:
-    base = metric
-    df_campaign[f"{metric}_評価"] = df_campaign.apply(
-        lambda r: grader(
-            r.get(base),
-            r.get(f"{base}_best"),
-            r.get(f"{base}_good"),
-            r.get(f"{base}_min"),
-        ),
-        axis=1,
-    )
+grade_frame(df_campaign)
 
 # ──────────────────────────────────────────────
 # フィルター UI（Market 用）
@@ -293,7 +230,7 @@ def options(col: str):
 
     # それ以外は出現件数の多い順
     counts = s.value_counts()
-    return counts.index.tolist()
+    return counts[counts > 0].index.tolist()  # category 列は未出現の値も0件で並ぶので除く
 
 col1, col2, col3 = st.columns(3)
 with col1:
@@ -330,26 +267,30 @@ def show_filter_summary():
         unsafe_allow_html=True,
     )
 
+market_filters = {
+    "メインカテゴリ": sel_main,
+    "サブカテゴリ": sel_sub,
+    "広告目的": sel_goal,
+    "地方": sel_area,
+    "都道府県": sel_pref,
+    "building_count": sel_seg,
+}
+
+
 # 共通フィルター関数（キャンペーン単位・明細どちらにも使う）
-def apply_filters(df: pd.DataFrame) -> pd.DataFrame:
-    cond = pd.Series(True, index=df.index)
-    if sel_main and "メインカテゴリ" in df.columns:
-        cond &= df["メインカテゴリ"].isin(sel_main)
-    if sel_sub and "サブカテゴリ" in df.columns:
-        cond &= df["サブカテゴリ"].isin(sel_sub)
-    if sel_goal and "広告目的" in df.columns:
-        cond &= df["広告目的"].isin(sel_goal)
-    if sel_area and "地方" in df.columns:
-        cond &= df["地方"].isin(sel_area)
-    if sel_pref and "都道府県" in df.columns:
-        cond &= df["都道府県"].isin(sel_pref)
-    if sel_seg and "building_count" in df.columns:
-        cond &= df["building_count"].isin(sel_seg)
-    return df.loc[cond].copy()
+def apply_filters(df: pd.DataFrame, index: FilterIndex | None = None) -> pd.DataFrame:
+    # 索引が無い（集計後の df_campaign など）場合は各列 isin で判定
+    return index_for(df, index).take(df, market_filters)
 
 
 df_campaign_f = apply_filters(df_campaign)
-df_raw_f = apply_filters(df_raw)
+
+# 推移グラフ用：配信月 × カテゴリの合計（キューブで表せない条件のときだけ明細から）
+if cube_covers(cube, market_filters) and "配信月" in cube.columns:
+    df_trend = rollup(cube, ["配信月", "メインカテゴリ", "サブカテゴリ"], market_filters, cube_index)
+    df_trend["配信月_dt"] = month_start(df_trend["配信月"])
+else:
+    df_trend = apply_filters(df_raw, raw_index)
 
 if df_campaign_f.empty:
     st.warning("該当データがありません。条件を変えて再度お試しください。")
@@ -459,8 +400,20 @@ kpi_dict = {
     "CPM": kpi_row["CPM_good"],
 }
 
-if "配信月_dt" in df_raw_f.columns and not df_raw_f.empty:
-    df_month = df_raw_f.copy()
+INDICATORS = ["CPA", "CVR", "CTR", "CPC", "CPM"]
+
+# グラフはデータ版・フィルター条件・今月ごとにキャッシュ（同じ条件の再実行では集計・組み立てをしない）
+figure_base = (
+    data_version(FINAL_AD_DATA, CLIENT_SETTINGS, KPI_SETTINGS),
+    tuple(sorted(kpi_dict.items())),  # 目標線の値（別プロセスでの KPI 編集は版数に出ないので値そのものをキーに）
+    market_filters,
+    pd.Timestamp.today().strftime("%Y-%m"),
+)
+
+
+def build_monthly_figures(df_trend: pd.DataFrame) -> dict:
+    """指標ごとの月別推移グラフ（実績 vs KPI）{指標: go.Figure | None}"""
+    df_month = df_trend.copy()
 
     monthly = (
         df_month.groupby("配信月_dt", as_index=False)
@@ -473,36 +426,13 @@ if "配信月_dt" in df_raw_f.columns and not df_raw_f.empty:
     )
 
     # Ad Drive と同じ計算式で再計算
-    monthly["CPA"] = monthly.apply(
-        lambda r: r["Cost"] / r["conv_total"] if r["conv_total"] > 0 else np.nan,
-        axis=1,
-    )
-    monthly["CVR"] = monthly.apply(
-        lambda r: r["conv_total"] / r["Clicks"] if r["Clicks"] > 0 else np.nan,
-        axis=1,
-    )
-    monthly["CTR"] = monthly.apply(
-        lambda r: r["Clicks"] / r["Impressions"] if r["Impressions"] > 0 else np.nan,
-        axis=1,
-    )
-    monthly["CPC"] = monthly.apply(
-        lambda r: r["Cost"] / r["Clicks"] if r["Clicks"] > 0 else np.nan,
-        axis=1,
-    )
-    monthly["CPM"] = monthly.apply(
-        lambda r: (r["Cost"] * 1000 / r["Impressions"]) if r["Impressions"] > 0 else np.nan,
-        axis=1,
-    )
-
-    indicators = ["CPA", "CVR", "CTR", "CPC", "CPM"]
-    for ind in indicators:
-        st.markdown(f"#### 📉 {ind} 推移")
-        # 👉 各推移グラフごとにフィルターサマリを表示
-        show_filter_summary()
+    add_metrics(monthly)
 
+    figs = {}
+    for ind in INDICATORS:
         df_plot = monthly[["配信月_dt", ind]].dropna().sort_values("配信月_dt").copy()
         if df_plot.empty:
-            st.info("この条件ではグラフ用のデータがありません。")
+            figs[ind] = None
             continue
 
         # KPI（CVR・CTR は % → 小数へ）
@@ -586,7 +516,20 @@ if "配信月_dt" in df_raw_f.columns and not df_raw_f.empty:
                 hovermode="x unified",
             )
 
-        st.plotly_chart(fig, use_container_width=True)
+        figs[ind] = fig
+    return figs
+
+
+if "配信月_dt" in df_trend.columns and not df_trend.empty:
+    monthly_figs = cached_figures(("market/monthly",) + figure_base, lambda: build_monthly_figures(df_trend))
+    for ind in INDICATORS:
+        st.markdown(f"#### 📉 {ind} 推移")
+        # 👉 各推移グラフごとにフィルターサマリを表示
+        show_filter_summary()
+        if monthly_figs.get(ind) is None:
+            st.info("この条件ではグラフ用のデータがありません。")
+            continue
+        st.plotly_chart(monthly_figs[ind], use_container_width=True)
 else:
     st.info("配信月情報がないため、月別推移グラフは表示できません。")
 
@@ -595,128 +538,113 @@ else:
 # ──────────────────────────────────────────────
 st.markdown("### 📈 配信月 × メインカテゴリ × サブカテゴリ 複合折れ線グラフ（指標別）")
 
-if "配信月_dt" in df_raw_f.columns and not df_raw_f.empty:
-    df_line = df_raw_f.copy()
+def build_line_figures(df_line: pd.DataFrame) -> dict:
+    """指標ごとの 配信月 × メインカテゴリ × サブカテゴリ 折れ線 {指標: go.Figure | None}"""
+    line_agg = (
+        df_line
+        .groupby(["配信月_dt", "メインカテゴリ", "サブカテゴリ"], as_index=False, observed=True)
+        .agg(
+            Cost=("Cost", "sum"),
+            conv_total=("conv_total", "sum"),
+            Impressions=("Impressions", "sum"),
+            Clicks=("Clicks", "sum"),
+        )
+    )
 
-    # メインカテゴリ・サブカテゴリが存在する行のみ
-    if "メインカテゴリ" in df_line.columns and "サブカテゴリ" in df_line.columns:
-        df_line = df_line[df_line["メインカテゴリ"].notna() & df_line["サブカテゴリ"].notna()]
+    # 指標計算（Ad Drive と同じロジック）
+    add_metrics(line_agg)
 
-        line_agg = (
-            df_line
-            .groupby(["配信月_dt", "メインカテゴリ", "サブカテゴリ"], as_index=False)
-            .agg(
-                Cost=("Cost", "sum"),
-                conv_total=("conv_total", "sum"),
-                Impressions=("Impressions", "sum"),
-                Clicks=("Clicks", "sum"),
-            )
-        )
+    # 表示用カテゴリ名
+    line_agg["カテゴリ"] = (
+        line_agg["メインカテゴリ"].astype(str) + " / " + line_agg["サブカテゴリ"].astype(str)
+    )
 
-        # 指標計算（Ad Drive と同じロジック）
-        line_agg["CPA"] = np.where(
-            line_agg["conv_total"] > 0,
-            line_agg["Cost"] / line_agg["conv_total"],
-            np.nan,
-        )
-        line_agg["CVR"] = np.where(
-            line_agg["Clicks"] > 0,
-            line_agg["conv_total"] / line_agg["Clicks"],
-            np.nan,
-        )
-        line_agg["CTR"] = np.where(
-            line_agg["Impressions"] > 0,
-            line_agg["Clicks"] / line_agg["Impressions"],
-            np.nan,
-        )
-        line_agg["CPC"] = np.where(
-            line_agg["Clicks"] > 0,
-            line_agg["Cost"] / line_agg["Clicks"],
-            np.nan,
-        )
-        line_agg["CPM"] = np.where(
-            line_agg["Impressions"] > 0,
-            line_agg["Cost"] * 1000 / line_agg["Impressions"],
-            np.nan,
+    # 今月までの制限
+    today = pd.Timestamp.today().normalize()
+    current_month_start = pd.Timestamp(today.year, today.month, 1)
+
+    figs = {}
+    for 指標 in INDICATORS:
+        if 指標 not in line_agg.columns:
+            figs[指標] = None
+            continue
+
+        df_plot = line_agg[["配信月_dt", "カテゴリ", 指標]].dropna().copy()
+        df_plot = df_plot[df_plot["配信月_dt"] <= current_month_start]
+        df_plot = df_plot.sort_values("配信月_dt")
+
+        if df_plot.empty:
+            figs[指標] = None
+            continue
+
+        fig_line = px.line(
+            df_plot,
+            x="配信月_dt",
+            y=指標,
+            color="カテゴリ",
         )
 
-        # 表示用カテゴリ名
-        line_agg["カテゴリ"] = (
-            line_agg["メインカテゴリ"].astype(str) + " / " + line_agg["サブカテゴリ"].astype(str)
+        # 軸・フォーマット調整
+        fig_line.update_layout(
+            xaxis_title="配信月",
+            xaxis_tickformat="%Y/%m",
+            height=420,
+            hovermode="x unified",
         )
 
-        指標リスト = ["CPA", "CVR", "CTR", "CPC", "CPM"]
-        折れ線タブ = st.tabs(指標リスト)
+        if 指標 in ["CVR", "CTR"]:
+            fig_line.update_yaxes(
+                title=f"{指標} (%)",
+                tickformat=".1%",
+            )
+        else:
+            if 指標 in ["CPA", "CPC", "CPM"]:
+                fig_line.update_yaxes(
+                    title=f"{指標}",
+                    tickformat=",",
+                )
+            else:
+                fig_line.update_yaxes(title=f"{指標}")
+
+        # ツールチップを「配信月 = 2025/07」形式 & 金額/％表示に
+        if 指標 in ["CPA", "CPC", "CPM"]:
+            fig_line.update_traces(
+                hovertemplate="配信月 = %{x|%Y/%m}<br>" +
+                              f"{指標}：¥%{{y:,.0f}}<extra></extra>"
+            )
+        elif 指標 in ["CVR", "CTR"]:
+            # y は 0.123 形式なので % 表示
+            fig_line.update_traces(
+                hovertemplate="配信月 = %{x|%Y/%m}<br>" +
+                              f"{指標}：%{{y:.2%}}<extra></extra>"
+            )
+        else:
+            fig_line.update_traces(
+                hovertemplate="配信月 = %{x|%Y/%m}<br>" +
+                              f"{指標}：%{{y}}<extra></extra>"
+            )
+
+        figs[指標] = fig_line
+    return figs
 
-        # 今月までの制限
-        today = pd.Timestamp.today().normalize()
-        current_month_start = pd.Timestamp(today.year, today.month, 1)
 
-        for 指標, tab in zip(指標リスト, 折れ線タブ):
+if "配信月_dt" in df_trend.columns and not df_trend.empty:
+    df_line = df_trend.copy()
+
+    # メインカテゴリ・サブカテゴリが存在する行のみ
+    if "メインカテゴリ" in df_line.columns and "サブカテゴリ" in df_line.columns:
+        df_line = df_line[df_line["メインカテゴリ"].notna() & df_line["サブカテゴリ"].notna()]
+        line_figs = cached_figures(("market/category_lines",) + figure_base, lambda: build_line_figures(df_line))
+
+        折れ線タブ = st.tabs(INDICATORS)
+        for 指標, tab in zip(INDICATORS, 折れ線タブ):
             with tab:
                 st.markdown(f"#### 📉 {指標} 達成率の推移（メインカテゴリ・サブカテゴリ別）")
                 show_filter_summary()
-
-                if 指標 not in line_agg.columns:
-                    st.info("この指標は計算対象外です。")
-                    continue
-
-                df_plot = line_agg[["配信月_dt", "カテゴリ", 指標]].dropna().copy()
-                df_plot = df_plot[df_plot["配信月_dt"] <= current_month_start]
-                df_plot = df_plot.sort_values("配信月_dt")
-
-                if df_plot.empty:
+                if line_figs.get(指標) is None:
                     st.info("この条件ではグラフ用のデータがありません。")
                     continue
-
-                fig_line = px.line(
-                    df_plot,
-                    x="配信月_dt",
-                    y=指標,
-                    color="カテゴリ",
-                )
-
-                # 軸・フォーマット調整
-                fig_line.update_layout(
-                    xaxis_title="配信月",
-                    xaxis_tickformat="%Y/%m",
-                    height=420,
-                    hovermode="x unified",
-                )
-
-                if 指標 in ["CVR", "CTR"]:
-                    fig_line.update_yaxes(
-                        title=f"{指標} (%)",
-                        tickformat=".1%",
-                    )
-                else:
-                    if 指標 in ["CPA", "CPC", "CPM"]:
-                        fig_line.update_yaxes(
-                            title=f"{指標}",
-                            tickformat=",",
-                        )
-                    else:
-                        fig_line.update_yaxes(title=f"{指標}")
-
-                # ツールチップを「配信月 = 2025/07」形式 & 金額/％表示に
-                if 指標 in ["CPA", "CPC", "CPM"]:
-                    fig_line.update_traces(
-                        hovertemplate="配信月 = %{x|%Y/%m}<br>" +
-                                      f"{指標}：¥%{{y:,.0f}}<extra></extra>"
-                    )
-                elif 指標 in ["CVR", "CTR"]:
-                    # y は 0.123 形式なので % 表示
-                    fig_line.update_traces(
-                        hovertemplate="配信月 = %{x|%Y/%m}<br>" +
-                                      f"{指標}：%{{y:.2%}}<extra></extra>"
-                    )
-                else:
-                    fig_line.update_traces(
-                        hovertemplate="配信月 = %{x|%Y/%m}<br>" +
-                                      f"{指標}：%{{y}}<extra></extra>"
-                    )
-
-                st.plotly_chart(fig_line, use_container_width=True)
+                st.plotly_chart(line_figs[指標], use_container_width=True)
     else:
         st.info("メインカテゴリ・サブカテゴリ情報がないため、複合折れ線グラフは表示できません。")
 else:
@@ -729,20 +657,16 @@ st.markdown("### 🗾 都道府県別 CPA")
 # ここでもフィルター条件を表示
 show_filter_summary()
 
-df_pref = df_campaign_f.copy()
-if not df_pref.empty and "都道府県" in df_pref.columns:
+def build_pref_figure(df_pref: pd.DataFrame) -> dict:
+    """都道府県別 CPA の棒グラフ {"CPA": go.Figure}"""
     pref_agg = (
-        df_pref.groupby("都道府県", as_index=False)
+        df_pref.groupby("都道府県", as_index=False, observed=True)
         .agg(
             Cost=("Cost", "sum"),
             conv_total=("conv_total", "sum"),
         )
     )
-    pref_agg["CPA"] = np.where(
-        pref_agg["conv_total"] > 0,
-        pref_agg["Cost"] / pref_agg["conv_total"],
-        np.nan,
-    )
+    add_metrics(pref_agg, ["CPA"])
     pref_agg = pref_agg.dropna(subset=["CPA"])
 
     # 棒グラフは CPA の値順（小さい順）で並べる
@@ -764,6 +688,12 @@ if not df_pref.empty and "都道府県" in df_pref.columns:
     )
     fig_pref.update_layout(height=420)
 
-    st.plotly_chart(fig_pref, use_container_width=True)
+    return {"CPA": fig_pref}
+
+
+df_pref = df_campaign_f
+if not df_pref.empty and "都道府県" in df_pref.columns:
+    pref_figs = cached_figures(("market/prefecture",) + figure_base, lambda: build_pref_figure(df_pref))
+    st.plotly_chart(pref_figs["CPA"], use_container_width=True)
 else:
     st.info("都道府県別集計に利用できるデータがありません。")
@@ -1,5 +1,4 @@
 import streamlit as st
-from google.cloud import bigquery
 import pandas as pd
 import numpy as np
 import html
@@ -15,61 +14,82 @@ st.set_page_config(page_title="LP_Score", layout="wide")
 st.title("🎨 LP Score")
 st.markdown("###### LP（ランディングページ/URL）単位での広告スコアを集計します。")
 
-# --- 認証 & 接続 ---
-cred = dict(st.secrets["connections"]["bigquery"])
-cred["private_key"] = cred["private_key"].replace("\\n", "\n")
-bq = bigquery.Client.from_service_account_info(cred)
-
-# --- データ取得 ---
-@st.cache_data(ttl=60)
-def load_lp_data():
-    query = """
-        SELECT
-          client_name,
-          `URL`,
-          `メインカテゴリ`,
-          `サブカテゴリ`,
-          `広告目的`,
-          `広告媒体`,
-          Cost,
-          Impressions,
-          Clicks,
-          `コンバージョン数`,
-          CPA,
-          CPC,
-          CPM,
-          CVR,
-          CTR
-        FROM `careful-chess-406412.SHOSAN_Ad_Tokyo.LP_Score_Ready`
-        ORDER BY Cost DESC
-    """
-    return bq.query(query).to_dataframe()
-
-df = load_lp_data()
+# --- データ取得（接続・キャッシュは bq_data で共通化） ---
+from bq_data import load_lp_score
+
+df = load_lp_score()
 if df.empty:
     st.warning("⚠️ データがありません")
     st.stop()
 
-# --- 前処理 ---
-def format_num(x, is_money=False):
-    if pd.isna(x): return "-"
-    if is_money: return f"{x:,.0f}円"
-    return f"{x:,.0f}"
-
-def format_percent(x):
-    if pd.isna(x): return "-"
-    return f"{x*100:.2f}%"
-
-def make_link(url):
-    if pd.isna(url) or not str(url).startswith("http"):
-        return "-"
-    esc_url = html.escape(url)
-    return (
-        f'<div style="max-width:640px; overflow-x:auto;">'
-        f'<a href="{esc_url}" target="_blank" '
-        f'style="display:inline-block; word-break:break-all; font-size:13px;">'
-        f'{esc_url}</a></div>'
+# --- 前処理（書式整形は表示するページ分だけ、列単位でまとめて行う） ---
+LP_PAGE_SIZES = [20, 50, 100, 200]
+
+
+def fmt_money(s: pd.Series) -> pd.Series:
+    """数値列 → "1,234円"（欠損・±inf は "-"）"""
+    v = pd.to_numeric(s, errors="coerce").astype(float)
+    v = v.where(np.isfinite(v)).round().astype("Int64").astype("string")  # inf は Int64 に変換できない
+    return (v.str.replace(r"\B(?=(\d{3})+(?!\d))", ",", regex=True) + "円").fillna("-")
+
+
+def fmt_percent(s: pd.Series) -> pd.Series:
+    """比率列 → "1.23%"（欠損は "-"）"""
+    v = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float) * 100
+    out = np.char.mod("%.2f%%", np.nan_to_num(v))
+    return pd.Series(np.where(np.isnan(v), "-", out), index=s.index)
+
+
+def escape(s: pd.Series) -> pd.Series:
+    """文字列列を HTML エスケープ（html.escape と同じ。' も変換する）"""
+    return s.astype("string").fillna("").map(html.escape).astype("string")
+
+
+def link_html(s: pd.Series) -> pd.Series:
+    """URL 列 → リンク HTML（http で始まらないものは "-"）"""
+    url = escape(s)
+    link = (
+        '<div style="max-width:640px; overflow-x:auto;">'
+        '<a href="' + url + '" target="_blank" '
+        'style="display:inline-block; word-break:break-all; font-size:13px;">'
+        + url + "</a></div>"
     )
+    return link.where(url.str.startswith("http"), "-")
+
+
+def render_cards(page_df: pd.DataFrame) -> str:
+    """1ページ分のカードを1つの HTML にまとめる"""
+    d = {
+        "URL": link_html(page_df["URL"]),
+        "Cost": fmt_money(page_df["Cost"]),
+        "CPA": fmt_money(page_df["CPA"]),
+        "CPC": fmt_money(page_df["CPC"]),
+        "CPM": fmt_money(page_df["CPM"]),
+        "CTR": fmt_percent(page_df["CTR"]),
+        "CVR": fmt_percent(page_df["CVR"]),
+    }
+    for col in ["client_name", "メインカテゴリ", "サブカテゴリ", "広告目的", "広告媒体", "コンバージョン数"]:
+        d[col] = escape(page_df[col])
+    cards = (
+        "<div style='border:1px solid #ddd; border-radius:10px; padding:16px; margin-bottom:16px; background:#fdfdfd; font-size: 14px;'>"
+        "<div><b>URL：</b>" + d["URL"] + "</div>"
+        "<div>"
+        "<b>クライアント名：</b>" + d["client_name"] + "　"
+        "<b>メインカテゴリ：</b>" + d["メインカテゴリ"] + "　"
+        "<b>サブカテゴリ：</b>" + d["サブカテゴリ"] + "　"
+        "<b>広告目的：</b>" + d["広告目的"] + "　"
+        "<b>広告媒体：</b>" + d["広告媒体"] + "</div>"
+        "<div>"
+        "<b>消化金額：</b>" + d["Cost"] + "　"
+        "<b>CV数：</b>" + d["コンバージョン数"] + "　"
+        "<b>CPA：</b>" + d["CPA"] + "　"
+        "<b>CTR：</b>" + d["CTR"] + "　"
+        "<b>CVR：</b>" + d["CVR"] + "　"
+        "<b>CPC：</b>" + d["CPC"] + "　"
+        "<b>CPM：</b>" + d["CPM"] + "</div>"
+        "</div>"
+    )
+    return "".join(cards.tolist())
 
 # --- フィルターリスト ---
 client_opts = sorted(df["client_name"].dropna().unique())
@@ -161,44 +181,51 @@ else:  # 消化金額が多い順（デフォルト）
         na_position="last",
     )
 
-# --- 書式整形 ---
-show_df = filtered_sorted.copy()
-show_df["URL"] = show_df["URL"].apply(make_link)
-show_df["Cost"] = show_df["Cost"].apply(lambda x: format_num(x, is_money=True))
-show_df["CPA"] = show_df["CPA"].apply(lambda x: format_num(x, is_money=True))
-show_df["CPC"] = show_df["CPC"].apply(lambda x: format_num(x, is_money=True))
-show_df["CPM"] = show_df["CPM"].apply(lambda x: format_num(x, is_money=True))
-show_df["CTR"] = show_df["CTR"].apply(format_percent)
-show_df["CVR"] = show_df["CVR"].apply(format_percent)
+# --- 表示 ---
+st.markdown("<h4 style='margin-top:2rem;'>📊 LP（URL）ごとの集計</h4>", unsafe_allow_html=True)
 
 disp_cols = [
     "URL", "client_name", "メインカテゴリ", "サブカテゴリ", "広告目的", "広告媒体",
     "Cost", "Impressions", "Clicks", "コンバージョン数", "CPA", "CPC", "CVR", "CTR", "CPM"
 ]
-show_df = show_df[disp_cols]
-
-# --- 表示 ---
-st.markdown("<h4 style='margin-top:2rem;'>📊 LP（URL）ごとの集計</h4>", unsafe_allow_html=True)
-for _, row in show_df.iterrows():
-    card_html = f"""
-    <div style='border:1px solid #ddd; border-radius:10px; padding:16px; margin-bottom:16px; background:#fdfdfd; font-size: 14px;'>
-      <div><b>URL：</b>{row['URL']}</div>
-      <div>
-        <b>クライアント名：</b>{row['client_name']}　
-        <b>メインカテゴリ：</b>{row['メインカテゴリ']}　
-        <b>サブカテゴリ：</b>{row['サブカテゴリ']}　
-        <b>広告目的：</b>{row['広告目的']}　
-        <b>広告媒体：</b>{row['広告媒体']}
-      </div>
-      <div>
-        <b>消化金額：</b>{row['Cost']}　
-        <b>CV数：</b>{row['コンバージョン数']}　
-        <b>CPA：</b>{row['CPA']}　
-        <b>CTR：</b>{row['CTR']}　
-        <b>CVR：</b>{row['CVR']}　
-        <b>CPC：</b>{row['CPC']}　
-        <b>CPM：</b>{row['CPM']}
-      </div>
-    </div>
-    """
-    st.markdown(card_html, unsafe_allow_html=True)
+view = st.radio("表示形式", ["カード", "表（列見出しで並び替え）"], horizontal=True)
+
+if view == "カード":
+    # ページ単位で1回の st.markdown にまとめて描画
+    total = len(filtered_sorted)
+    col_size, col_page = st.columns([1, 3])
+    with col_size:
+        page_size = st.selectbox("1ページの件数", LP_PAGE_SIZES, index=1)
+    pages = max(1, (total - 1) // page_size + 1)
+    with col_page:
+        page = st.number_input(
+            f"ページ（全 {pages:,} ページ／{total:,} 件）", min_value=1, max_value=pages, value=1, step=1
+        )
+    start = (int(page) - 1) * page_size
+    page_df = filtered_sorted.iloc[start:start + page_size]
+    if page_df.empty:
+        st.info("該当する LP がありません")
+    else:
+        st.caption(f"{start + 1:,}〜{start + len(page_df):,} 件目を表示")
+        st.markdown(render_cards(page_df), unsafe_allow_html=True)
+else:
+    # 全件を数値のまま渡し、書式は列設定で付ける（並び替えは数値順になる）
+    table_df = filtered_sorted[disp_cols].copy()
+    table_df["CTR"] = table_df["CTR"] * 100
+    table_df["CVR"] = table_df["CVR"] * 100
+    st.dataframe(
+        table_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "URL": st.column_config.LinkColumn("URL"),
+            "client_name": "クライアント名",
+            "Cost": st.column_config.NumberColumn("消化金額", format="%.0f円"),
+            "コンバージョン数": st.column_config.NumberColumn("CV数", format="%d"),
+            "CPA": st.column_config.NumberColumn("CPA", format="%.0f円"),
+            "CPC": st.column_config.NumberColumn("CPC", format="%.0f円"),
+            "CPM": st.column_config.NumberColumn("CPM", format="%.0f円"),
+            "CVR": st.column_config.NumberColumn("CVR", format="%.2f%%"),
+            "CTR": st.column_config.NumberColumn("CTR", format="%.2f%%"),
+        },
+    )
@@ -16,15 +16,14 @@ require_login()
 st.set_page_config(page_title="Unit設定", layout="wide")
 st.title("⚙️ Unit設定")
 
-# --- BigQuery接続 ---
-info_dict = dict(st.secrets["connections"]["bigquery"])
-info_dict["private_key"] = info_dict["private_key"].replace("\\n", "\n")
-client = bigquery.Client.from_service_account_info(info_dict)
+# --- BigQuery接続（共通クライアント） ---
+from bq_data import PROJECT_ID, DATASET, UNIT_MAPPING, get_bq_client, invalidate_table, versioned
+client = get_bq_client()
 
 # --- テーブル定義 ---
-project_id = "careful-chess-406412"
-dataset = "SHOSAN_Ad_Tokyo"
-table = "UnitMapping"
+project_id = PROJECT_ID
+dataset = DATASET
+table = UNIT_MAPPING
 full_table = f"{project_id}.{dataset}.{table}"
 
 # --- 担当者一覧の動的取得 ---
@@ -39,8 +38,9 @@ def get_unique_tantousha():
     return client.query(query).to_dataframe()
 
 # --- Unit Mapping の取得 ---
+@versioned(UNIT_MAPPING)
 @st.cache_data(ttl=60)
-def load_unit_mapping():
+def load_unit_mapping(versions=()):
     return client.query(f"SELECT * FROM {full_table}").to_dataframe()
 
 # ✅ 追加：空白/None系の正規化（保存直前に必ず通す）
@@ -207,7 +207,7 @@ else:
             updated_df = pd.concat([current_df, new_row], ignore_index=True)
             save_to_bq(updated_df)
             st.success(f"✅ {selected_person} を {input_unit} に追加しました！")
-            st.cache_data.clear()
+            invalidate_table(UNIT_MAPPING)
             current_df = load_unit_mapping()
         else:
             st.warning("⚠️ 担当者・Unit・開始月は必須です")
@@ -234,7 +234,7 @@ with st.form("異動フォーム"):
             updated_df = pd.concat([updated_df, pd.DataFrame([new_row])], ignore_index=True)
             save_to_bq(updated_df)
             st.success(f"✅ {move_person} を {new_unit} に異動登録しました！")
-            st.cache_data.clear()
+            invalidate_table(UNIT_MAPPING)
             current_df = load_unit_mapping()
         else:
             st.warning("⚠️ 異動先Unitと異動月は必須です")
@@ -271,7 +271,7 @@ editable_df = st.data_editor(
 if st.button("💾 修正内容を保存"):
     save_to_bq(editable_df)
     st.success("✅ 編集内容を保存しました")
-    st.cache_data.clear()
+    invalidate_table(UNIT_MAPPING)
     current_df = load_unit_mapping()
 
 # === ⑤ 異動履歴 ===
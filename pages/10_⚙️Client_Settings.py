@@ -19,15 +19,14 @@ require_login()
 st.set_page_config(page_title="クライアント設定", layout="wide")
 st.title("⚙️ クライアント設定")
 
-# --- BigQuery 認証 ---
-info = dict(st.secrets["connections"]["bigquery"])
-info["private_key"] = info["private_key"].replace("\\n", "\n")
-client = bigquery.Client.from_service_account_info(info)
+# --- BigQuery 認証（共通クライアント） ---
+from bq_data import PROJECT_ID, DATASET, CLIENT_SETTINGS, get_bq_client, load_client_settings, invalidate_table
+client = get_bq_client()
 
 # --- テーブル情報 ---
-project_id = "careful-chess-406412"
-dataset = "SHOSAN_Ad_Tokyo"
-table = "ClientSettings"
+project_id = PROJECT_ID
+dataset = DATASET
+table = CLIENT_SETTINGS
 full_table = f"{project_id}.{dataset}.{table}"
 
 # URL 用のカラム名
@@ -70,12 +69,6 @@ def load_clients():
     """
     return client.query(query).to_dataframe()
 
-# --- 登録済み設定取得 ---
-@st.cache_data(ttl=60)
-def load_client_settings():
-    query = f"SELECT * FROM {full_table}"
-    return client.query(query).to_dataframe()
-
 clients_df = load_clients()
 settings_df = load_client_settings()
 
@@ -237,7 +230,7 @@ else:
                     job = client.load_table_from_dataframe(updated_df, full_table, job_config=job_config)
                     job.result()
                     st.success(f"✅ {selected_client} を登録しました！")
-                    st.cache_data.clear()
+                    invalidate_table(CLIENT_SETTINGS)
                     del st.session_state["random_suffix"]
             except Exception as e:
                 st.error(f"❌ 保存エラー: {e}")
@@ -415,7 +408,7 @@ else:
                     job = client.load_table_from_dataframe(settings_df, full_table, job_config=job_config)
                     job.result()
                     st.success("✅ 保存が完了しました！")
-                    st.cache_data.clear()
+                    invalidate_table(CLIENT_SETTINGS)
                     settings_df = load_client_settings()
                     for col in NEW_COLS:
                         if col not in settings_df.columns:
@@ -463,7 +456,7 @@ else:
                         job = client.load_table_from_dataframe(settings_df, full_table, job_config=job_config)
                         job.result()
                         st.success("🗑 削除が完了しました")
-                        st.cache_data.clear()
+                        invalidate_table(CLIENT_SETTINGS)
                 except Exception as e:
                     st.error(f"❌ 削除エラー: {e}")
 
@@ -481,112 +474,51 @@ else:
             settings_df[col] = ""
 
     link_df = settings_df.copy()
-    link_df["リンクURL"] = link_df["client_id"].apply(
-        lambda cid: f"https://sho-san-client-ad-score.streamlit.app/?client_id={cid}"
+    link_df["リンクURL"] = (
+        "https://sho-san-client-ad-score.streamlit.app/?client_id=" + link_df["client_id"].astype(str)
     )
 
     # 番号用ラベル（①〜⑥）
     circled_nums = ["①", "②", "③", "④", "⑤", "⑥"]
 
-    def build_url_links(row: pd.Series, prefix: str, max_n: int, label_prefix: str) -> str:
-        """登録されているURLにだけ、ラベル付きリンクを作って<br>で連結する"""
-        parts = []
+    # 広告マネージャーURL列（prefix, 最大数, 表示名）
+    manager_urls = [
+        ("meta_manager_url", 6, "Meta広告マネージャーURL"),
+        ("google_manager_url", 3, "Google広告マネージャーURL"),
+        ("line_manager_url", 3, "LINE広告マネージャーURL"),
+        ("other_manager_url", 3, "その他広告マネージャーURL"),
+    ]
+
+    # 1つの表コンポーネントで描画（件数が増えても要素数は一定。列見出しで並び替え・表右上で検索）
+    show_cols = ["client_name", "リンクURL", "report_display"]
+    column_config = {
+        "client_name": "クライアント名",
+        "リンクURL": st.column_config.LinkColumn("クライアント別ページ", display_text="▶ ページを開く"),
+        "report_display": "レポート表示",
+    }
+    for prefix, max_n, label in manager_urls:
         for i in range(1, max_n + 1):
             col = f"{prefix}_{i}"
-            if col in row.index and isinstance(row[col], str) and row[col].strip() != "":
-                num_label = circled_nums[i-1] if i-1 < len(circled_nums) else str(i)
-                label = f"{label_prefix}{num_label}"
-                url = row[col].strip()
-                parts.append(f'<a href="{url}" target="_blank">{label}</a>')
-        return "<br>".join(parts) if parts else "—"
-
-    st.divider()
-
-    # 列構成:
-    # クライアント名 / リンク / レポート表示 / MetaURL / GoogleURL / LINEURL / その他URL / 注力度 / 事業内容 / 棟数
-    header_cols = st.columns([2, 2, 1, 2, 2, 2, 2, 1, 1.5, 1.5])
-    header_cols[0].markdown("**クライアント名**")
-    header_cols[1].markdown("**クライアント別ページ**")
-    header_cols[2].markdown("**レポート表示**")
-    header_cols[3].markdown("**Meta広告マネージャーURL**")
-    header_cols[4].markdown("**Google広告マネージャーURL**")
-    header_cols[5].markdown("**LINE広告マネージャーURL**")
-    header_cols[6].markdown("**その他広告マネージャーURL**")
-    header_cols[7].markdown("**注力度**")
-    header_cols[8].markdown("**事業内容**")
-    header_cols[9].markdown("**棟数セグメント**")
-
-    st.divider()
-
-    for _, row in link_df.iterrows():
-        cols = st.columns([2, 2, 1, 2, 2, 2, 2, 1, 1.5, 1.5])
-        row_height = "80px"
-        row_style = f"border-bottom: 1px solid #ddd; min-height: {row_height}; display: flex; align-items: center;"
-
-        # クライアント名
-        with cols[0]:
-            st.markdown(f'<div style="{row_style}">{row["client_name"]}</div>', unsafe_allow_html=True)
-
-        # クライアント別ページリンク
-        with cols[1]:
-            button_html = f"""
-            <a href="{row['リンクURL']}" target="_blank" style="
-                text-decoration: none;
-                display: inline-block;
-                padding: 0.3em 0.8em;
-                border-radius: 6px;
-                background-color: rgb(53, 169, 195);
-                color: white;
-                font-weight: bold;">
-                ▶ ページを開く
-            </a>
-            """
-            st.markdown(f'<div style="{row_style}">{button_html}</div>', unsafe_allow_html=True)
-
-        # レポート表示
-        with cols[2]:
-            st.markdown(
-                f'<div style="{row_style}">{row.get("report_display") or "&nbsp;"} </div>',
-                unsafe_allow_html=True
-            )
-
-        # Meta広告マネージャーURL（①〜のリンク一覧）
-        with cols[3]:
-            meta_links_html = build_url_links(row, "meta_manager_url", 6, "Meta広告マネージャーURL")
-            st.markdown(f'<div style="{row_style}">{meta_links_html}</div>', unsafe_allow_html=True)
-
-        # Google広告マネージャーURL
-        with cols[4]:
-            google_links_html = build_url_links(row, "google_manager_url", 3, "Google広告マネージャーURL")
-            st.markdown(f'<div style="{row_style}">{google_links_html}</div>', unsafe_allow_html=True)
-
-        # LINE広告マネージャーURL
-        with cols[5]:
-            line_links_html = build_url_links(row, "line_manager_url", 3, "LINE広告マネージャーURL")
-            st.markdown(f'<div style="{row_style}">{line_links_html}</div>', unsafe_allow_html=True)
-
-        # その他広告マネージャーURL
-        with cols[6]:
-            other_links_html = build_url_links(row, "other_manager_url", 3, "その他広告マネージャーURL")
-            st.markdown(f'<div style="{row_style}">{other_links_html}</div>', unsafe_allow_html=True)
-
-        # 注力度
-        with cols[7]:
-            st.markdown(
-                f'<div style="{row_style}">{row.get("focus_level") or "&nbsp;"} </div>',
-                unsafe_allow_html=True
-            )
-
-        # 事業内容
-        with cols[8]:
-            st.markdown(
-                f'<div style="{row_style}">{row.get("buisiness_content") or "&nbsp;"} </div>',
-                unsafe_allow_html=True
-            )
-
-        # 棟数セグメント
-        with cols[9]:
-            st.markdown(
-                f'<div style="{row_style}">{row.get("building_count") or "&nbsp;"} </div>',
-                unsafe_allow_html=True
-            )
+            if col not in link_df.columns:
+                continue
+            # 従来どおり空でない値はすべてリンクとして出す（http で始まらない値も隠さない）
+            urls = link_df[col].astype("string").str.strip()
+            link_df[col] = urls.where(urls.fillna("") != "")
+            if link_df[col].isna().all():
+                continue  # 誰も登録していない枠は列ごと出さない
+            num_label = circled_nums[i-1] if i-1 < len(circled_nums) else str(i)
+            show_cols.append(col)
+            column_config[col] = st.column_config.LinkColumn(f"{label}{num_label}", display_text="開く")
+    show_cols += ["focus_level", "buisiness_content", "building_count"]
+    column_config.update({
+        "focus_level": "注力度",
+        "buisiness_content": "事業内容",
+        "building_count": "棟数セグメント",
+    })
+
+    st.dataframe(
+        link_df[[c for c in show_cols if c in link_df.columns]],
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config,
+    )
@@ -1,7 +1,5 @@
 import streamlit as st
 import pandas as pd
-from google.cloud import bigquery
-from google.oauth2 import service_account
 
 # ──────────────────────────────────────────────
 # ログイン認証
@@ -13,15 +11,14 @@ require_login()
 # ──────────────────────────────────────────────
 # KPI設定
 # ──────────────────────────────────────────────
-# --- 認証 ---
-info_dict = dict(st.secrets["connections"]["bigquery"])
-info_dict["private_key"] = info_dict["private_key"].replace("\\n", "\n")
-credentials = service_account.Credentials.from_service_account_info(info_dict)
-client = bigquery.Client(credentials=credentials, project=credentials.project_id)
+# --- 認証（共通クライアント） ---
+from bq_data import PROJECT_ID, DATASET, FINAL_AD_DATA, KPI_SETTINGS, get_credentials, get_bq_client, load_kpi_settings, invalidate_table
+credentials = get_credentials()
+client = get_bq_client()
 
-project_id = "careful-chess-406412"
-source_table = "SHOSAN_Ad_Tokyo.Final_Ad_Data_Last"
-target_table = "SHOSAN_Ad_Tokyo.Target_Indicators_Meta"
+project_id = PROJECT_ID
+source_table = f"{DATASET}.{FINAL_AD_DATA}"
+target_table = f"{DATASET}.{KPI_SETTINGS}"
 
 st.set_page_config(page_title="⚙️ KPI設定", layout="wide")
 st.title("⚙️ 広告KPI設定")
@@ -48,11 +45,9 @@ def get_unique_values():
 広告媒体一覧, メインカテゴリ一覧, サブカテゴリ一覧, 広告目的一覧 = get_unique_values()
 
 # --- 既存データ取得 ---
-@st.cache_data(ttl=60)
 def load_target_data():
     try:
-        query = f"SELECT * FROM `{project_id}`.`{target_table}`"
-        return client.query(query).to_dataframe()
+        return load_kpi_settings()
     except Exception:
         return pd.DataFrame(columns=[
             "広告媒体", "メインカテゴリ", "サブカテゴリ", "広告目的",
@@ -240,7 +235,7 @@ else:
                     credentials=credentials,
                 )
                 st.success("✅ データの保存に成功しました！")
-                st.cache_data.clear()
+                invalidate_table(KPI_SETTINGS)
             except Exception as e:
                 st.error("❌ 保存に失敗しました。エラー内容を確認してください。")
                 st.exception(e)
@@ -1,6 +1,10 @@
 import streamlit as st
 from google.cloud import bigquery
 
+from bq_data import get_frame_cache
+from figure_cache import clear_figures
+from warmup import warmup_status
+
 # 認証（全ページ共通の方式を踏襲）
 from auth import require_login, logout
 require_login()
@@ -28,10 +32,12 @@ div.stButton > button {
 
 # ---- キャッシュクリア
 st.subheader("🔄 キャッシュクリア")
-st.write("数値が更新されない・表示が古い場合に実行してください。")
+st.write("広告数値は0時･6時･12時･18時の更新後、数分以内に自動で最新化されます。それでも表示が古い場合に実行してください。")
 
 if st.button("🔄 キャッシュクリア", key="clear_cache_btn"):
     st.cache_data.clear()
+    get_frame_cache().clear()
+    clear_figures()
     st.session_state["cache_cleared"] = True   # ← フラグを立てる
     st.rerun()
 
@@ -41,6 +47,20 @@ if st.session_state.get("cache_cleared"):
     # 一度表示したらフラグを消す（何度も出ないように）
     del st.session_state["cache_cleared"]
 
+# 大きいテーブルのキャッシュ使用状況（コンテナのメモリ見積もり用）
+with st.expander("📊 キャッシュ使用状況（管理者用）", expanded=False):
+    warm = warmup_status()
+    warm_label = {"running": "⏳ 先読み中", "ready": "✅ 先読み完了", "failed": "⚠️ 一部失敗"}
+    st.write(f"起動時の先読み：{warm_label.get(warm.get('state'), '-')}")
+    for name, err in warm.get("errors", {}).items():
+        st.caption(f"❌ {name}: {err}")
+    cache_stats = get_frame_cache().stats()
+    if cache_stats.empty:
+        st.caption("まだキャッシュされたデータはありません。")
+    else:
+        st.dataframe(cache_stats, use_container_width=True, hide_index=True)
+        st.caption(f"合計 {cache_stats['使用量(MB)'].sum():,.1f} MB")
+
 
 st.divider()
 
@@ -0,0 +1,6 @@
+# tests/conftest.py
+# リポジトリ直下のモジュール（metrics.py など）を import できるようにする
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
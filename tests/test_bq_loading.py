@@ -0,0 +1,154 @@
+# tests/test_bq_loading.py
+# Ad Drive の初回ロードが「テーブルごとに1クエリ」、2回目は「0クエリ」になることの確認
+# Storage Read API の失敗時に、一時的なエラーではプロセス全体を REST に切り替えないことの確認
+#   - get_bq_client をスタブに差し替え、query() の呼び出しをテーブル別に数える
+#   - Parquet スナップショット・裏更新・ウォームアップは無効化（BigQuery 以外の経路を通さない）
+import re
+from collections import Counter
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+import streamlit as st
+from google.api_core import exceptions as gexc
+
+import bq_data
+from bq_data import (
+    AD_DRIVE_BANNER_COLS, AD_DRIVE_INDEX_COLS, AD_DRIVE_NUM_COLS, AD_DRIVE_SETTINGS_COLS,
+    BANNER_DRIVE, CLIENT_SETTINGS, FINAL_AD_DATA, load_banner_drive, load_client_settings,
+    load_final_ad_data, load_parallel, table_id,
+)
+
+NUMERIC = {"Cost", "Clicks", "Impressions", "コンバージョン数", "CV", "CPA", "CTR", "CPC"}
+
+
+def _frame(columns) -> pd.DataFrame:
+    return pd.DataFrame({
+        c: [1.0, 2.0] if c in NUMERIC else [f"{c}-a", f"{c}-b"]
+        for c in dict.fromkeys(columns)
+    })
+
+
+TABLES = {
+    FINAL_AD_DATA: _frame(AD_DRIVE_NUM_COLS),
+    BANNER_DRIVE: _frame(AD_DRIVE_BANNER_COLS),
+    CLIENT_SETTINGS: _frame(AD_DRIVE_SETTINGS_COLS),
+}
+
+
+class StubClient:
+    """テーブルごとに同じ行を返す BigQuery クライアントの代わり"""
+
+    def __init__(self):
+        self.queries = Counter()
+
+    def _table(self, full_id: str) -> str:
+        return next(t for t in TABLES if table_id(t) == full_id)
+
+    def get_table(self, full_id: str):
+        df = TABLES[self._table(full_id)]
+        return SimpleNamespace(
+            schema=[
+                SimpleNamespace(name=c, field_type="FLOAT64" if c in NUMERIC else "STRING")
+                for c in df.columns
+            ],
+            table_type="VIEW",  # 最終更新時刻なし
+            modified=None,
+        )
+
+    def query(self, query: str, job_config=None):
+        table = self._table(re.search(r"FROM `([^`]+)`", query).group(1))
+        self.queries[table] += 1
+        select = re.search(r"SELECT (.*?) FROM", query, re.S).group(1).strip()
+        df = TABLES[table]
+        if select != "*":
+            df = df[re.findall(r"`([^`]+)`", select)]
+        return SimpleNamespace(to_dataframe=lambda **kwargs: df.copy())
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    client = StubClient()
+    monkeypatch.setattr(bq_data, "get_bq_client", lambda: client)
+    monkeypatch.setattr(st, "secrets", {
+        "bigquery_options": {"snapshot": False, "background_refresh": False, "warmup": False},
+    })
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    yield client
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def _load_ad_drive():
+    # pages/01_🐬Ad_Drive.py の load_detail_frames と同じ呼び出し
+    return load_parallel(
+        lambda: load_final_ad_data(AD_DRIVE_NUM_COLS, index_cols=AD_DRIVE_INDEX_COLS),
+        lambda: load_banner_drive(AD_DRIVE_BANNER_COLS, index_cols=AD_DRIVE_INDEX_COLS),
+        lambda: load_client_settings(AD_DRIVE_SETTINGS_COLS),
+    )
+
+
+def test_first_load_queries_each_table_once(stub):
+    (df_num, _), (df_banner, _), settings = _load_ad_drive()
+    assert stub.queries == Counter({FINAL_AD_DATA: 1, BANNER_DRIVE: 1, CLIENT_SETTINGS: 1})
+    assert len(df_num) == len(df_banner) == len(settings) == 2
+
+
+def test_second_load_hits_cache(stub):
+    _load_ad_drive()
+    stub.queries.clear()
+    (df_num, _), _, _ = _load_ad_drive()
+    assert sum(stub.queries.values()) == 0
+    assert list(df_num.columns) == list(dict.fromkeys(AD_DRIVE_NUM_COLS))
+
+
+def test_concurrent_first_loads_share_one_query(stub):
+    # 同じ条件の同時ミス（ウォームアップ中のアクセスなど）は1回の取得にまとまる
+    load_parallel(*[lambda: load_final_ad_data(AD_DRIVE_NUM_COLS) for _ in range(4)])
+    assert stub.queries[FINAL_AD_DATA] == 1
+
+
+# ===== Storage Read API のフォールバック =====
+class StorageJob:
+    """Storage API 経由だけ error で失敗し、REST では df を返すジョブ"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def to_dataframe(self, bqstorage_client=None, create_bqstorage_client=True):
+        if bqstorage_client is not None:
+            raise self.error
+        return TABLES[CLIENT_SETTINGS].copy()
+
+
+@pytest.fixture
+def storage_enabled(stub, monkeypatch):
+    monkeypatch.setattr(st, "secrets", {"bigquery_options": {"storage_api": True}})
+    monkeypatch.setattr(bq_data, "bigquery_storage", object())
+    monkeypatch.setattr(bq_data, "get_bqstorage_client", lambda: object())
+    monkeypatch.setattr(bq_data, "_storage_api_failed", False)
+
+
+@pytest.mark.parametrize("error", [
+    gexc.ServiceUnavailable("connection reset"),
+    gexc.DeadlineExceeded("timeout"),
+    ConnectionError("network down"),
+])
+def test_transient_storage_error_falls_back_once(storage_enabled, error):
+    df = bq_data._to_dataframe(StorageJob(error))
+    assert len(df) == 2
+    assert bq_data._storage_api_failed is False
+    assert bq_data.storage_api_enabled()
+
+
+@pytest.mark.parametrize("error", [
+    gexc.PermissionDenied("bigquery.readsessions.create denied"),
+    gexc.Forbidden("access denied"),
+    gexc.FailedPrecondition("BigQuery Storage API has not been used in project 123 before or it is disabled"),
+])
+def test_unavailable_storage_api_is_disabled_for_process(storage_enabled, error):
+    df = bq_data._to_dataframe(StorageJob(error))
+    assert len(df) == 2
+    assert bq_data._storage_api_failed is True
+    assert not bq_data.storage_api_enabled()
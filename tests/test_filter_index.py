@@ -0,0 +1,67 @@
+# tests/test_filter_index.py
+# filter_index.FilterIndex の絞り込みが従来の isin と同じ行を返すこと
+import numpy as np
+import pandas as pd
+import pytest
+
+from filter_index import FilterIndex, index_for
+
+
+def _isin_mask(df: pd.DataFrame, filters: dict) -> np.ndarray:
+    mask = np.ones(len(df), dtype=bool)
+    for col, values in filters.items():
+        if values is not None and len(values) > 0 and col in df.columns:
+            mask &= df[col].isin(values).to_numpy()
+    return mask
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "client_name": pd.Series(["A", "B", "A", None, "C", "B"], dtype="category"),
+        "広告媒体": ["Meta", "Google", "LINE", "Meta", None, "Meta"],
+        "building_count": [1.0, 2.0, 1.0, np.nan, 3.0, 2.0],
+        "配信月": ["2024-01", "2024-02", "2024-02", "2024-03", "2024-01", "2024-03"],
+    })
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"client_name": []},
+    {"client_name": ["A"]},
+    {"client_name": ["A", "C"], "広告媒体": ["Meta"]},
+    {"広告媒体": ["Meta", "存在しない値"]},
+    {"building_count": [1]},            # int で選んでも float の 1.0 に一致する
+    {"building_count": [1, 3.0]},
+    {"building_count": ["1"]},          # 文字列は数値に一致しない（isin と同じ）
+    {"building_count": [np.nan]},       # 欠損の選択は欠損行に一致
+    {"client_name": [None]},
+    {"配信月": ["2024-03"], "client_name": ["B"]},
+    {"索引なしの列": ["x"]},
+])
+def test_mask_matches_isin(df, filters):
+    index = FilterIndex(df, tuple(df.columns))
+    np.testing.assert_array_equal(index.mask(filters, df), _isin_mask(df, filters))
+
+
+def test_unindexed_columns_fall_back_to_isin(df):
+    index = FilterIndex(df, ("client_name",))
+    filters = {"client_name": ["A", "B"], "広告媒体": ["Meta"]}
+    np.testing.assert_array_equal(index.mask(filters, df), _isin_mask(df, filters))
+
+
+def test_take_keeps_row_order(df):
+    index = FilterIndex(df, ("広告媒体",))
+    out = index.take(df, {"広告媒体": ["Meta"]})
+    assert list(out.index) == [0, 3, 5]
+
+
+def test_index_for_rebuilds_on_length_mismatch(df):
+    index = FilterIndex(df, ("client_name",))
+    assert index_for(df, index) is index
+    longer = pd.concat([df, df], ignore_index=True)
+    assert index_for(longer, index).columns == []
+
+
+def test_nbytes_positive(df):
+    assert FilterIndex(df, ("client_name", "building_count")).nbytes > 0
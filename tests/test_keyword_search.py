@@ -0,0 +1,83 @@
+# tests/test_keyword_search.py
+# keyword_search.py の検索構文（, / & / - / NOT）と大規模データでの速度
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from keyword_search import keyword_mask, parse_query
+
+NAMES = pd.Series([
+    "動画_Instagram_春", "静止画_Instagram", "動画_TikTok_テスト", "静止画_LINE", "カルーセル_Facebook",
+])
+
+
+def _hits(values, text) -> list:
+    return list(np.asarray(values)[keyword_mask(values, text)])
+
+
+# ===== parse_query =====
+@pytest.mark.parametrize("text", ["", None, ",", "-", " , & ", "- , -", "&&"])
+def test_empty_queries(text):
+    assert parse_query(text) == []
+    assert keyword_mask(NAMES, text).all()
+
+
+def test_parse_precedence_and_not():
+    # 「,」（OR）が外側、「&」（AND）が内側
+    assert parse_query("動画&-テスト,LINE") == [[("動画", False), ("テスト", True)], [("line", False)]]
+    assert parse_query("動画 AND NOT テスト OR line") == parse_query("動画&-テスト,LINE")
+
+
+# ===== keyword_mask =====
+def test_or():
+    assert _hits(NAMES, "TikTok,LINE") == ["動画_TikTok_テスト", "静止画_LINE"]
+
+
+def test_and():
+    assert _hits(NAMES, "動画&Instagram") == ["動画_Instagram_春"]
+
+
+def test_and_binds_tighter_than_or():
+    # (動画 AND テスト) OR Facebook
+    assert _hits(NAMES, "動画&テスト,Facebook") == ["動画_TikTok_テスト", "カルーセル_Facebook"]
+
+
+def test_not():
+    assert _hits(NAMES, "動画&-テスト") == ["動画_Instagram_春"]
+    assert _hits(NAMES, "NOT Instagram") == ["動画_TikTok_テスト", "静止画_LINE", "カルーセル_Facebook"]
+
+
+def test_case_insensitive():
+    assert _hits(NAMES, "instagram") == _hits(NAMES, "INSTAGRAM") == ["動画_Instagram_春", "静止画_Instagram"]
+
+
+def test_regex_characters_are_literal():
+    values = pd.Series(["a.b", "axb", "(c)"])
+    assert _hits(values, "a.b,(c)") == ["a.b", "(c)"]
+
+
+def test_categorical_with_nan():
+    values = pd.Series(["動画_A", None, "静止画_B", np.nan, "動画_A"], dtype="category")
+    np.testing.assert_array_equal(keyword_mask(values, "動画"), [True, False, False, False, True])
+    # 否定だけの条件でも欠損行は合わない
+    np.testing.assert_array_equal(keyword_mask(values, "-動画"), [False, False, True, False, False])
+
+
+def test_object_with_nan():
+    values = pd.Series(["動画", np.nan, "静止画"], dtype=object)
+    np.testing.assert_array_equal(keyword_mask(values, "NOT 動画"), [False, False, True])
+
+
+# ===== 速度 =====
+def test_large_frame_is_fast():
+    # 30万行・ユニーク 5,000 件（実データの広告セット名と同程度の繰り返し）
+    rng = np.random.default_rng(0)
+    uniques = np.array([f"広告セット_{i}_{'動画' if i % 3 else '静止画'}_{'テスト' if i % 7 == 0 else '本番'}" for i in range(5000)])
+    values = pd.Series(uniques[rng.integers(0, len(uniques), 300_000)]).astype("category")
+    started = time.perf_counter()
+    mask = keyword_mask(values, "動画&-テスト,静止画&本番")
+    elapsed = time.perf_counter() - started
+    assert len(mask) == 300_000
+    assert elapsed < 1.0, f"{elapsed:.2f}s"
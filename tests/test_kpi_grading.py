@@ -0,0 +1,189 @@
+# tests/test_kpi_grading.py
+# kpi_grading.py の評価ロジック
+#   - grade / grade_frame / meets_target は、置き換え前のページ側の判定（SHO-SAN market の行ごとの
+#     grade_lower_better / grade_higher_better、Unit Score の .loc による上書き）と表で突き合わせる
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from kpi_grading import MARKS, grade, grade_frame, grade_metric, meets_any, meets_target
+
+UNIT_MARKS = ("◎", "〇", "△", "✕")
+THRESHOLD_DTYPES = ["float64", "Int64", "Float64"]
+
+
+# ===== 置き換え前の判定（比較用にそのまま残す） =====
+def baseline_lower_better(val, best, good, min_):
+    if pd.isna(val) or pd.isna(best) or pd.isna(good) or pd.isna(min_):
+        return None
+    if val <= best:
+        return "◎"
+    if val <= good:
+        return "○"
+    if val <= min_:
+        return "△"
+    return "×"
+
+
+def baseline_higher_better(val, best, good, min_):
+    if pd.isna(val) or pd.isna(best) or pd.isna(good) or pd.isna(min_):
+        return None
+    if val >= best:
+        return "◎"
+    if val >= good:
+        return "○"
+    if val >= min_:
+        return "△"
+    return "×"
+
+
+def baseline_market(df: pd.DataFrame, metric: str) -> list:
+    grader = baseline_higher_better if metric in ("CVR", "CTR") else baseline_lower_better
+    return df.apply(
+        lambda r: grader(r.get(metric), r.get(f"{metric}_best"), r.get(f"{metric}_good"), r.get(f"{metric}_min")),
+        axis=1,
+    ).tolist()
+
+
+def baseline_unit_cpa(df: pd.DataFrame) -> list:
+    # Unit Score の CPA_KPI_評価（コンバージョン目的の行だけを渡す前提）
+    out = pd.Series(pd.NA, index=df.index, dtype="string")
+    has_cpa = df["CPA"].notna()
+    has_best = df["CPA_best"].notna()
+    cond_best = has_cpa & has_best & (df["CPA"] <= df["CPA_best"])
+    cond_good = has_cpa & df["CPA_good"].notna() & (df["CPA"] <= df["CPA_good"])
+    cond_min = has_cpa & df["CPA_min"].notna() & (df["CPA"] <= df["CPA_min"])
+    out.loc[cond_best] = "◎"
+    out.loc[~out.isin(["◎"]) & cond_good] = "〇"
+    out.loc[~out.isin(["◎", "〇"]) & cond_min] = "△"
+    out.loc[out.isna() & has_cpa & has_best] = "✕"
+    return [None if pd.isna(v) else v for v in out]
+
+
+def baseline_target(df: pd.DataFrame) -> list:
+    out = pd.Series(pd.NA, index=df.index, dtype="string")
+    mask_target = df["目標CPA"].notna()
+    mask_valid = mask_target & df["CPA"].notna()
+    out.loc[~mask_target] = "個別目標なし"
+    out.loc[mask_valid & (df["CPA"] <= df["目標CPA"])] = "〇"
+    out.loc[mask_valid & (df["CPA"] > df["目標CPA"])] = "✕"
+    return [None if pd.isna(v) else v for v in out]
+
+
+def _grid(metric: str, values, best, good, min_, dtype: str) -> pd.DataFrame:
+    """実績値 × 閾値（それぞれ欠損あり）の全組み合わせ"""
+    rows = list(itertools.product(values, [best, None], [good, None], [min_, None]))
+    df = pd.DataFrame(rows, columns=[metric, f"{metric}_best", f"{metric}_good", f"{metric}_min"])
+    df[metric] = df[metric].astype(float)
+    for col in df.columns[1:]:
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def _grid_lower(dtype: str) -> pd.DataFrame:
+    return _grid("CPA", [50, 100, 120, 150, 175, 200, 250, None], 100, 150, 200, dtype)
+
+
+def _grid_higher(dtype: str) -> pd.DataFrame:
+    return _grid("CVR", [0.001, 0.01, 0.015, 0.02, 0.03, 0.05, None], 0.03, 0.02, 0.01, "float64" if dtype == "Int64" else dtype)
+
+
+# ===== strict（SHO-SAN market） =====
+@pytest.mark.parametrize("dtype", THRESHOLD_DTYPES)
+def test_strict_lower_matches_baseline(dtype):
+    df = _grid_lower(dtype)
+    assert list(grade_metric(df, "CPA")) == baseline_market(df, "CPA")
+
+
+@pytest.mark.parametrize("dtype", THRESHOLD_DTYPES)
+def test_strict_higher_matches_baseline(dtype):
+    df = _grid_higher(dtype)
+    assert list(grade_metric(df, "CVR")) == baseline_market(df, "CVR")
+
+
+def test_grade_frame_matches_baseline_for_all_metrics():
+    rng = np.random.default_rng(0)
+    n = 200
+    df = pd.DataFrame({m: rng.random(n) * 300 for m in ("CPA", "CPC", "CPM", "CVR", "CTR")})
+    for m in ("CPA", "CPC", "CPM"):
+        df[f"{m}_best"], df[f"{m}_good"], df[f"{m}_min"] = 100.0, 150.0, 200.0
+    for m in ("CVR", "CTR"):
+        df[f"{m}_best"], df[f"{m}_good"], df[f"{m}_min"] = 200.0, 150.0, 100.0
+    df.loc[::7, "CPA"] = np.nan
+    df.loc[::5, "CTR_good"] = np.nan
+    expected = {m: baseline_market(df, m) for m in ("CPA", "CPC", "CPM", "CVR", "CTR")}
+    grade_frame(df)
+    for m, exp in expected.items():
+        assert df[f"{m}_評価"].tolist() == exp, m
+
+
+def test_strict_missing_columns():
+    # 実績列が無い → 全行 None、閾値列が無い → その閾値は欠損扱い（strict なので None）
+    df = pd.DataFrame({"CPA": [50.0, 300.0], "CPA_best": [100, 100], "CPA_good": [150, 150]})
+    assert list(grade_metric(df, "CTR")) == [None, None]
+    assert list(grade_metric(df, "CPA")) == baseline_market(df, "CPA") == [None, None]
+
+
+# ===== non-strict（Unit Score の CPA_KPI_評価） =====
+@pytest.mark.parametrize("dtype", THRESHOLD_DTYPES)
+def test_lenient_matches_unit_baseline(dtype):
+    df = _grid_lower(dtype)
+    got = grade_metric(df, "CPA", marks=UNIT_MARKS, strict=False)
+    assert list(got) == baseline_unit_cpa(df)
+
+
+def test_lenient_higher_is_better():
+    # best 欠損でも good を満たせば〇、best ありで全部未達なら ✕、best なしで未達なら判定なし
+    out = grade([0.025, 0.001, 0.001], [np.nan, 0.03, np.nan], [0.02, 0.02, 0.02], [0.01, 0.01, 0.01],
+                higher_is_better=True, marks=UNIT_MARKS, strict=False)
+    assert list(out) == ["〇", "✕", None]
+
+
+def test_default_marks():
+    assert list(grade([1], [2], [3], [4])) == [MARKS[0]]
+
+
+# ===== meets_target（Unit Score の個別CPA_達成） =====
+@pytest.mark.parametrize("dtype", THRESHOLD_DTYPES)
+def test_meets_target_matches_baseline(dtype):
+    df = pd.DataFrame(
+        list(itertools.product([50.0, 100.0, 150.0, None], [100, None])), columns=["CPA", "目標CPA"]
+    )
+    df["CPA"] = df["CPA"].astype(float)
+    df["目標CPA"] = df["目標CPA"].astype(dtype)
+    assert list(meets_target(df["CPA"], df["目標CPA"])) == baseline_target(df)
+
+
+# ===== meets_any（Unit Score の達成状況） =====
+def test_meets_any_either_target():
+    cpa = [100.0, 100.0, 100.0, 100.0]
+    good = [120.0, 80.0, 80.0, np.nan]
+    target = [np.nan, 150.0, 90.0, 100.0]
+    np.testing.assert_array_equal(meets_any(cpa, good, target), [True, True, False, True])
+
+
+@pytest.mark.parametrize("dtype", ["Int64", "Float64"])
+def test_meets_any_nullable_thresholds(dtype):
+    # BigQuery の INT64 列は Int64（<NA> あり）で届く。比較結果が <NA> でも落ちずに未達扱い
+    df = pd.DataFrame({
+        "CPA": pd.Series([100.0, 100.0, np.nan, 100.0]),
+        "CPA_good": pd.Series([120, None, 50, None], dtype=dtype),
+        "目標CPA": pd.Series([None, 150, None, None], dtype=dtype),
+    })
+    achieved = meets_any(df["CPA"], df["CPA_good"], df["目標CPA"])
+    assert achieved.dtype == bool
+    np.testing.assert_array_equal(achieved, [True, True, False, False])
+
+    # ページと同じ np.select が通ること（nullable の比較結果をそのまま渡すと TypeError になっていた）
+    mask_conv = np.array([True, True, True, False])
+    mask_judge = mask_conv & df["CPA"].notna().to_numpy(dtype=bool)
+    status = np.select(
+        [~mask_conv, mask_judge & achieved, mask_judge], ["評価外", "達成", "未達成"], default=None
+    )
+    assert list(status) == ["達成", "達成", None, "評価外"]
+
+
+def test_meets_any_without_targets():
+    np.testing.assert_array_equal(meets_any([1.0, np.nan]), [False, False])
@@ -0,0 +1,133 @@
+# tests/test_metrics.py
+# metrics.py の境界値（0 / 負 / NaN / None / inf / 空）と Series の index 揃え
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from metrics import METRICS, add_metrics, safe_div, safe_ratio
+
+
+# ===== safe_div =====
+def test_safe_div_basic():
+    out = safe_div([100, 50], [4, 5])
+    np.testing.assert_allclose(out, [25.0, 10.0])
+
+
+def test_safe_div_scale():
+    np.testing.assert_allclose(safe_div([3], [2000], 1000.0), [1.5])
+
+
+@pytest.mark.parametrize("den", [0, -1, np.nan, None, np.inf, -np.inf, "abc"])
+def test_safe_div_bad_denominator_is_nan(den):
+    assert np.isnan(safe_div([100], [den])[0])
+
+
+@pytest.mark.parametrize("num", [np.nan, None, np.inf, -np.inf, "abc"])
+def test_safe_div_bad_numerator_is_nan(num):
+    assert np.isnan(safe_div([num], [10])[0])
+
+
+def test_safe_div_zero_and_negative_numerator():
+    np.testing.assert_allclose(safe_div([0, -20], [10, 10]), [0.0, -2.0])
+
+
+def test_safe_div_never_returns_inf():
+    out = safe_div([1, np.inf, 1, 0], [0, 1, np.inf, 0])
+    assert not np.isinf(out).any()
+
+
+def test_safe_div_empty():
+    out = safe_div([], [])
+    assert isinstance(out, np.ndarray)
+    assert len(out) == 0
+
+
+def test_safe_div_nullable_dtypes():
+    num = pd.Series([10, None], dtype="Int64")
+    den = pd.Series([2, 5], dtype="Float64")
+    out = safe_div(num, den)
+    assert out[0] == 5.0
+    assert np.isnan(out[1])
+
+
+def test_safe_div_aligns_series_index():
+    num = pd.Series([100.0, 200.0, 300.0], index=["a", "b", "c"])
+    den = pd.Series([20.0, 10.0], index=["b", "a"])  # 順番違い・"c" なし
+    out = safe_div(num, den)
+    np.testing.assert_allclose(out[:2], [10.0, 10.0])
+    assert np.isnan(out[2])
+
+
+# ===== safe_ratio =====
+def test_safe_ratio_value():
+    assert safe_ratio(1000, 4) == 250.0
+    assert isinstance(safe_ratio(1000, 4), float)
+
+
+@pytest.mark.parametrize("num, den", [
+    (100, 0), (100, -5), (100, None), (None, 10), (np.nan, 10), (100, np.nan),
+    (np.inf, 10), (100, np.inf),
+])
+def test_safe_ratio_none_when_not_computable(num, den):
+    assert safe_ratio(num, den) is None
+
+
+# ===== add_metrics =====
+def _frame():
+    return pd.DataFrame({
+        "Cost": [1000.0, 500.0, 0.0, None],
+        "Clicks": [100, 0, 10, 5],
+        "Impressions": [10000, 2000, 0, 100],
+        "conv_total": [10, 0, -1, 2],
+    }, index=[10, 20, 30, 40])
+
+
+def test_add_metrics_values():
+    df = add_metrics(_frame())
+    assert df.loc[10, "CPA"] == 100.0
+    assert df.loc[10, "CVR"] == 0.1
+    assert df.loc[10, "CTR"] == 0.01
+    assert df.loc[10, "CPC"] == 10.0
+    assert df.loc[10, "CPM"] == 100.0
+
+
+def test_add_metrics_bad_denominators_are_nan():
+    df = add_metrics(_frame())
+    assert np.isnan(df.loc[20, "CPA"])  # conv 0
+    assert np.isnan(df.loc[20, "CPC"])  # clicks 0
+    assert np.isnan(df.loc[30, "CPA"])  # conv 負
+    assert np.isnan(df.loc[30, "CTR"])  # impressions 0
+    assert np.isnan(df.loc[40, "CPC"])  # cost 欠損
+    assert not np.isinf(df[list(METRICS)].to_numpy()).any()
+
+
+def test_add_metrics_keeps_index_and_updates_in_place():
+    src = _frame()
+    out = add_metrics(src)
+    assert out is src
+    assert list(out.index) == [10, 20, 30, 40]
+
+
+def test_add_metrics_skips_missing_columns():
+    df = add_metrics(pd.DataFrame({"Cost": [100.0], "Clicks": [10]}))
+    assert "CPC" in df.columns
+    assert "CPA" not in df.columns and "CTR" not in df.columns
+
+
+def test_add_metrics_custom_column_names():
+    df = pd.DataFrame({"消化金額": [300.0], "CV": [3]})
+    add_metrics(df, ("CPA",), cost="消化金額", conversions="CV")
+    assert df.loc[0, "CPA"] == 100.0
+
+
+def test_add_metrics_empty_frame():
+    df = add_metrics(pd.DataFrame(columns=["Cost", "Clicks", "Impressions", "conv_total"]))
+    assert set(METRICS) <= set(df.columns)
+    assert len(df) == 0
+
+
+def test_safe_ratio_matches_add_metrics():
+    df = add_metrics(_frame())
+    assert math.isclose(safe_ratio(1000.0, 10), df.loc[10, "CPA"])
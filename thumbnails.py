@@ -0,0 +1,125 @@
+# thumbnails.py
+# バナー画像のサムネイル（固定幅 WebP）生成
+#   - カードには CloudStorageUrl の原寸画像ではなくサムネイルを表示し、原寸はクリックで開く
+#   - ファイル名は URL のハッシュ（static/thumbs/{sha1}.webp）。Streamlit の静的配信（app/static/...）で返す
+#     ※ .streamlit/config.toml の [server] enableStaticServing = true が必要
+#   - 未作成の URL は原寸 URL を返しつつ、裏スレッドで作っておく（次回表示からサムネイル）
+#   - 取得・変換に失敗した URL は FAILED_RETRY 秒のあいだ再挑戦しない（リンク切れを毎回取りに行かない）
+#   - `python thumbnails.py` で Banner_Drive_Ready の全バナー分をまとめて作れる（デプロイ前・定期実行用）
+#   - Pillow が無い環境では何もせず原寸 URL を返す
+import hashlib
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+
+import requests
+import streamlit as st
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow 未導入なら原寸表示のまま
+    Image = None
+
+# 静的配信は app.py と同じ階層の static/ が対象なので、起動ディレクトリではなくこのファイルの場所を基準にする
+THUMB_DIR = Path(__file__).resolve().parent / "static" / "thumbs"
+THUMB_URL = "app/static/thumbs"
+THUMB_WIDTH = 480     # カード幅（約 300px）の Retina 相当
+THUMB_QUALITY = 80
+FETCH_TIMEOUT = 15
+FAILED_RETRY = 60 * 60  # 失敗した URL を再挑戦するまでの秒数
+
+
+def thumb_name(url: str) -> str:
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".webp"
+
+
+def make_thumbnail(url: str) -> Path | None:
+    """url の画像を取得して THUMB_WIDTH 幅の WebP を保存し、そのパスを返す（失敗時は None）"""
+    if Image is None or not url:
+        return None
+    path = THUMB_DIR / thumb_name(url)
+    if path.exists():
+        return path
+    try:
+        res = requests.get(url, timeout=FETCH_TIMEOUT)
+        res.raise_for_status()
+        with Image.open(BytesIO(res.content)) as img:
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+            if img.width > THUMB_WIDTH:
+                img = img.resize((THUMB_WIDTH, round(img.height * THUMB_WIDTH / img.width)), Image.LANCZOS)
+            THUMB_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            img.save(tmp, "WEBP", quality=THUMB_QUALITY, method=4)
+        os.replace(tmp, path)  # 書き込み途中のファイルを配信しない
+        return path
+    except Exception:
+        return None
+
+
+@st.cache_resource
+def _worker() -> tuple[ThreadPoolExecutor, set, dict, threading.Lock]:
+    """
+    裏でサムネイルを作るスレッドプールと、その状態（プロセスで1つ）
+    - pending: 作成待ちの URL 集合
+    - failed: 失敗した URL -> 失敗時刻（FAILED_RETRY 秒たつまで予約しない）
+    - pending / failed はセッションのスレッドとプールのスレッドから触るので lock の中で読み書きする
+    """
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="thumbs"), set(), {}, threading.Lock()
+
+
+def _enqueue(url: str):
+    pool, pending, failed, lock = _worker()
+    with lock:
+        if url in pending or time.time() - failed.get(url, 0) < FAILED_RETRY:
+            return
+        pending.add(url)
+
+    def run():
+        path = None
+        try:
+            path = make_thumbnail(url)
+        finally:
+            with lock:
+                pending.discard(url)
+                if path is None:
+                    failed[url] = time.time()
+                else:
+                    failed.pop(url, None)
+
+    pool.submit(run)
+
+
+def thumbnail_url(url) -> str:
+    """
+    カードに表示する画像 URL。
+    - サムネイルがあればその静的配信 URL、無ければ原寸 URL（裏で作成を予約）。
+    """
+    url = str(url or "")
+    if Image is None or not url.startswith("http"):
+        return url
+    name = thumb_name(url)
+    if (THUMB_DIR / name).exists():
+        return f"{THUMB_URL}/{name}"
+    _enqueue(url)
+    return url
+
+
+if __name__ == "__main__":
+    from bq_data import BANNER_DRIVE, run_query, table_id
+
+    if Image is None:
+        sys.exit("Pillow がインストールされていません（pip install Pillow）")
+    urls = run_query(
+        f"SELECT DISTINCT CloudStorageUrl FROM `{table_id(BANNER_DRIVE)}` WHERE CloudStorageUrl IS NOT NULL"
+    )["CloudStorageUrl"].tolist()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(make_thumbnail, urls))
+    failed = [u for u, p in zip(urls, results) if p is None]
+    print(f"{len(urls) - len(failed):,} / {len(urls):,} 件作成済み")
+    for u in failed:
+        print(f"❌ {u}")
+    sys.exit(1 if failed else 0)
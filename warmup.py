@@ -0,0 +1,82 @@
+# warmup.py
+# サーバー起動直後のキャッシュ温め
+#   - start_warmup() を呼ぶと、プロセス内で1回だけ裏スレッドで重いテーブルを読み込む
+#     （Ad Drive・Unit Score・SHO-SAN market と同じ列・条件なので、最初の利用者もキャッシュヒットになる）
+#   - 呼び出し元は app.py（HOME）と bq_data.get_frame_cache()（どのページから入っても開始される）
+#   - 読み込み中に同じ条件でアクセスした利用者は、FrameCache の待ち合わせで同じ読み込み結果を受け取る
+#   - `python warmup.py` で実行すると、デプロイ前にローカル Parquet スナップショットを作っておける
+#     （別プロセスなのでメモリのキャッシュは共有されないが、起動後の読み込みがファイル読みで済む）
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from bq_data import (
+    AD_DRIVE_BANNER_COLS, AD_DRIVE_KPI_COLS, AD_DRIVE_NUM_COLS, AD_DRIVE_OPTION_COLS,
+    AD_DRIVE_SETTINGS_COLS, FINAL_AD_DATA, MARKET_KPI_COLS, MARKET_RAW_COLS, UNIT_SCORE_COLS,
+    load_banner_drive, load_client_settings, load_filter_options, load_final_ad_data,
+    load_ad_cube, load_kpi_settings, load_monthly_totals, load_unit_drive,
+)
+
+# (表示名, 読み込み処理)
+WARMUP_TASKS = [
+    ("Ad Drive：Final_Ad_Data_Last", lambda: load_final_ad_data(AD_DRIVE_NUM_COLS)),
+    ("Ad Drive：Banner_Drive_Ready", lambda: load_banner_drive(AD_DRIVE_BANNER_COLS)),
+    ("Ad Drive：月別合計", lambda: load_monthly_totals()),
+    ("Ad Drive / SHO-SAN market：月次キューブ", lambda: load_ad_cube()),
+    ("Ad Drive：フィルター選択肢", lambda: load_filter_options(FINAL_AD_DATA, AD_DRIVE_OPTION_COLS)),
+    ("Ad Drive：ClientSettings", lambda: load_client_settings(AD_DRIVE_SETTINGS_COLS)),
+    ("Ad Drive：KPI設定", lambda: load_kpi_settings(AD_DRIVE_KPI_COLS)),
+    ("Unit Score：Unit_Drive_Ready_View", lambda: load_unit_drive(UNIT_SCORE_COLS)),
+    ("SHO-SAN market：Final_Ad_Data_Last", lambda: load_final_ad_data(MARKET_RAW_COLS)),
+    ("SHO-SAN market：KPI設定", lambda: load_kpi_settings(MARKET_KPI_COLS)),
+]
+
+
+def run_warmup(status: dict | None = None) -> dict:
+    """
+    WARMUP_TASKS を並列に実行し、状態を status に書き込んで返す。
+    - state: "running" → "ready"（全件成功）/ "failed"（1件以上失敗。成功分は温まっている）
+    """
+    status = status if status is not None else {}
+    status.update(state="running", started_at=time.time(), finished_at=None, done=[], errors={})
+
+    def run(name, task):
+        try:
+            task()
+            status["done"].append(name)
+        except Exception as e:
+            status["errors"][name] = repr(e)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        for name, task in WARMUP_TASKS:
+            pool.submit(run, name, task)
+
+    status["finished_at"] = time.time()
+    status["state"] = "failed" if status["errors"] else "ready"
+    return status
+
+
+@st.cache_resource
+def start_warmup() -> dict:
+    """プロセス内で1回だけウォームアップを裏で開始し、状態 dict を返す（warmup_status() と同じもの）"""
+    status = {"state": "running"}
+    threading.Thread(target=run_warmup, args=(status,), name="bq-warmup", daemon=True).start()
+    return status
+
+
+def warmup_status() -> dict:
+    """ウォームアップの状態（未開始なら開始する）"""
+    return start_warmup()
+
+
+if __name__ == "__main__":
+    result = run_warmup()
+    for name in result["done"]:
+        print(f"✅ {name}")
+    for name, err in result["errors"].items():
+        print(f"❌ {name}: {err}")
+    print(f"{result['state']} ({result['finished_at'] - result['started_at']:.1f}s)")
+    sys.exit(0 if result["state"] == "ready" else 1)